@@ -0,0 +1,61 @@
+"""
+Helpers shared by the benchmarks. Benchmarks run against a throwaway
+test database created from the project settings, run them from the
+project root with e.g. `python -m benchmarks.flight_search`.
+"""
+import contextlib
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flightbooking.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+
+@contextlib.contextmanager
+def test_database():
+    """
+    Creates a migrated test database for the duration of the block.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(func, repeat=20):
+    """
+    Calls func repeat times after a warm up call.
+    :return: float, the median duration in milliseconds
+    """
+    func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def requests_per_second(send, requests):
+    """
+    Calls send requests times.
+    :return: float, the number of calls per second
+    """
+    start = time.perf_counter()
+    for _ in range(requests):
+        send()
+    return requests / (time.perf_counter() - start)
+
+
+def report(title, columns, rows):
+    print('\n' + title)
+    widths = [max(len(str(value)) for value in column) for column in zip(columns, *rows)]
+    for row in [columns] + list(rows):
+        print('  '.join(str(value).rjust(width) for value, width in zip(row, widths)))
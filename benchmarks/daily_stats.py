@@ -0,0 +1,40 @@
+"""
+Times the backfill of the daily operations report against the number of
+worker processes, on a seeded dataset of bookings.
+
+    python -m benchmarks.daily_stats [bookings] [workers...]
+"""
+import sys
+import time
+
+from benchmarks.common import report, test_database
+
+from flightbooking.apps.flights.models import DailyFlightStats
+from flightbooking.apps.flights.seeding import seed_dataset
+from flightbooking.apps.flights.stats import backfill_daily_stats
+
+DEFAULT_BOOKINGS = 1000000
+DEFAULT_WORKERS = [1, 2, 4, 8]
+# days of departure dates each worker recomputes at once
+RANGE_DAYS = 7
+
+
+def main(bookings, workers):
+    rows = []
+    with test_database():
+        flights = bookings // 100
+        seed_dataset(bookings // 10, flights, bookings, days=365, seed=1)
+        for count in workers:
+            DailyFlightStats.objects.all().delete()
+            start = time.perf_counter()
+            counted = backfill_daily_stats(days=RANGE_DAYS, workers=count)
+            seconds = time.perf_counter() - start
+            rows.append([count, counted, '{:.2f}'.format(seconds), '{:,.0f}'.format(counted / seconds),
+                         '{:.1f}x'.format(float(rows[0][2]) / seconds if rows else 1)])
+    report('Daily stats backfill of {} bookings, {} days per range'.format(bookings, RANGE_DAYS),
+           ['workers', 'bookings', 'seconds', 'bookings/s', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(arguments[0] if arguments else DEFAULT_BOOKINGS, arguments[1:] or DEFAULT_WORKERS)
@@ -0,0 +1,76 @@
+"""
+Times reading the flights departing within a reminder window, 24 hours
+from now give or take 15 minutes, as the flights table grows. The window
+is read as a range of departs_at and, the way it had to be before, as
+conditions on the departure date and time, which take an OR when the
+window spans midnight. The plan column names the scan each query ran.
+
+    python -m benchmarks.departure_window [sizes...]
+"""
+import datetime
+import sys
+
+from benchmarks.common import report, test_database, timed
+from benchmarks.flight_search import grow_flights
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from flightbooking.apps.flights.models import Flight
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+NOW = timezone.make_aware(datetime.datetime(2020, 3, 1, 23, 50))
+LEAD, MARGIN = datetime.timedelta(hours=24), datetime.timedelta(minutes=15)
+
+
+def departs_at_window(start, end):
+    return Flight.objects.departing_between(start, end)
+
+
+def date_and_time_window(start, end):
+    if start.date() == end.date():
+        return Flight.objects.filter(
+            departure_date=start.date(), departure_time__gte=start.time(), departure_time__lt=end.time())
+    return Flight.objects.filter(
+        Q(departure_date=start.date(), departure_time__gte=start.time()) |
+        Q(departure_date=end.date(), departure_time__lt=end.time()))
+
+
+QUERIES = [('departs_at range', departs_at_window), ('date and time', date_and_time_window)]
+
+
+def scan(queryset):
+    """
+    The node types of the query plan, outermost first.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0][0]['Plan']
+    nodes = []
+    while plan is not None:
+        nodes.append(plan['Node Type'])
+        plan = (plan.get('Plans') or [None])[0]
+    return ' > '.join(nodes)
+
+
+def main(sizes):
+    start, end = NOW + LEAD - MARGIN, NOW + LEAD + MARGIN
+    rows, size = [], 0
+    with test_database():
+        for target in sorted(sizes):
+            grow_flights(connection, size, target)
+            size = target
+            row = [size, departs_at_window(start, end).count()]
+            for _, window in QUERIES:
+                queryset = window(start, end).values_list('flight_id', flat=True)
+                row += ['{:.2f}'.format(timed(lambda: list(queryset.all()))), scan(queryset)]
+            rows.append(row)
+    columns = ['flights', 'in window']
+    for name, _ in QUERIES:
+        columns += [name + ' ms', name + ' plan']
+    report('Flights departing {} from now, give or take {}, median ms'.format(LEAD, MARGIN), columns, rows)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
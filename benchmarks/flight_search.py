@@ -0,0 +1,69 @@
+"""
+Times the flight search as the flights table grows. With the search
+indexes in place every query should take about the same time whatever
+the size of the table, except the destination prefix search which has to
+sort every flight to a matching destination.
+
+    python -m benchmarks.flight_search [sizes...]
+"""
+import sys
+
+from benchmarks.common import report, test_database, timed
+from django.http import QueryDict
+
+from flightbooking.apps.flights.filters import FlightSearchFilter
+from flightbooking.apps.flights.models import Flight
+from flightbooking.apps.flights.views import FlightAPIView
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DESTINATIONS = 500
+
+QUERIES = [
+    ('destination', 'destination=City 42'),
+    ('destination + dates', 'destination=City 42&departure_date_after=2020-03-01&departure_date_before=2020-03-31'),
+    ('destination + time window', 'destination=City 42&departure_time_after=22:00&departure_time_before=02:00'),
+    ('departing within a day', 'departs_after=2020-03-01 12:00&departs_before=2020-03-02 12:00'),
+    ('destination prefix', 'destination_prefix=City 42'),
+    ('name', 'name=Flight 4242'),
+]
+
+
+def grow_flights(connection, start, stop):
+    """
+    Inserts flights start to stop spread over DESTINATIONS destinations,
+    two years of dates and every minute of the day.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO flights_flight
+                (name, destination, departure_date, departure_time, departs_at,
+                 seat_rows, seat_columns, capacity, booked_seats)
+            SELECT name, destination, departure_date, departure_time,
+                   (departure_date + departure_time) AT TIME ZONE 'UTC', 0, 'ABCDEF', 0, 0
+            FROM (
+                SELECT 'Flight ' || i AS name, 'City ' || (i %% %s) AS destination,
+                       DATE '2020-01-01' + (i * 7919 %% 730)::int AS departure_date,
+                       TIME '00:00' + (i * 104729 %% 1440) * INTERVAL '1 minute' AS departure_time
+                FROM generate_series(%s::bigint, %s - 1) AS i
+            ) AS flights
+        """, [DESTINATIONS, start, stop])
+        cursor.execute('ANALYZE flights_flight')
+
+
+def search(query):
+    filterset = FlightSearchFilter(QueryDict(query), queryset=Flight.objects.all())
+    return list(filterset.qs.order_by(*FlightAPIView.search_ordering)[:12])
+
+
+def main(sizes):
+    rows, size = [], 0
+    with test_database() as connection:
+        for target in sorted(sizes):
+            grow_flights(connection, size, target)
+            size = target
+            rows.append([size] + ['{:.2f}'.format(timed(lambda: search(query))) for _, query in QUERIES])
+    report('Flight search, median ms for the first page', ['flights'] + [name for name, _ in QUERIES], rows)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,79 @@
+"""
+Compares the cost per row of reading and serializing a page of flights
+and of bookings with the model serializers and with the values
+serializers the list views use.
+
+    python -m benchmarks.list_serializers
+"""
+import cloudinary
+from benchmarks.common import report, test_database, timed
+
+from flightbooking.apps.flights.models import Booking, Flight
+from flightbooking.apps.flights.serializers import (
+    BookingSerializer, BookingValuesSerializer, FlightSerializer, FlightValuesSerializer,
+)
+
+PAGE_SIZES = [12, 100, 1000]
+
+
+def seed(connection, size):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO flights_flight
+                (name, destination, departure_date, departure_time, departs_at,
+                 seat_rows, seat_columns, capacity, booked_seats)
+            SELECT name, destination, departure_date, departure_time,
+                   (departure_date + departure_time) AT TIME ZONE 'UTC', 0, 'ABCDEF', 0, 0
+            FROM (
+                SELECT 'Flight ' || i AS name, 'City ' || (i %% 50) AS destination,
+                       DATE '2020-01-01' + i %% 365 AS departure_date,
+                       TIME '00:00' + i %% 1440 * INTERVAL '1 minute' AS departure_time
+                FROM generate_series(1, %s) AS i
+            ) AS flights
+        """, [size])
+        cursor.execute("""
+            INSERT INTO authentication_user
+                (password, is_superuser, username, email, is_active, is_staff)
+            SELECT '', false, 'traveller' || i, 'traveller' || i || '@gmail.com', true, false
+            FROM generate_series(1, %s) AS i
+        """, [size])
+        cursor.execute("""
+            INSERT INTO profiles_profile (user_id, image, passport)
+            SELECT id, '', 'image/upload/v1/' || username || '.jpg' FROM authentication_user
+        """)
+        cursor.execute("""
+            INSERT INTO flights_booking (flight_id, traveller_id, flight_seat, created_at, updated_at)
+            SELECT (SELECT min(flight_id) FROM flights_flight), id, username, now(), now()
+            FROM authentication_user
+        """)
+
+
+def per_row(func, size):
+    return '{:.1f}'.format(timed(func, 10) * 1000 / size)
+
+
+def main():
+    # passports are represented by their cloudinary url
+    cloudinary.config(cloud_name='benchmarks')
+    flight_values, booking_values = FlightValuesSerializer(), BookingValuesSerializer()
+    rows = []
+    with test_database() as connection:
+        seed(connection, max(PAGE_SIZES))
+        for size in PAGE_SIZES:
+            flights = Flight.objects.order_by('flight_id')[:size]
+            bookings = Booking.objects.with_traveller_profiles().order_by('booking_id')[:size]
+            rows.append([
+                size,
+                per_row(lambda: FlightSerializer(flights.all(), many=True).data, size),
+                per_row(lambda: flight_values.data(flight_values.rows(flights.all())), size),
+                per_row(lambda: BookingSerializer(bookings.all(), many=True).data, size),
+                per_row(lambda: booking_values.data(booking_values.rows(bookings.all())), size),
+            ])
+    report(
+        'Reading and serializing a page, median microseconds per row',
+        ['page size', 'FlightSerializer', 'FlightValuesSerializer', 'BookingSerializer', 'BookingValuesSerializer'],
+        rows)
+
+
+if __name__ == '__main__':
+    main()
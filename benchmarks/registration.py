@@ -0,0 +1,47 @@
+"""
+Measures how many registrations per second a single process serves, for
+new users and for the rejected ones. New users pay for hashing their
+password, set PASSWORD_HASH_ITERATIONS to see how that cost changes.
+
+    python -m benchmarks.registration [requests]
+"""
+import itertools
+import json
+import sys
+
+from benchmarks.common import report, requests_per_second, test_database
+from django.test import Client
+
+PASSWORD = "password1U@#}"
+
+
+def main(requests):
+    client = Client()
+    numbers = itertools.count()
+
+    def register(username, email, password=PASSWORD):
+        return client.post('/api/users/', json.dumps({
+            "user": {"username": username, "email": email, "password": password}
+        }), content_type='application/json')
+
+    def new_user():
+        number = next(numbers)
+        register("traveller{}".format(number), "traveller{}@gmail.com".format(number))
+
+    def taken_username():
+        register("traveller0", "someone{}@gmail.com".format(next(numbers)))
+
+    def invalid_password():
+        register("traveller{}".format(next(numbers)), "invalid@gmail.com", "password")
+
+    with test_database():
+        rows = [
+            [name, requests, '{:.1f}'.format(requests_per_second(send, requests))]
+            for name, send in [
+                ('new user', new_user), ('taken username', taken_username), ('invalid password', invalid_password)]
+        ]
+    report('Registration, one process', ['registration', 'requests', 'requests/s'], rows)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
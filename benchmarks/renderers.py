@@ -0,0 +1,55 @@
+"""
+Compares the time to render a page of 12 bookings and a list of 10000
+profiles with DRF's JSONRenderer, the stdlib json.dumps the user and
+profile renderers used before, and FastJSONRenderer.
+
+    python -m benchmarks.renderers
+"""
+import datetime
+import json
+from collections import OrderedDict
+
+from benchmarks.common import report, timed
+from rest_framework.renderers import JSONRenderer
+
+from flightbooking.apps.core import renderers
+from flightbooking.apps.core.renderers import FastJSONRenderer
+from flightbooking.apps.profiles.renderers import ProfileJSONRenderer
+
+
+def booking(index):
+    return OrderedDict([
+        ('booking_id', index),
+        ('traveller', OrderedDict([
+            ('username', 'traveller{}'.format(index)), ('image', None), ('passport', None)])),
+        ('flight_seat', '{}A'.format(index)),
+        ('created_at', datetime.datetime(2019, 12, 12, 9, 30, tzinfo=datetime.timezone.utc).isoformat()),
+        ('updated_at', datetime.datetime(2019, 12, 12, 9, 30, tzinfo=datetime.timezone.utc).isoformat()),
+    ])
+
+
+def profile(index):
+    return OrderedDict([('username', 'traveller{}'.format(index)), ('image', None), ('passport', None)])
+
+
+def main():
+    booking_page = OrderedDict([
+        ('links', OrderedDict([('next', 'http://testserver/api/flights/1/bookings/?page=2'), ('previous', None)])),
+        ('count', 500), ('total_pages', 42), ('results', [booking(index) for index in range(12)]),
+    ])
+    profile_list = {'profiles': [profile(index) for index in range(10000)]}
+    compact = 'orjson' if renderers.ORJSON_OPTIONS is not None else 'json'
+    spaced = type(renderers.spaced_encoder).__module__.split('.')[0]
+    rows = [
+        ['12 bookings', 'DRF JSONRenderer', '{:.3f}'.format(timed(lambda: JSONRenderer().render(booking_page), 200))],
+        ['12 bookings', 'FastJSONRenderer ({})'.format(compact),
+         '{:.3f}'.format(timed(lambda: FastJSONRenderer().render(booking_page), 200))],
+        ['10000 profiles', 'json.dumps', '{:.3f}'.format(timed(lambda: json.dumps(profile_list)))],
+        ['10000 profiles', 'ProfileJSONRenderer ({})'.format(spaced),
+         '{:.3f}'.format(timed(lambda: ProfileJSONRenderer().render(profile_list)))],
+    ]
+    report('Render time, median ms', ['response', 'renderer', 'ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
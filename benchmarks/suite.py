@@ -0,0 +1,399 @@
+"""
+Serves every endpoint of the flights, authentication and profiles APIs
+from a seeded dataset and reports the p50, p95 and p99 latency, the
+throughput and the queries per request of each. Every simulated user logs
+in once and reuses their token. The results are written to a JSON file,
+benchmarks/results/<commit>.json by default, so runs of different
+commits can be compared.
+
+    python -m benchmarks.suite [--users 200] [--flights 50] [--bookings 2000] [--requests 30]
+    python -m benchmarks.suite --compare benchmarks/results/before.json benchmarks/results/after.json
+
+Requests go through Django's test client in a single process, so the
+numbers leave out the network and the WSGI server but are reproducible.
+Use locustfile.py to load a running server, after seeding the database it
+uses with `python manage.py seed_scale`.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import time
+from collections import OrderedDict, defaultdict
+
+from benchmarks.common import report, test_database
+from django.test import Client
+from django.urls import reverse
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.models import Flight
+from flightbooking.apps.flights.seats import book_seat
+from flightbooking.apps.flights.seeding import DESTINATIONS, PASSWORD, seed_dataset
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def seed(users, flights, bookings, sessions, requests, seed=None):
+    """
+    Seeds the dataset with seed_dataset(). The first user is staff, the
+    next sessions users are simulated and the others are logged out of.
+    """
+    if users < sessions + requests + 2:
+        raise SystemExit('Seed at least {} users'.format(sessions + requests + 2))
+    try:
+        seed_dataset(users, flights, bookings, seed=seed)
+    except ValueError as error:
+        raise SystemExit(error)
+    return list(User.objects.order_by('pk')), list(Flight.objects.order_by('flight_id'))
+
+
+class Session:
+    """
+    A simulated user, logged in once.
+    """
+
+    def __init__(self, client, user):
+        self.user = user
+        response = client.post(
+            reverse('authentication:user-login'),
+            json.dumps({'user': {'email': user.email, 'password': PASSWORD}}), content_type='application/json')
+        body = json.loads(response.content)['user']
+        self.token, self.refresh_token = body['token'], body['refresh_token']
+
+
+class Run:
+    """
+    Times requests, keeping their durations and query counts by endpoint.
+    """
+
+    def __init__(self, travellers, flights, sessions, rng):
+        self.client = Client()
+        self.travellers, self.flights, self.rng = travellers, flights, rng
+        self.staff = Session(self.client, travellers[0])
+        self.sessions = [Session(self.client, traveller) for traveller in travellers[1:sessions + 1]]
+        # travellers without a session, to log out
+        self.idle = iter(travellers[sessions + 1:])
+        self.samples = defaultdict(list)
+        self.endpoint = None
+        self.counter = 0
+
+    def session(self):
+        return self.rng.choice(self.sessions)
+
+    def flight(self):
+        return self.rng.choice(self.flights)
+
+    def unique(self):
+        self.counter += 1
+        return self.counter
+
+    def request(self, method, path, data=None, session=None, query='', token=None):
+        if session is not None:
+            token = session.token
+        headers = {'HTTP_AUTHORIZATION': 'Token {}'.format(token)} if token else {}
+        if data is not None:
+            data = json.dumps(data)
+        start = time.perf_counter()
+        response = getattr(self.client, method)(
+            path + query, data, content_type='application/json', **headers)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        duration = time.perf_counter() - start
+        if self.endpoint is not None:
+            queries = QUERIES.search(response.get('Server-Timing', ''))
+            self.samples[self.endpoint].append(
+                (duration, int(queries.group(1)) if queries else None, response.status_code))
+        return response
+
+
+def register(run):
+    index = run.unique()
+    run.request('post', reverse('authentication:user-register'), {'user': {
+        'username': 'newcomer{}'.format(index), 'email': 'newcomer{}@gmail.com'.format(index),
+        'password': PASSWORD}})
+
+
+def login(run):
+    user = run.session().user
+    run.request('post', reverse('authentication:user-login'), {'user': {'email': user.email, 'password': PASSWORD}})
+
+
+def refresh_token(run):
+    session = run.session()
+    response = run.request('post', reverse('authentication:token-refresh'), {'refresh_token': session.refresh_token})
+    body = json.loads(response.content)['user']
+    session.token, session.refresh_token = body['token'], body['refresh_token']
+
+
+def logout(run):
+    # tokens issued within the same second are the same, log out a
+    # traveller no session is using
+    user = next(run.idle)
+    run.request('delete', reverse('authentication:logout'), {}, token=user.token)
+
+
+def get_user(run):
+    run.request('get', reverse('authentication:user-retrieve-update'), session=run.session())
+
+
+def update_user(run):
+    session = run.session()
+    run.request('put', reverse('authentication:user-retrieve-update'), {'user': {
+        'username': session.user.username}}, session)
+
+
+def list_profiles(run):
+    run.request('get', reverse('profiles:get-profiles'), session=run.session())
+
+
+def get_profile(run):
+    username = run.rng.choice(run.travellers).username
+    run.request('get', reverse('profiles:profiles', kwargs={'username': username}), session=run.session())
+
+
+def update_profile(run):
+    session = run.session()
+    run.request('put', reverse('profiles:profiles', kwargs={'username': session.user.username}), {}, session)
+
+
+def list_flights(run):
+    run.request('get', reverse('flights:flights-list'), session=run.session(), query='?page={}'.format(
+        run.rng.randint(1, 3)))
+
+
+def search_flights(run):
+    run.request('get', reverse('flights:flights-search'), session=run.session(), query='?destination={}'.format(
+        run.rng.choice(DESTINATIONS)))
+
+
+def get_flight(run):
+    run.request('get', reverse('flights:flights-detail', kwargs={'flight_id': run.flight().flight_id}),
+                session=run.session())
+
+
+def create_flight(run):
+    run.request('post', reverse('flights:flights-list'), {'flight': {
+        'name': 'New flight {}'.format(run.unique()), 'destination': 'City 1', 'departure_date': '2030-01-01',
+        'departure_time': '09:30', 'seat_rows': 30, 'seat_columns': 'ABCDEF'}}, run.staff)
+
+
+def update_flight(run):
+    run.request('put', reverse('flights:flights-detail', kwargs={'flight_id': run.flight().flight_id}), {
+        'flight': {'destination': run.rng.choice(DESTINATIONS)}}, run.staff)
+
+
+def delete_flight(run):
+    flight = Flight.objects.create(
+        name='Doomed flight {}'.format(run.unique()), destination='City 1',
+        departure_date=datetime.date(2030, 1, 1), departure_time=datetime.time(9, 30))
+    run.request('delete', reverse('flights:flights-detail', kwargs={'flight_id': flight.flight_id}),
+                session=run.staff)
+
+
+def import_flights(run):
+    batch = run.unique()
+    run.request('post', reverse('flights:flights-bulk'), {'flights': [
+        {'name': 'Imported flight {}-{}'.format(batch, index), 'destination': 'City 2',
+         'departure_date': '2030-01-01', 'departure_time': '09:30'}
+        for index in range(10)
+    ]}, run.staff)
+
+
+def list_bookings(run):
+    run.request('get', reverse('flights:bookings', kwargs={'flight_id': run.flight().flight_id}),
+                session=run.session())
+
+
+def create_booking(run):
+    run.request('post', reverse('flights:bookings', kwargs={'flight_id': run.flight().flight_id}),
+                {'booking': {'auto_assign': True}}, run.session())
+
+
+def booking_path(run, session):
+    flight = run.flight()
+    booking = book_seat(flight, session.user)
+    return reverse('flights:booking', kwargs={'flight_id': flight.flight_id, 'pk': booking.pk})
+
+
+def get_booking(run):
+    session = run.session()
+    run.request('get', booking_path(run, session), session=session)
+
+
+def update_booking(run):
+    session = run.session()
+    run.request('put', booking_path(run, session), {'booking': {}}, session)
+
+
+def delete_booking(run):
+    session = run.session()
+    run.request('delete', booking_path(run, session), session=session)
+
+
+def book_group(run):
+    run.request('post', reverse('flights:bookings-bulk', kwargs={'flight_id': run.flight().flight_id}), {
+        'bookings': [{'auto_assign': True}] * 3}, run.session())
+
+
+def cancel_group(run):
+    session, flight = run.session(), run.flight()
+    booking_ids = [book_seat(flight, session.user).pk for _ in range(3)]
+    run.request('delete', reverse('flights:bookings-bulk', kwargs={'flight_id': flight.flight_id}), {
+        'booking_ids': booking_ids}, session)
+
+
+def manifest(run):
+    run.request('get', reverse('flights:bookings-manifest', kwargs={'flight_id': run.flight().flight_id}),
+                session=run.staff)
+
+
+ENDPOINTS = OrderedDict([
+    ('POST authentication:user-register', register),
+    ('POST authentication:user-login', login),
+    ('POST authentication:token-refresh', refresh_token),
+    ('DELETE authentication:logout', logout),
+    ('GET authentication:user-retrieve-update', get_user),
+    ('PUT authentication:user-retrieve-update', update_user),
+    ('GET profiles:get-profiles', list_profiles),
+    ('GET profiles:profiles', get_profile),
+    ('PUT profiles:profiles', update_profile),
+    ('GET flights:flights-list', list_flights),
+    ('GET flights:flights-search', search_flights),
+    ('GET flights:flights-detail', get_flight),
+    ('POST flights:flights-list', create_flight),
+    ('PUT flights:flights-detail', update_flight),
+    ('DELETE flights:flights-detail', delete_flight),
+    ('POST flights:flights-bulk', import_flights),
+    ('GET flights:bookings', list_bookings),
+    ('POST flights:bookings', create_booking),
+    ('GET flights:booking', get_booking),
+    ('PUT flights:booking', update_booking),
+    ('DELETE flights:booking', delete_booking),
+    ('POST flights:bookings-bulk', book_group),
+    ('DELETE flights:bookings-bulk', cancel_group),
+    ('GET flights:bookings-manifest', manifest),
+])
+
+
+def percentile(values, percent):
+    """
+    The nearest rank percentile of sorted values.
+    """
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+
+def summarize(samples):
+    durations = sorted(duration for duration, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    return OrderedDict([
+        ('requests', len(samples)),
+        ('errors', sum(1 for _, _, status in samples if status >= 400)),
+        ('p50_ms', round(percentile(durations, 50) * 1000, 3)),
+        ('p95_ms', round(percentile(durations, 95) * 1000, 3)),
+        ('p99_ms', round(percentile(durations, 99) * 1000, 3)),
+        ('mean_ms', round(sum(durations) / len(durations) * 1000, 3)),
+        ('requests_per_second', round(len(durations) / sum(durations), 1)),
+        ('queries_per_request', round(sum(queries) / len(queries), 2) if queries else None),
+    ])
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_suite(options):
+    rng = random.Random(options.seed)
+    with test_database():
+        travellers, flights = seed(
+            options.users, options.flights, options.bookings, options.sessions, options.requests, options.seed)
+        run = Run(travellers, flights, options.sessions, rng)
+        for endpoint, send in ENDPOINTS.items():
+            # the first request warms up caches and is not counted
+            send(run)
+            run.endpoint = endpoint
+            for _ in range(options.requests):
+                send(run)
+            run.endpoint = None
+
+    endpoints = OrderedDict((endpoint, summarize(samples)) for endpoint, samples in run.samples.items())
+    return OrderedDict([
+        ('commit', options.commit),
+        ('created_at', datetime.datetime.now(datetime.timezone.utc).isoformat()),
+        ('python', platform.python_version()),
+        ('dataset', OrderedDict([
+            ('users', options.users), ('flights', options.flights), ('bookings', options.bookings),
+            ('sessions', options.sessions), ('seed', options.seed)])),
+        ('requests_per_endpoint', options.requests),
+        ('total', summarize([sample for samples in run.samples.values() for sample in samples])),
+        ('endpoints', endpoints),
+    ])
+
+
+def print_results(results):
+    columns = ['endpoint', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries', 'errors']
+    rows = [
+        [endpoint, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['requests_per_second'],
+         stats['queries_per_request'], stats['errors']]
+        for endpoint, stats in list(results['endpoints'].items()) + [('total', results['total'])]
+    ]
+    report('Commit {}, {} requests per endpoint'.format(results['commit'], results['requests_per_endpoint']),
+           columns, rows)
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    def change(old, new):
+        return '{:+.0%}'.format(new / old - 1) if old else '-'
+
+    rows = []
+    for endpoint, stats in after['endpoints'].items():
+        old = before['endpoints'].get(endpoint)
+        if old is None:
+            continue
+        rows.append([
+            endpoint, old['p50_ms'], stats['p50_ms'], change(old['p50_ms'], stats['p50_ms']),
+            old['p95_ms'], stats['p95_ms'], change(old['p95_ms'], stats['p95_ms']),
+            old['queries_per_request'], stats['queries_per_request'],
+        ])
+    report('{} against {}'.format(after['commit'], before['commit']),
+           ['endpoint', 'p50 before', 'p50 after', 'p50', 'p95 before', 'p95 after', 'p95',
+            'queries before', 'queries after'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--flights', type=int, default=50)
+    parser.add_argument('--bookings', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=20, help='simulated users, each logs in once')
+    parser.add_argument('--requests', type=int, default=30, help='timed requests per endpoint')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='defaults to benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two results files')
+    options = parser.parse_args()
+    if options.compare:
+        compare(*options.compare)
+        return
+
+    options.commit = current_commit()
+    results = run_suite(options)
+    print_results(results)
+    output = options.output or os.path.join(os.path.dirname(__file__), 'results', '{}.json'.format(options.commit))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print('\nResults written to {}'.format(output))
+
+
+if __name__ == '__main__':
+    main()
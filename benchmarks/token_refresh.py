@@ -0,0 +1,49 @@
+"""
+Compares how many requests per second a single process serves when
+clients renew their session by logging in again, which hashes the
+password, and by exchanging a refresh token, which does not.
+
+    python -m benchmarks.token_refresh [requests]
+"""
+import json
+import sys
+
+from benchmarks.common import report, requests_per_second, test_database
+from django.test import Client
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.profiles.models import Profile
+
+CREDENTIALS = {"email": "benchmark@gmail.com", "password": "password1U@#}"}
+
+
+def main(requests):
+    with test_database():
+        user = User.objects.create_user("benchmark", CREDENTIALS['email'], CREDENTIALS['password'])
+        User.objects.filter(pk=user.pk).update(is_active=True)
+        Profile.objects.create(user=user)
+        client = Client()
+
+        def login():
+            response = client.post(
+                '/api/users/login/', json.dumps({"user": CREDENTIALS}), content_type='application/json')
+            return json.loads(response.content)['user']['refresh_token']
+
+        refresh_token = login()
+
+        def refresh():
+            nonlocal refresh_token
+            response = client.post(
+                '/api/users/token/refresh/', json.dumps({"refresh_token": refresh_token}),
+                content_type='application/json')
+            refresh_token = json.loads(response.content)['user']['refresh_token']
+
+        rows = [
+            ['login', requests, '{:.1f}'.format(requests_per_second(login, requests))],
+            ['refresh', requests, '{:.1f}'.format(requests_per_second(refresh, requests))],
+        ]
+    report('Session renewal, one process', ['endpoint', 'requests', 'requests/s'], rows)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
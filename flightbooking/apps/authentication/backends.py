@@ -1,10 +1,15 @@
 import jwt
 
 from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
 
 from rest_framework import authentication, exceptions
 
-from .models import User, BlacklistedToken
+from flightbooking.apps.core.metrics import Counter
+from .models import User
+from .revocation import is_token_revoked
+
+AUTH_FAILURES = Counter('auth_failures_total', 'Requests refused by JWTAuthentication, by reason.', ['reason'])
 
 class JWTAuthentication(authentication.BaseAuthentication): # NOQA
     """ JWTAuthenticattion implement authentication
@@ -26,34 +31,78 @@ class JWTAuthentication(authentication.BaseAuthentication): # NOQA
             return None
 
         if len(auth_header) == 1:
-                raise exceptions.AuthenticationFailed('Invalid token header. No credentials provided.')
+                raise self.failed('invalid_header', 'Invalid token header. No credentials provided.')
         elif len(auth_header) > 2:
-            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
+            raise self.failed('invalid_header', 'Invalid token header. Token string should not contain spaces.')
         return self.authenticate_credentials(request, auth_header[1].decode())
 
     def authenticate_credentials(self, request, token): # NOQA
         """
         authenticate the given credentials. If authentication is
         successful, return the user and token. If not, throw an error.
+        In stateless mode the user is built from the token's claims, so
+        unless the token may have been revoked no query is run.
         """
 
-        if BlacklistedToken.objects.filter(token=token).first():
-                raise exceptions.AuthenticationFailed('Token is blacklisted')
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY)
-        except Exception as e:
-            if e.__class__.__name__ == 'DecodeError':
-                raise exceptions.AuthenticationFailed('Cannot decode token')
-            elif e.__class__.__name__ == "ExpiredSignatureError":
-                raise exceptions.AuthenticationFailed('Token has expired')
-            else:
-                raise exceptions.AuthenticationFailed(str(e))
+        if settings.JWT_STATELESS_AUTHENTICATION:
+            payload = self.decode_token(token)
+            if is_token_revoked(token, payload):
+                raise self.failed('revoked', 'Token is blacklisted')
+            if 'id' not in payload:
+                raise self.failed('unknown_user', 'No user Found')
+            return User.from_token_claims(payload), token
+
+        if is_token_revoked(token):
+                raise self.failed('revoked', 'Token is blacklisted')
+        payload = self.decode_token(token)
 
         try:
             user = User.objects.get(pk=payload['id'])
         except User.DoesNotExist:
-            raise exceptions.AuthenticationFailed('No user Found')
+            raise self.failed('unknown_user', 'No user Found')
         # if not user.is_active:
         #     raise exceptions.AuthenticationFailed('User has been deactivated')
 
         return user, token
+
+    def failed(self, reason, message):
+        """
+        Counts a refused request by reason and returns the error to raise.
+        """
+        AUTH_FAILURES.labels(reason).inc()
+        return exceptions.AuthenticationFailed(message)
+
+    def decode_token(self, token):
+        try:
+            return jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        except Exception as e:
+            if e.__class__.__name__ == 'DecodeError':
+                raise self.failed('undecodable', 'Cannot decode token')
+            elif e.__class__.__name__ == "ExpiredSignatureError":
+                raise self.failed('expired', 'Token has expired')
+            else:
+                raise self.failed('invalid', str(e))
+
+
+class EmailProfileBackend(ModelBackend):
+    """
+    Authenticates by email and password like ModelBackend, loading the
+    user together with their profile so the login response needs no
+    further queries.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User.objects.select_related('profile').get(email=username)
+        except User.DoesNotExist:
+            # hash the password anyway so missing users take as long to
+            # reject as wrong passwords
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the work factor taken from
+    PASSWORD_HASH_ITERATIONS. Hashes keep the pbkdf2_sha256 algorithm name,
+    so existing passwords still verify, and a password hashed with a
+    different number of iterations is rehashed when its user logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
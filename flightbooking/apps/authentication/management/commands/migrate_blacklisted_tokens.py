@@ -0,0 +1,49 @@
+import jwt
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flightbooking.apps.authentication.models import BlacklistedToken, RevokedToken
+from flightbooking.apps.authentication.revocation import get_revocation_filter, token_expiry, token_fingerprint
+
+
+class Command(BaseCommand):
+    help = 'Moves blacklisted tokens into the revoked token store, skipping expired tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Delete the blacklisted tokens once they have been moved.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch, moved, skipped = [], 0, 0
+        for token in BlacklistedToken.objects.values_list('token', flat=True).iterator():
+            try:
+                expires_at = token_expiry(token)
+            except jwt.DecodeError:
+                skipped += 1
+                continue
+            if expires_at <= now:
+                skipped += 1
+                continue
+            batch.append(RevokedToken(fingerprint=token_fingerprint(token), expires_at=expires_at))
+            if len(batch) >= options['batch_size']:
+                moved += self.save(batch)
+                batch = []
+        moved += self.save(batch)
+
+        if options['delete']:
+            BlacklistedToken.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS(
+            'Moved {} tokens, skipped {} expired or invalid tokens'.format(moved, skipped)))
+
+    def save(self, batch):
+        RevokedToken.objects.bulk_create(batch, ignore_conflicts=True)
+        # a shared filter is only rebuilt when it is missing, add the tokens
+        # to it or they would be accepted until they expire
+        revocation_filter = get_revocation_filter()
+        if revocation_filter is not None:
+            for revoked in batch:
+                revocation_filter.add(revoked.fingerprint)
+        return len(batch)
@@ -4,9 +4,14 @@ from django.contrib.auth.models import (
 
 import jwt
 import os
+import time
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.db import models
+from django.db import models, router
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from rest_framework import exceptions
 
 
 class UserManager(BaseUserManager):
@@ -35,6 +40,10 @@ class UserManager(BaseUserManager):
         return user
 
 
+# claims copied from a decoded token onto the user it identifies
+TOKEN_CLAIM_FIELDS = ('id', 'username', 'email', 'is_staff')
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     username = models.CharField(db_index=True, max_length=255, unique=True)
     email = models.EmailField(db_index=True, unique=True)
@@ -68,15 +77,107 @@ class User(AbstractBaseUser, PermissionsMixin):
                 "id": self.pk,
                 "username": self.get_full_name,
                 "email": self.email,
-                "iat": datetime.utcnow(),
+                "is_staff": self.is_staff,
+                # to the microsecond, so tokens issued right after a user's
+                # tokens were revoked are told apart from the revoked ones
+                "iat": time.time(),
                 "exp": datetime.utcnow() + timedelta(minutes=int(os.getenv('TIME_DELTA')))
             },
             settings.SECRET_KEY, algorithm='HS256').decode()
         return token
 
+    @classmethod
+    def from_token_claims(cls, payload):
+        """
+        Builds a user from the signed claims of a token without querying
+        the database. Fields that are not carried by the token are deferred
+        and loaded from the database the first time they are accessed.
+        :param payload: dict
+        :return: User
+        """
+        fields = cls._meta.concrete_fields
+        values = [
+            payload[field.attname]
+            if field.attname in TOKEN_CLAIM_FIELDS and field.attname in payload else DEFERRED
+            for field in fields
+        ]
+        user = cls.from_db(router.db_for_read(cls), [field.attname for field in fields], values)
+        user.from_token = True
+        return user
+
+    def refresh_from_db(self, using=None, fields=None):
+        try:
+            super().refresh_from_db(using, fields)
+        except User.DoesNotExist:
+            # the user of a token was deleted while the request was served
+            if getattr(self, 'from_token', False):
+                raise exceptions.AuthenticationFailed('No user Found')
+            raise
+
+    def save(self, *args, **kwargs):
+        claims_changed = self.token_claims_changed(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+        if claims_changed:
+            from .revocation import revoke_user_tokens
+            revoke_user_tokens(self.pk)
+
+    def token_claims_changed(self, update_fields=None):
+        """
+        Checks whether saving the user changes claims carried by the tokens
+        already issued to them, in which case those tokens are revoked.
+        :return: bool
+        """
+        if self._state.adding or self.pk is None:
+            return False
+        claims = [
+            name for name in TOKEN_CLAIM_FIELDS
+            if name != 'id' and name in self.__dict__ and (update_fields is None or name in update_fields)
+        ]
+        if not claims:
+            return False
+        stored = User.objects.filter(pk=self.pk).values(*claims).first()
+        return stored is not None and any(stored[name] != getattr(self, name) for name in claims)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    from .revocation import revoke_user_tokens
+    revoke_user_tokens(instance.pk)
+
 
 class BlacklistedToken(models.Model):
-    """this class stores blacklisted token"""
+    """
+    this class stores blacklisted token. It is no longer written to,
+    revoked tokens are kept in RevokedToken. Existing rows are moved over
+    by the migrate_blacklisted_tokens command.
+    """
 
     token = models.CharField(max_length=500)
     timestamp = models.DateTimeField(auto_now=True)
+
+
+class RevokedToken(models.Model):
+    """
+    Stores the fingerprint of a revoked token until the token expires,
+    expired rows are purged by a periodic task.
+    """
+
+    fingerprint = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+
+class RefreshToken(models.Model):
+    """
+    A refresh token, stored as the digest of the token. Every refresh
+    replaces the token with a new one of the same family. A used token
+    presented again means it leaked, and its whole family is revoked.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    family = models.CharField(max_length=32, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    used_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
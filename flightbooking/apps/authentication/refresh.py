@@ -0,0 +1,95 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RefreshToken
+from .revocation import token_fingerprint
+
+
+class InvalidRefreshToken(Exception):
+    """
+    Raised when a refresh token cannot be used, the message says why.
+    """
+
+
+def issue_refresh_token(user, family=None):
+    """
+    Creates a refresh token for a user. Only its digest is stored, the
+    token itself is returned to be handed to the client.
+    :param user: User
+    :param family: str, the family of the token being replaced, if any
+    :return: str
+    """
+    token = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        token_hash=token_fingerprint(token),
+        family=family or secrets.token_hex(16),
+        expires_at=timezone.now() + timedelta(days=settings.REFRESH_TOKEN_LIFETIME_DAYS))
+    return token
+
+
+def rotate_refresh_token(token):
+    """
+    Exchanges a refresh token for a new one. The token is looked up once
+    by its digest together with its user, so the caller can mint an
+    access token without hashing a password. A revocation caused by a
+    reused token must stick, so this does not run in a transaction.
+    :param token: str
+    :return: (User, str), the token's user and the new refresh token
+    """
+    refresh_token = RefreshToken.objects.select_related('user').filter(
+        token_hash=token_fingerprint(token)).first()
+    if refresh_token is None:
+        raise InvalidRefreshToken('Invalid refresh token')
+    if refresh_token.revoked_at is not None:
+        raise InvalidRefreshToken('This refresh token has been revoked')
+    if refresh_token.expires_at <= timezone.now():
+        raise InvalidRefreshToken('This refresh token has expired')
+
+    # only one of several concurrent refreshes can mark the token used
+    used = RefreshToken.objects.filter(pk=refresh_token.pk, used_at__isnull=True).update(used_at=timezone.now())
+    if not used:
+        revoke_refresh_token_family(refresh_token.family)
+        raise InvalidRefreshToken('This refresh token has already been used')
+    return refresh_token.user, issue_refresh_token(refresh_token.user, refresh_token.family)
+
+
+def revoke_refresh_token_family(family):
+    """
+    Revokes every token of a family, including the one that replaced the
+    token presented last.
+    """
+    RefreshToken.objects.filter(family=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+
+
+def revoke_refresh_token(token):
+    """
+    Revokes a refresh token and the tokens that replaced it.
+    :param token: str
+    :return: bool, False if there is no such token
+    """
+    family = RefreshToken.objects.filter(token_hash=token_fingerprint(token)).values_list('family', flat=True).first()
+    if family is None:
+        return False
+    revoke_refresh_token_family(family)
+    return True
+
+
+def revoke_user_refresh_tokens(user):
+    """
+    Revokes every refresh token of a user, for instance once their
+    password changes.
+    """
+    RefreshToken.objects.filter(user=user, revoked_at__isnull=True).update(revoked_at=timezone.now())
+
+
+def purge_expired_refresh_tokens():
+    """
+    Deletes refresh tokens that have expired, they can no longer be used.
+    :return: int, the number of tokens deleted
+    """
+    deleted, _ = RefreshToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,17 +1,9 @@
-import json
+from flightbooking.apps.core.renderers import FastJSONRenderer
 
-from rest_framework.renderers import JSONRenderer
 
-
-class UserJSONRenderer(JSONRenderer):
-    charset = 'utf-8'
-
-    def render(self, data, media_type=None, render_context=None):
-        errors = data.get('errors', None)
-
-        if errors is not None:
-            return super().render(data)
-
-        return json.dumps({
-            'user': data
-        })
\ No newline at end of file
+class UserJSONRenderer(FastJSONRenderer):
+    """
+    Namespaces user responses under 'user'.
+    """
+    envelope = 'user'
+    spaced = True
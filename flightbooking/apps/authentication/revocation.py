@@ -0,0 +1,284 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+# ids are allocated when a revoked token is inserted but become visible
+# when its transaction commits, possibly after higher ids, so refreshes
+# re-read the last REFRESH_ID_OVERLAP ids
+REFRESH_ID_OVERLAP = 1000
+# how long after its revoked_at a revoked token may still be committing
+COMMIT_MARGIN = timedelta(minutes=1)
+
+
+def token_fingerprint(token):
+    """
+    Returns a fixed length digest of a token, used to key revoked tokens
+    without storing the token itself.
+    :param token: str
+    :return: str
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def user_fingerprint(user_id):
+    """
+    Returns the fingerprint under which every token of a user issued up to
+    a point in time is revoked.
+    :param user_id: int
+    :return: str
+    """
+    return token_fingerprint('user:{}'.format(user_id))
+
+
+def token_expiry(token):
+    """
+    Returns when a token expires, read from its (unverified) exp claim.
+    Tokens without an exp claim expire TIME_DELTA minutes from now.
+    :param token: str
+    :return: datetime
+    """
+    payload = jwt.decode(token, verify=False)
+    if 'exp' in payload:
+        return datetime.fromtimestamp(payload['exp'], timezone.utc)
+    return timezone.now() + timedelta(minutes=int(os.getenv('TIME_DELTA')))
+
+
+class BloomFilter:
+    """
+    A fixed size bloom filter over token fingerprints. It never reports a
+    fingerprint that was added as missing, and reports a missing one as
+    present with a probability of about error_rate while holding at most
+    capacity fingerprints.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+
+    def positions(self, fingerprint):
+        # the fingerprint is already a sha256 digest, slice it and derive
+        # the remaining positions by double hashing
+        first = int(fingerprint[:16], 16)
+        second = int(fingerprint[16:32], 16) | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+
+class MemoryRevocationFilter(BloomFilter):
+    """
+    A bloom filter held by each process. Tokens revoked by other processes
+    are picked up from the database every TOKEN_REVOCATION_FILTER_REFRESH
+    seconds and the filter is rebuilt every TOKEN_REVOCATION_FILTER_REBUILD
+    seconds to drop purged tokens.
+    """
+
+    def __init__(self, capacity, error_rate):
+        super().__init__(capacity, error_rate)
+        self.lock = threading.Lock()
+        self.bits = None
+        self.last_id = 0
+        self.refreshed_at = 0
+        self.built_at = 0
+
+    def add(self, fingerprint):
+        self.refresh()
+        for position in self.positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint):
+        self.refresh()
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(fingerprint))
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.bits is not None and now - self.refreshed_at < settings.TOKEN_REVOCATION_FILTER_REFRESH:
+            return
+        with self.lock:
+            if self.bits is not None and now - self.refreshed_at < settings.TOKEN_REVOCATION_FILTER_REFRESH:
+                return
+            if self.bits is None or now - self.built_at >= settings.TOKEN_REVOCATION_FILTER_REBUILD:
+                bits, last_id = bytearray((self.size + 7) // 8), 0
+                self.built_at = now
+            else:
+                bits, last_id = self.bits, self.last_id
+            revoked = RevokedToken.objects.filter(pk__gt=last_id - REFRESH_ID_OVERLAP).order_by('pk').values_list(
+                'pk', 'fingerprint')
+            for pk, fingerprint in revoked.iterator():
+                for position in self.positions(fingerprint):
+                    bits[position >> 3] |= 1 << (position & 7)
+                last_id = max(last_id, pk)
+            self.bits, self.last_id, self.refreshed_at = bits, last_id, now
+
+
+class RedisRevocationFilter(BloomFilter):
+    """
+    A bloom filter kept as a Redis bitmap and shared by every process, so
+    a revocation is seen everywhere as soon as it is made.
+    """
+
+    key = 'revoked-tokens:bloom'
+
+    def __init__(self, capacity, error_rate):
+        super().__init__(capacity, error_rate)
+        self.client = redis.StrictRedis.from_url(settings.TOKEN_REVOCATION_REDIS_URL)
+
+    def add(self, fingerprint):
+        pipeline = self.client.pipeline()
+        for position in self.positions(fingerprint):
+            pipeline.setbit(self.key, position, 1)
+        pipeline.execute()
+
+    def __contains__(self, fingerprint):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.exists(self.key)
+        for position in self.positions(fingerprint):
+            pipeline.getbit(self.key, position)
+        exists, *bits = pipeline.execute()
+        if not exists:
+            self.rebuild()
+            return fingerprint in self
+        return all(bits)
+
+    def rebuild(self):
+        """
+        Builds the bitmap from the revoked tokens under a temporary key and
+        swaps it in, so lookups never see a partially built filter. Tokens
+        revoked while it was built may only have been added to the bitmap
+        it replaced, they are added again once it is swapped in.
+        """
+        started_at = timezone.now()
+        building = '{}:building:{}'.format(self.key, os.getpid())
+        self.client.delete(building)
+        self.client.setbit(building, self.size - 1, 0)
+        pipeline = self.client.pipeline(transaction=False)
+        for fingerprint in RevokedToken.objects.values_list('fingerprint', flat=True).iterator():
+            for position in self.positions(fingerprint):
+                pipeline.setbit(building, position, 1)
+        pipeline.execute()
+        self.client.rename(building, self.key)
+        pipeline = self.client.pipeline(transaction=False)
+        recent = RevokedToken.objects.filter(revoked_at__gte=started_at - COMMIT_MARGIN)
+        for fingerprint in recent.values_list('fingerprint', flat=True).iterator():
+            for position in self.positions(fingerprint):
+                pipeline.setbit(self.key, position, 1)
+        pipeline.execute()
+
+
+FILTERS = {
+    'memory': MemoryRevocationFilter,
+    'redis': RedisRevocationFilter,
+}
+
+_revocation_filter = None
+
+
+def get_revocation_filter():
+    """
+    Returns the bloom filter configured by TOKEN_REVOCATION_FILTER, or None
+    when every lookup should go to the database.
+    """
+    global _revocation_filter
+    if _revocation_filter is None and settings.TOKEN_REVOCATION_FILTER:
+        _revocation_filter = FILTERS[settings.TOKEN_REVOCATION_FILTER](
+            settings.TOKEN_REVOCATION_FILTER_CAPACITY, settings.TOKEN_REVOCATION_FILTER_ERROR_RATE)
+    return _revocation_filter
+
+
+def revoke_token(token):
+    """
+    Records a token as revoked until it expires.
+    :param token: str
+    :return: bool, False if the token had already been revoked
+    """
+    fingerprint = token_fingerprint(token)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(fingerprint=fingerprint, expires_at=token_expiry(token))
+    except IntegrityError:
+        return False
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None:
+        revocation_filter.add(fingerprint)
+    return True
+
+
+def revoke_user_tokens(user_id):
+    """
+    Revokes every token issued to a user so far, for when the user is
+    deleted or claims carried by their tokens change. The revocation is
+    kept until the last of those tokens expires.
+    :param user_id: int
+    """
+    fingerprint = user_fingerprint(user_id)
+    now = timezone.now()
+    RevokedToken.objects.update_or_create(fingerprint=fingerprint, defaults={
+        'revoked_at': now, 'expires_at': now + timedelta(minutes=int(os.getenv('TIME_DELTA'))),
+    })
+    cache.set(fingerprint, now.timestamp(), settings.TOKEN_REVOCATION_FILTER_REFRESH)
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None:
+        revocation_filter.add(fingerprint)
+
+
+def user_tokens_revoked_at(user_id):
+    """
+    Returns when the tokens of a user were last revoked, as seconds since
+    the epoch, 0 if they never were. The time is cached for
+    TOKEN_REVOCATION_FILTER_REFRESH seconds so that the tokens the user
+    was issued since are not looked up on every request.
+    :param user_id: int
+    :return: float
+    """
+    fingerprint = user_fingerprint(user_id)
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None and fingerprint not in revocation_filter:
+        return 0
+    revoked_at = cache.get(fingerprint)
+    if revoked_at is None:
+        revoked_at = RevokedToken.objects.filter(fingerprint=fingerprint).values_list('revoked_at', flat=True).first()
+        revoked_at = revoked_at.timestamp() if revoked_at else 0
+        cache.set(fingerprint, revoked_at, settings.TOKEN_REVOCATION_FILTER_REFRESH)
+    return revoked_at
+
+
+def is_token_revoked(token, payload=None):
+    """
+    Checks whether a token has been revoked, by itself or, given its
+    decoded payload, with every token of its user issued before then. The
+    bloom filter answers for tokens that were never revoked, only possible
+    matches are looked up in the database.
+    :param token: str
+    :param payload: dict, the token's claims
+    :return: bool
+    """
+    if payload is not None and 'id' in payload and payload.get('iat', 0) < user_tokens_revoked_at(payload['id']):
+        return True
+    fingerprint = token_fingerprint(token)
+    revocation_filter = get_revocation_filter()
+    if revocation_filter is not None and fingerprint not in revocation_filter:
+        return False
+    return RevokedToken.objects.filter(fingerprint=fingerprint).exists()
+
+
+def purge_expired_tokens():
+    """
+    Deletes revoked tokens that have expired, they can no longer be used.
+    :return: int, the number of tokens deleted
+    """
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    revocation_filter = get_revocation_filter()
+    if deleted and isinstance(revocation_filter, RedisRevocationFilter):
+        revocation_filter.rebuild()
+    return deleted
@@ -2,9 +2,11 @@ import re
 
 from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
 
-from .models import User, BlacklistedToken
+from .models import User
 from flightbooking.apps.profiles.models import Profile
 
 email_expression = re.compile(
@@ -22,12 +24,14 @@ at_least_special_char = re.compile(
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
-    username = serializers.CharField(required=True)
-    email = serializers.EmailField(required=True, error_messages={
+    # the fields accept any string, the validate_* methods below check each
+    # of them once and report the first problem found with each field
+    username = serializers.CharField(required=True, allow_blank=True)
+    email = serializers.CharField(required=True, allow_blank=True, error_messages={
         "required": "Email is required"
     })
     password = serializers.CharField(
-        required=True, max_length=128, min_length=8, write_only=True)
+        required=True, allow_blank=True, write_only=True)
     token = serializers.CharField(read_only=True)
 
     class Meta:
@@ -38,65 +42,69 @@ class RegistrationSerializer(serializers.ModelSerializer):
         candidate_name = data
         try:
             if int(candidate_name):
-                raise serializers.ValidationError(
-                    {"username": ["Username cannot be numbers only"]})
+                raise serializers.ValidationError("Username cannot be numbers only")
         except ValueError:
             pass
         if candidate_name == "":
-            raise serializers.ValidationError(
-                {"username": ["Username is required!"]})
-        elif User.objects.filter(username=candidate_name):
-            raise serializers.ValidationError(
-                {"username": ["Username already exists"]})
+            raise serializers.ValidationError("Username is required!")
         elif len(candidate_name) < 4:
-            raise serializers.ValidationError(
-                {"username": ["Username should be more than 4 characters!"]})
+            raise serializers.ValidationError("Username should be more than 4 characters!")
         elif len(candidate_name) > 128:
-            raise serializers.ValidationError(
-                {"username": ["Username should not be longer than 128 characters"]})
+            raise serializers.ValidationError("Username should not be longer than 128 characters")
         return data
 
     def validate_email(self, data):
         candidate_email = data
         if candidate_email == "":
-            raise serializers.ValidationError({"email": ["Email is required!"]})
+            raise serializers.ValidationError("Email is required!")
         elif re.match(trial_email, candidate_email):
-            raise serializers.ValidationError({"email": ["Invalid email! Hint: example@mail.com"]})
+            raise serializers.ValidationError("Invalid email! Hint: example@mail.com")
         elif re.match(trial_email_2, candidate_email):
-            raise serializers.ValidationError({"email": ["Invalid email! Hint: example@mail.com"]})
-        elif User.objects.filter(email=candidate_email):
-            raise serializers.ValidationError({"email": ["User with provided email exists! Please login!"]})
+            raise serializers.ValidationError("Invalid email! Hint: example@mail.com")
         elif not re.match(email_expression, candidate_email):
-            raise serializers.ValidationError({"email": ["Invalid email! Hint: example@mail.com!"]})
+            raise serializers.ValidationError("Invalid email! Hint: example@mail.com!")
         return data
-        
+
     def validate_password(self, data):
         candidate_password = data
         if candidate_password == "":
-            raise serializers.ValidationError({
-                "password": ["Password is required!"]})
+            raise serializers.ValidationError("Password is required!")
         elif len(candidate_password) < 8:
-            raise serializers.ValidationError({
-                "password": ["Password should be at least eight (8) characters long!"]})
+            raise serializers.ValidationError("Password should be at least eight (8) characters long!")
         elif len(candidate_password) > 128:
-            raise serializers.ValidationError({
-                "password": ["Password should not be longer than (128) characters long!"]})
+            raise serializers.ValidationError("Password should not be longer than (128) characters long!")
         elif not re.match(at_least_number, candidate_password):
-            raise serializers.ValidationError({
-                "password": ["Password must have at least one number!"]})
+            raise serializers.ValidationError("Password must have at least one number!")
         elif not re.match(at_least_uppercase, candidate_password):
-            raise serializers.ValidationError({
-                "password": ["Password must have at least one uppercase letter!"]})
+            raise serializers.ValidationError("Password must have at least one uppercase letter!")
         elif not re.match(at_least_special_char, candidate_password):
-            raise serializers.ValidationError({
-                "password": ["Password must include a special character!"]})
+            raise serializers.ValidationError("Password must include a special character!")
         return data
 
     def create(self, validated_data):
-        user = User.objects.create_user(**validated_data)
-        Profile.objects.create(user=user)
+        # the unique indexes on username and email catch duplicates, only
+        # a failed insert looks up which of the two is taken
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(**validated_data)
+                Profile.objects.create(user=user)
+        except IntegrityError:
+            errors = self.uniqueness_errors(validated_data)
+            if not errors:
+                raise
+            raise serializers.ValidationError(errors)
         return user
 
+    def uniqueness_errors(self, data):
+        taken = User.objects.filter(
+            Q(username=data['username']) | Q(email=User.objects.normalize_email(data['email']))
+        ).values_list('username', flat=True)
+        if data['username'] in taken:
+            return {"username": ["Username already exists"]}
+        elif taken:
+            return {"email": ["User with provided email exists! Please login!"]}
+        return None
+
 
 class LoginSerializer(serializers.Serializer):
     email = serializers.CharField(max_length=255)
@@ -128,7 +136,9 @@ class LoginSerializer(serializers.Serializer):
         return {
             'email': user.email,
             'username': user.username,
-            'token': user.token
+            'token': user.token,
+            # carried to the view, loaded with the user's profile
+            'user': user
         }
 
 class UserSerializer(serializers.ModelSerializer):
@@ -159,11 +169,3 @@ class UserSerializer(serializers.ModelSerializer):
 
         return instance
 
-
-class LogoutSerializer(serializers.ModelSerializer):
-    """Performs logout serializer"""
-    token = serializers.CharField(max_length=500)
-
-    class Meta:
-        model = BlacklistedToken
-        fields = "__all__"
@@ -0,0 +1,20 @@
+from celery.task.schedules import crontab
+from celery.decorators import periodic_task
+from celery.utils.log import get_task_logger
+
+from flightbooking.apps.authentication.refresh import purge_expired_refresh_tokens
+from flightbooking.apps.authentication.revocation import purge_expired_tokens
+
+logger = get_task_logger(__name__)
+
+
+@periodic_task(
+    run_every=(crontab(minute=0)),
+    name="purge_revoked_tokens_task",
+    ignore_result=True)
+def task_purge_revoked_tokens():
+    """deletes revoked tokens and refresh tokens that have expired"""
+    deleted = purge_expired_tokens()
+    logger.info("Purged {} expired revoked tokens".format(deleted))
+    deleted = purge_expired_refresh_tokens()
+    logger.info("Purged {} expired refresh tokens".format(deleted))
@@ -1,5 +1,8 @@
 import json
 
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
@@ -73,6 +76,8 @@ class AuthenticatedTestCase(AuthenticationTestCase):
         :param user:
         :return:
         """
+        # a token revoked since it was set would fail the login request
+        self.logout()
         response = super().login(user)  # login the user
         self.client.credentials(HTTP_AUTHORIZATION="Token " + (json.loads(response.content))['user']['token'])
         return response
@@ -145,6 +150,20 @@ class RegistrationViewTestCase(AuthenticationTestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn(b'{"user": {"username": ["Username already exists"]}}', res.content)
 
+    def test_user_cannot_register_with_a_taken_email(self):
+        self.register()
+        self.user['user']['username'] = "beverly2"
+        res = self.register()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(b'{"user": {"email": ["User with provided email exists! Please login!"]}}', res.content)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_registration_does_not_query_for_uniqueness(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.register()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('SELECT')], [])
+
     def test_signup_without_username(self):
         """
         Test if a user can register without a username
@@ -295,4 +314,20 @@ class LoginViewTestCase(AuthenticationTestCase):
         res = self.login()
         self.assertIn(b'Invalid token header. Token string should not contain spaces', res.content)
 
+    def test_login_loads_the_user_and_profile_in_one_query(self):
+        self.register()
+        self.activate_user_make_staff()
+        # the user with their profile, then the refresh token
+        with self.assertNumQueries(2):
+            res = self.login()
+        self.assertEqual(json.loads(res.content)['user']['username'], self.user['user']['username'])
 
+    def test_login_rehashes_password_with_new_work_factor(self):
+        self.register()
+        self.activate_user_make_staff()
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            res = self.login()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        password = User.objects.get(email=self.user['user']['email']).password
+        self.assertEqual(password.split('$')[:2], ['pbkdf2_sha256', '1000'])
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
@@ -0,0 +1,72 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.hashers import get_hasher
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.authentication.models import RefreshToken
+from flightbooking.apps.authentication.tests.test_auth import AuthenticatedTestCase
+
+
+class RefreshTokenTestCase(AuthenticatedTestCase):
+    """
+    Tests exchanging refresh tokens for new access tokens
+    """
+
+    def setUp(self):
+        super().setUp()
+        response = super().login()
+        self.refresh_token = json.loads(response.content)['user']['refresh_token']
+        self.url_refresh = reverse("authentication:token-refresh")
+
+    def refresh(self, refresh_token=None):
+        return self.client.post(
+            self.url_refresh, data={"refresh_token": refresh_token or self.refresh_token}, format="json")
+
+    def test_login_returns_a_refresh_token(self):
+        self.assertTrue(self.refresh_token)
+        self.assertFalse(RefreshToken.objects.filter(token_hash=self.refresh_token).exists())
+
+    def test_refresh_returns_new_tokens(self):
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = json.loads(response.content)['user']
+        self.assertNotEqual(user['refresh_token'], self.refresh_token)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + user['token'])
+        self.assertEqual(self.get_authenticated_user().email, self.user['user']['email'])
+
+    def test_refresh_does_not_hash_the_password(self):
+        hasher = get_hasher()
+        calls = []
+        original = hasher.__class__.encode
+        hasher.__class__.encode = lambda self, *args: calls.append(args) or original(self, *args)
+        try:
+            with self.assertNumQueries(3):
+                self.refresh()
+        finally:
+            hasher.__class__.encode = original
+        self.assertEqual(calls, [])
+
+    def test_reused_refresh_token_revokes_its_family(self):
+        new_refresh_token = json.loads(self.refresh().content)['user']['refresh_token']
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn(b'already been used', response.content)
+        self.assertEqual(self.refresh(new_refresh_token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_refresh_token(self):
+        RefreshToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn(b'expired', response.content)
+
+    def test_invalid_refresh_token(self):
+        self.assertEqual(self.refresh("invalid").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_the_refresh_token(self):
+        self.client.delete(reverse("authentication:logout"), data={"refresh_token": self.refresh_token}, format="json")
+        response = self.refresh()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn(b'revoked', response.content)
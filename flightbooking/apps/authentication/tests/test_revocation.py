@@ -0,0 +1,73 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from flightbooking.apps.authentication.models import BlacklistedToken, RevokedToken, User
+from flightbooking.apps.authentication.revocation import (
+    REFRESH_ID_OVERLAP, MemoryRevocationFilter, get_revocation_filter, is_token_revoked, purge_expired_tokens,
+    revoke_token, token_fingerprint
+)
+
+
+class RevocationTestCase(TestCase):
+    """
+    Tests the revoked token store
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="revoked", email="revoked@gmail.com")
+
+    def test_revoked_token_is_revoked(self):
+        token = self.user.token
+        self.assertFalse(is_token_revoked(token))
+        self.assertTrue(revoke_token(token))
+        self.assertTrue(is_token_revoked(token))
+        self.assertFalse(revoke_token(token))
+
+    def test_filter_has_no_false_negatives(self):
+        revocation_filter = MemoryRevocationFilter(1000, 0.01)
+        fingerprints = [token_fingerprint(str(index)) for index in range(1000)]
+        for fingerprint in fingerprints:
+            revocation_filter.add(fingerprint)
+        self.assertTrue(all(fingerprint in revocation_filter for fingerprint in fingerprints))
+        false_positives = sum(token_fingerprint(str(-index)) in revocation_filter for index in range(1, 1001))
+        self.assertLess(false_positives, 50)
+
+    def test_purge_only_deletes_expired_tokens(self):
+        RevokedToken.objects.create(fingerprint="expired", expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(fingerprint="live", expires_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(purge_expired_tokens(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('fingerprint', flat=True)), ["live"])
+
+    # the filter picks up tokens written by other processes on refresh
+    @override_settings(TOKEN_REVOCATION_FILTER_REFRESH=0)
+    def test_blacklisted_tokens_are_migrated(self):
+        token = self.user.token
+        BlacklistedToken.objects.create(token=token)
+        BlacklistedToken.objects.create(token="not a token")
+        call_command('migrate_blacklisted_tokens', '--delete', stdout=StringIO())
+        self.assertTrue(is_token_revoked(token))
+        self.assertEqual(RevokedToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    @override_settings(TOKEN_REVOCATION_FILTER_REFRESH=60 * 60)
+    def test_migrated_tokens_are_added_to_the_filter(self):
+        token = self.user.token
+        self.assertNotIn(token_fingerprint(token), get_revocation_filter())
+        BlacklistedToken.objects.create(token=token)
+        call_command('migrate_blacklisted_tokens', stdout=StringIO())
+        self.assertIn(token_fingerprint(token), get_revocation_filter())
+
+    @override_settings(TOKEN_REVOCATION_FILTER_REFRESH=0)
+    def test_refresh_picks_up_tokens_committed_out_of_id_order(self):
+        revocation_filter = MemoryRevocationFilter(1000, 0.01)
+        expires_at = timezone.now() + timedelta(minutes=1)
+        RevokedToken.objects.create(pk=REFRESH_ID_OVERLAP, fingerprint=token_fingerprint("later"), expires_at=expires_at)
+        self.assertNotIn(token_fingerprint("earlier"), revocation_filter)
+        # an id allocated before the last one read, committed after it
+        RevokedToken.objects.create(
+            pk=REFRESH_ID_OVERLAP - 1, fingerprint=token_fingerprint("earlier"), expires_at=expires_at)
+        self.assertIn(token_fingerprint("earlier"), revocation_filter)
@@ -1,8 +1,10 @@
 import json
 
-from rest_framework import status
+from django.test import override_settings
+from rest_framework import exceptions, status
 from rest_framework.reverse import reverse
 
+from flightbooking.apps.authentication.models import User
 from flightbooking.apps.authentication.tests.test_auth import AuthenticatedTestCase
 
 
@@ -61,3 +63,56 @@ class UserRetrieveUpdateAPIViewTest(AuthenticatedTestCase):
         self.logout()
         response = self.client.put(reverse("authentication:user-retrieve-update"), data=self.userDetails, format="json")
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class StatelessAuthenticationTestCase(AuthenticatedTestCase):
+    """
+    Test that authenticated requests are served from the token's claims
+    """
+
+    @override_settings(TOKEN_REVOCATION_FILTER_REFRESH=60 * 60)
+    def test_authenticated_request_does_not_query_the_database(self):
+        # the first request loads the revoked token filter
+        self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['user']['email'], self.user['user']['email'])
+
+    def test_logged_out_token_is_rejected(self):
+        response = self.client.delete(reverse("authentication:logout"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn(b'Token is blacklisted', response.content)
+
+    def test_token_of_a_deleted_user_is_rejected(self):
+        self.get_current_user().delete()
+        response = self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_tokens_are_revoked_when_their_claims_change(self):
+        user = self.get_current_user()
+        user.is_staff = False
+        user.save()
+        response = self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # tokens issued after the change are accepted
+        self.login()
+        response = self.client.get(reverse("authentication:user-retrieve-update"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_changing_email_returns_a_token_with_the_new_email(self):
+        url = reverse("authentication:user-retrieve-update")
+        response = self.client.put(url, data={"user": {"email": "renamed@gmail.com"}}, format="json")
+        self.assertEqual(self.client.get(url, format="json").status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + json.loads(response.content)['user']['token'])
+        response = self.client.get(url, format="json")
+        self.assertEqual(json.loads(response.content)['user']['email'], "renamed@gmail.com")
+
+    def test_loading_a_deleted_user_fails_authentication(self):
+        user = User.from_token_claims({"id": 0, "username": "gone", "email": "gone@gmail.com", "is_staff": False})
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            user.last_login
@@ -5,7 +5,8 @@ from .views import (
     RegistrationAPIView,
     UserRetrieveUpdateAPIView,
     UsersAPIView,
-    LogoutView
+    LogoutView,
+    RefreshTokenAPIView
 )
 
 app_name = "authentication"
@@ -14,5 +15,6 @@ urlpatterns = [
     path('user/', UserRetrieveUpdateAPIView.as_view(), name="user-retrieve-update"),
     path('users/', RegistrationAPIView.as_view(), name="user-register"),
     path('users/login/', LoginAPIView.as_view(), name="user-login"),
+    path('users/token/refresh/', RefreshTokenAPIView.as_view(), name="token-refresh"),
     path('users/logout/', LogoutView.as_view(), name="logout"),
 ]
\ No newline at end of file
@@ -11,11 +11,17 @@ from .renderers import UserJSONRenderer
 
 
 from .serializers import (
-    LoginSerializer, RegistrationSerializer, UserSerializer, LogoutSerializer
+    LoginSerializer, RegistrationSerializer, UserSerializer
 )
 from flightbooking.apps.profiles.serializers import ProfileSerializer
-from .models import User, BlacklistedToken
+from .models import User
+from .refresh import (
+    InvalidRefreshToken, issue_refresh_token, revoke_refresh_token, revoke_user_refresh_tokens, rotate_refresh_token
+)
+from .revocation import revoke_token
 from flightbooking.apps.profiles.models import Profile
+from flightbooking.apps.profiles.pagination import ProfilePagination
+from flightbooking.apps.profiles.views import stream_profiles
 from rest_framework import authentication
 
 
@@ -28,10 +34,6 @@ class RegistrationAPIView(CreateAPIView):
         user = request.data.get('user', {})
 
         serializer = self.serializer_class(data=user)
-        serializer.validate_username(user["username"])
-        serializer.validate_email(user["email"])
-        serializer.validate_password(user["password"])
-
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
@@ -51,14 +53,41 @@ class LoginAPIView(CreateAPIView):
         serializer = self.serializer_class(data=user)
         serializer.is_valid(raise_exception=True)
 
-        user = User.objects.get(email=user['email'])
+        user = serializer.validated_data['user']
 
         resp = ProfileSerializer(user.profile).data
-        resp['token'] = serializer.data['token']
+        resp['token'] = serializer.validated_data['token']
+        resp['refresh_token'] = issue_refresh_token(user)
 
         return Response(resp, status=status.HTTP_200_OK)
 
 
+class RefreshTokenAPIView(APIView):
+    """
+    Exchanges a refresh token for a new access token and refresh token,
+    without asking for the password again.
+    """
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    renderer_classes = (UserJSONRenderer,)
+
+    def post(self, request, *args, **kwargs):
+        token = request.data.get('refresh_token')
+        if not token:
+            return Response({
+                'errors': 'A refresh token is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user, refresh_token = rotate_refresh_token(token)
+        except InvalidRefreshToken as e:
+            return Response({'errors': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({
+            'token': user.token,
+            'refresh_token': refresh_token
+        }, status=status.HTTP_200_OK)
+
+
 class UserRetrieveUpdateAPIView(RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
     renderer_classes = (UserJSONRenderer,)
@@ -72,31 +101,33 @@ class UserRetrieveUpdateAPIView(RetrieveUpdateAPIView):
     def update(self, request, *args, **kwargs):
         user = request.data.get('user', {})
 
+        # request.user may only carry the token's claims, load every
+        # field before saving so stale claims are not written back
         serializer = self.serializer_class(
-            request.user, data=user, partial=True
+            User.objects.get(pk=request.user.pk), data=user, partial=True
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        if 'password' in user:
+            revoke_user_refresh_tokens(request.user)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # changing the email or username revokes the tokens carrying the
+        # old ones, hand back a token with the new claims
+        return Response(dict(serializer.data, token=serializer.instance.token), status=status.HTTP_200_OK)
 
 
 class LogoutView(APIView):
     """this class logs out a user"""
 
     permission_classes = (IsAuthenticated,)
-    serializer_class = LogoutSerializer
 
     def delete(self, request):
         token = authentication.get_authorization_header(request).split()[
             1].decode()
-        data = request.data
-        data['token'] = token
-        if BlacklistedToken.objects.filter(token=token).first():
+        if request.data.get('refresh_token'):
+            revoke_refresh_token(request.data['refresh_token'])
+        if not revoke_token(token):
             return Response({"success": "You have already logged out"}, status=status.HTTP_400_BAD_REQUEST)
-        serializer = self.serializer_class(data=data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response({"success": "Succesfully logged out"}, status=status.HTTP_200_OK)
 
 
@@ -104,4 +135,11 @@ class UsersAPIView(ListAPIView):
     serializer_class = ProfileSerializer
     permission_classes = (AllowAny,)
     renderer_classes = (UserJSONRenderer,)
-    queryset = Profile.objects.all()
+    queryset = Profile.objects.select_related('user')
+    pagination_class = ProfilePagination
+    keyset_ordering = ('id',)
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') == 'true':
+            return stream_profiles(self.get_queryset())
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,85 @@
+import contextlib
+import threading
+import time
+from collections import Counter, defaultdict
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """
+    What a request spent its time on. durations are in seconds by name
+    ('db', 'serialize', 'render'), counts are of events like cache hits.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        # the timings in progress, nested timings of a name only count once
+        self.running = Counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record_query(self, execute, sql, params, many, context):
+        """
+        A database execute wrapper counting queries and their time.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations['db'] += time.perf_counter() - start
+
+
+def current_metrics():
+    """
+    :return: the RequestMetrics of the request being handled by this
+        thread, None outside of requests
+    """
+    return getattr(_local, 'metrics', None)
+
+
+@contextlib.contextmanager
+def collect_metrics():
+    """
+    Collects the metrics of everything done by this thread within the
+    block.
+    """
+    metrics, previous = RequestMetrics(), current_metrics()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+@contextlib.contextmanager
+def timing(name):
+    """
+    Adds the time spent within the block to the current request's
+    duration of name, it does nothing outside of requests.
+    """
+    metrics = current_metrics()
+    if metrics is None or metrics.running[name]:
+        yield
+        return
+    metrics.running[name] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - start
+        metrics.running[name] -= 1
+
+
+def count(name, amount=1):
+    """
+    Counts an event, e.g. a cache hit, against the current request.
+    """
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.counts[name] += amount
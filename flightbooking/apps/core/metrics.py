@@ -0,0 +1,315 @@
+"""
+Counters and histograms shared by every process of the application.
+
+Each thread of each process writes its samples to a store of its own, a
+memory mapped file in METRICS_DIR, so recording a sample takes no lock
+and never waits on another worker. The /metrics view adds up the stores
+of every process, gunicorn workers and celery workers alike, and
+renders them in the Prometheus text format. Without METRICS_DIR the
+stores are kept in memory and only cover the current process.
+
+Empty METRICS_DIR whenever the application is restarted, see
+clear_metrics_dir().
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+# name -> metric, for every metric defined in this process
+REGISTRY = OrderedDict()
+
+_length = struct.Struct('i')
+_value = struct.Struct('d')
+_local = threading.local()
+# the in memory stores of this process, when there is no METRICS_DIR
+_memory_stores = []
+_memory_stores_lock = threading.Lock()
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+class MmapStore:
+    """
+    Sample values by key in memory mapped bytes: the used length, then
+    entries of a key length, the key padded to 8 bytes and a float64
+    value. An entry is written before the used length is moved past it,
+    so readers never see half an entry. Only one thread writes to a
+    store.
+    """
+    initial_size = 64 * 1024
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pid = os.getpid()
+        self.positions = {}
+        if path is None:
+            self.file = None
+            self.buffer = mmap.mmap(-1, self.initial_size)
+        else:
+            self.file = open(path, 'a+b')
+            if os.fstat(self.file.fileno()).st_size == 0:
+                self.file.truncate(self.initial_size)
+            self.buffer = mmap.mmap(self.file.fileno(), 0)
+        self.used = _length.unpack_from(self.buffer, 0)[0] or 8
+        for key, _, position in read_entries(self.buffer, self.used):
+            self.positions[key] = position
+
+    def inc(self, key, amount):
+        position = self.positions.get(key)
+        if position is None:
+            position = self.add(key)
+        _value.pack_into(self.buffer, position, _value.unpack_from(self.buffer, position)[0] + amount)
+
+    def add(self, key):
+        encoded = key.encode()
+        size = 4 + _padded(len(encoded)) + 8
+        while self.used + size > len(self.buffer):
+            self.grow()
+        _length.pack_into(self.buffer, self.used, len(encoded))
+        self.buffer[self.used + 4:self.used + 4 + len(encoded)] = encoded
+        position = self.used + 4 + _padded(len(encoded))
+        _value.pack_into(self.buffer, position, 0.0)
+        self.used += size
+        _length.pack_into(self.buffer, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def grow(self):
+        size = len(self.buffer) * 2
+        if self.file is None:
+            buffer = mmap.mmap(-1, size)
+            buffer[:self.used] = self.buffer[:self.used]
+            self.buffer = buffer
+        else:
+            self.file.truncate(size)
+            self.buffer.close()
+            self.buffer = mmap.mmap(self.file.fileno(), 0)
+
+    def read(self):
+        """
+        :return: list of (key, value) pairs
+        """
+        return [(key, value) for key, value, _ in read_entries(self.buffer, self.used)]
+
+
+def read_entries(buffer, used):
+    """
+    Yields the (key, value, value position) of the entries of a store's
+    bytes, up to used.
+    """
+    position = 8
+    while position < used:
+        length = _length.unpack_from(buffer, position)[0]
+        key = bytes(buffer[position + 4:position + 4 + length]).decode()
+        position += 4 + _padded(length)
+        yield key, _value.unpack_from(buffer, position)[0], position
+        position += 8
+
+
+def thread_store():
+    """
+    Returns the store this thread writes its samples to, opening it on
+    first use and again in a forked process.
+    """
+    store = getattr(_local, 'store', None)
+    if store is None or store.pid != os.getpid():
+        directory = settings.METRICS_DIR
+        if directory:
+            store = MmapStore(os.path.join(
+                directory, 'metrics_{}_{}.db'.format(os.getpid(), threading.get_ident())))
+        else:
+            store = MmapStore()
+            with _memory_stores_lock:
+                _memory_stores.append(store)
+        _local.store = store
+    return store
+
+
+def collect():
+    """
+    Adds up the samples of every store.
+    :return: dict of key -> value
+    """
+    totals = defaultdict(float)
+    if settings.METRICS_DIR:
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics_*.db')):
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) < 8:
+                continue
+            for key, value, _ in read_entries(data, _length.unpack_from(data, 0)[0]):
+                totals[key] += value
+    else:
+        with _memory_stores_lock:
+            stores = [store for store in _memory_stores if store.pid == os.getpid()]
+        for store in stores:
+            for key, value in store.read():
+                totals[key] += value
+    return totals
+
+
+def clear_metrics_dir():
+    """
+    Removes the stores of earlier runs, call this before starting the
+    workers, e.g. from gunicorn's on_starting hook.
+    """
+    for path in glob.glob(os.path.join(settings.METRICS_DIR or '', 'metrics_*.db')):
+        os.remove(path)
+
+
+def sample_key(metric, sample, labels):
+    return json.dumps([metric.name, metric.type, sample, labels])
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in REGISTRY:
+            raise ValueError('A metric named {} is already defined'.format(name))
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        REGISTRY[name] = self
+
+    def labels(self, *values):
+        """
+        Returns the child recording the samples with these label values,
+        hold on to it on hot paths.
+        """
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError('{} is labelled by {}'.format(self.name, ', '.join(self.labelnames)))
+            child = self.children[values] = self.child_class(
+                self, list(zip(self.labelnames, [str(value) for value in values])))
+        return child
+
+
+class CounterChild:
+
+    def __init__(self, metric, labels):
+        self.key = sample_key(metric, '', labels)
+
+    def inc(self, amount=1):
+        thread_store().inc(self.key, amount)
+
+
+class Counter(Metric):
+    """
+    A count that only goes up, name it ..._total.
+    """
+    type = 'counter'
+    child_class = CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class HistogramChild:
+
+    def __init__(self, metric, labels):
+        self.upper_bounds = metric.upper_bounds
+        # a key per bucket, the buckets are stored apart and only
+        # accumulated when exposed
+        self.bucket_keys = [
+            sample_key(metric, '_bucket', labels + [('le', format_value(bound))]) for bound in self.upper_bounds
+        ]
+        self.sum_key = sample_key(metric, '_sum', labels)
+
+    def observe(self, value):
+        store = thread_store()
+        store.inc(self.bucket_keys[bisect_left(self.upper_bounds, value)], 1)
+        store.inc(self.sum_key, value)
+
+
+class Histogram(Metric):
+    """
+    Counts observations, like durations in seconds, in fixed buckets.
+    """
+    type = 'histogram'
+    child_class = HistogramChild
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = sorted(float(bound) for bound in buckets if bound != math.inf) + [math.inf]
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels))
+
+
+def exposition():
+    """
+    Renders the samples of every store in the Prometheus text format.
+    :return: str
+    """
+    # name -> (type, {(sample, labels): value})
+    metrics = OrderedDict((name, (metric.type, {})) for name, metric in REGISTRY.items())
+    for key, value in sorted(collect().items()):
+        name, metric_type, sample, labels = json.loads(key)
+        metrics.setdefault(name, (metric_type, {}))[1][sample, tuple(map(tuple, labels))] = value
+
+    lines = []
+    for name, (metric_type, samples) in metrics.items():
+        if name in REGISTRY:
+            lines.append('# HELP {} {}'.format(name, REGISTRY[name].documentation))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        if metric_type == 'histogram':
+            lines.extend(histogram_lines(name, samples))
+        else:
+            for (sample, labels), value in samples.items():
+                lines.append('{}{}{} {}'.format(name, sample, format_labels(labels), format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(name, samples):
+    """
+    Accumulates the buckets of a histogram's label sets and adds their
+    counts.
+    """
+    buckets, sums = defaultdict(dict), {}
+    for (sample, labels), value in samples.items():
+        if sample == '_bucket':
+            buckets[labels[:-1]][float(labels[-1][1])] = value
+        else:
+            sums[labels] = value
+    metric = REGISTRY.get(name)
+    lines = []
+    for labels, counts in buckets.items():
+        # every bucket is exposed, observed or not
+        bounds = metric.upper_bounds if metric is not None else sorted(set(counts) | {math.inf})
+        total = 0
+        for bound in bounds:
+            total += counts.get(bound, 0)
+            lines.append('{}_bucket{} {}'.format(
+                name, format_labels(labels + (('le', format_value(bound)),)), format_value(total)))
+        lines.append('{}_sum{} {}'.format(name, format_labels(labels), format_value(sums.get(labels, 0))))
+        lines.append('{}_count{} {}'.format(name, format_labels(labels), format_value(total)))
+    return lines
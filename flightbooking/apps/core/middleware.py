@@ -0,0 +1,122 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from flightbooking.apps.core.instrumentation import collect_metrics
+from flightbooking.apps.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to respond to a request, by URL name.',
+    ['view', 'method', 'status'])
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time a request spent running queries, by URL name.',
+    ['view'])
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more queries than its query_budget allows and
+    QUERY_BUDGET_STRICT is on.
+    """
+
+
+def handler_name(view_func, request):
+    """
+    The name of the method of a DRF view handling a request, 'get',
+    'post', ... or for viewsets the action, like 'list'.
+    """
+    handler = request.method.lower()
+    return (getattr(view_func, 'actions', None) or {}).get(handler, handler)
+
+
+def query_budget(view_func, request):
+    """
+    Returns the number of queries the view handling a request may run.
+    Views declare query_budget as a number, or as a dict keyed by handler
+    name for the handlers that have one.
+    :return: int or None
+    """
+    budget = getattr(getattr(view_func, 'cls', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(handler_name(view_func, request))
+    return budget
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: the number and time of its queries, the time
+    spent serializing and rendering, and its cache hits and misses. They
+    are sent back in a Server-Timing header and logged as a line of JSON,
+    the request and database time are also added to the histograms
+    exposed at /metrics.
+    Requests to views over their query budget log a warning, or raise
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT is on as it is in tests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_metrics() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+
+        response['Server-Timing'] = self.server_timing(metrics)
+        self.observe(request, response, metrics)
+        line = self.log_line(request, response, metrics)
+        logger.info(json.dumps(line, sort_keys=True))
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and metrics.queries > budget:
+            message = '{} ran {} queries, its budget is {}'.format(line['view'], metrics.queries, budget)
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = query_budget(view_func, request)
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            request.view_name = '{}.{}'.format(view_func.__module__, view_func.__name__)
+        else:
+            request.view_name = '{}.{}'.format(view_class.__name__, handler_name(view_func, request))
+
+    def observe(self, request, response, metrics):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        REQUEST_DURATION.labels(view, request.method, '{}xx'.format(response.status_code // 100)).observe(
+            metrics.elapsed())
+        REQUEST_DB_DURATION.labels(view).observe(metrics.durations['db'])
+
+    def server_timing(self, metrics):
+        durations = metrics.durations
+        return ', '.join([
+            'db;dur={:.1f};desc="{} queries"'.format(durations['db'] * 1000, metrics.queries),
+            'serialize;dur={:.1f}'.format(durations['serialize'] * 1000),
+            'render;dur={:.1f}'.format(durations['render'] * 1000),
+            'cache;desc="{} hits, {} misses"'.format(metrics.counts['cache_hit'], metrics.counts['cache_miss']),
+            'total;dur={:.1f}'.format(metrics.elapsed() * 1000),
+        ])
+
+    def log_line(self, request, response, metrics):
+        durations = metrics.durations
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(metrics.elapsed() * 1000, 2),
+            'db_ms': round(durations['db'] * 1000, 2),
+            'queries': metrics.queries,
+            'serialize_ms': round(durations['serialize'] * 1000, 2),
+            'render_ms': round(durations['render'] * 1000, 2),
+            'cache_hits': metrics.counts['cache_hit'],
+            'cache_misses': metrics.counts['cache_miss'],
+        }
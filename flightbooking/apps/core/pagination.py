@@ -0,0 +1,123 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates by position in a unique ordering instead of by offset, so a
+    deep page costs the same as the first one. Pages are addressed by
+    opaque next/previous cursors. Views declare the ordering as
+    keyset_ordering, a tuple of fields that is unique across rows. The
+    total count is only computed when asked for with ?count=true.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 12
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model_opts = queryset.model._meta
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        if position is not None:
+            queryset = queryset.extra(where=[self.position_condition()], params=position)
+        order = ['-' + field for field in self.ordering] if self.reverse else list(self.ordering)
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_position = self.position(rows[0]) if rows else position
+        self.last_position = self.position(rows[-1]) if rows else position
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {
+            'links': {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link()
+            },
+            'results': data
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def position(self, row):
+        return [getattr(row, field) for field in self.ordering]
+
+    def position_condition(self):
+        """
+        Compares the ordering columns as a row value so the database can
+        start an index scan at the cursor.
+        """
+        opts = self.model_opts
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            '{}.{}'.format(quote(opts.db_table), quote(opts.get_field(field).column)) for field in self.ordering)
+        placeholders = ', '.join(['%s'] * len(self.ordering))
+        return '({}) {} ({})'.format(columns, '<' if self.reverse else '>', placeholders)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # the values are passed to the database as they are, a crafted
+        # cursor must not get past here with values of the wrong type
+        try:
+            position = [
+                self.model_opts.get_field(field).to_python(value) for field, value in zip(self.ordering, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({'p': position, 'r': int(reverse)}, default=str)
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, base64.urlsafe_b64encode(cursor.encode()).decode())
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_position, True)
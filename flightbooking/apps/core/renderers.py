@@ -0,0 +1,94 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from flightbooking.apps.core.instrumentation import timing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+# dates, times, decimals and the like are encoded the way DRF encodes them
+encode_default = encoders.JSONEncoder().default
+
+# orjson encodes datetimes itself unless asked to pass them through, and
+# refuses keys that are not strings, such as the indexes DRF keys list
+# field errors by, unless asked to convert them
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if hasattr(orjson, 'OPT_PASSTHROUGH_DATETIME') else None)
+
+# The standard library's C encoder is the quicker of the two on the small
+# compact responses, simplejson on the long spaced lists of users and
+# profiles. Both are built once, json.dumps() builds one per call.
+compact_encoder = json.JSONEncoder(
+    default=encode_default, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+if simplejson is not None:
+    # simplejson would encode decimals and named tuples its own way
+    spaced_encoder = simplejson.JSONEncoder(default=encode_default, use_decimal=False, namedtuple_as_object=False)
+else:
+    spaced_encoder = json.JSONEncoder(default=encode_default)
+
+
+def escape_line_separators(content):
+    # as DRF does, so the JSON can be embedded in javascript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def dumps(data, spaced=False):
+    """
+    Encodes data with the fastest encoder available, orjson for compact
+    output when it is installed.
+    Compact output matches DRF's JSONRenderer byte for byte. Spaced output
+    matches json.dumps with its default separators and ASCII escaping.
+    :param data: JSON serializable object
+    :param spaced: bool
+    :return: bytes
+    """
+    if spaced:
+        return spaced_encoder.encode(data).encode()
+    if ORJSON_OPTIONS is not None:
+        try:
+            return escape_line_separators(orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS))
+        except TypeError:
+            # what orjson cannot encode, such as integers wider than 64
+            # bits, is left to the standard library
+            pass
+    return escape_line_separators(compact_encoder.encode(data).encode())
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    A JSONRenderer encoding with dumps(). Subclasses can wrap successful
+    responses in an envelope key and use json.dumps style spacing, error
+    responses (those with an 'errors' key) are always left as they are and
+    compact. Indented responses are left to DRF.
+    """
+    charset = 'utf-8'
+    envelope = None
+    spaced = False
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing('render'):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if isinstance(data, dict) and data.get('errors') is not None:
+            return dumps(data)
+        if self.envelope is not None:
+            data = {self.envelope: data}
+        return dumps(data, spaced=self.spaced)
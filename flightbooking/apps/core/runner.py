@@ -0,0 +1,18 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class StrictQueryBudgetRunner(DiscoverRunner):
+    """
+    Runs the tests with QUERY_BUDGET_STRICT on, so that a view running
+    more queries than its query_budget fails the test requesting it.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.strict_query_budget = override_settings(QUERY_BUDGET_STRICT=True)
+        self.strict_query_budget.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.strict_query_budget.disable()
+        super().teardown_test_environment(**kwargs)
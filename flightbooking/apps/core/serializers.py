@@ -0,0 +1,121 @@
+import datetime
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from flightbooking.apps.core.instrumentation import timing
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """
+    A ListSerializer counting the time spent representing its instances
+    as the request's serializer time.
+    """
+
+    @property
+    def data(self):
+        with timing('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Counts the time spent representing an instance as the request's
+    serializer time. Set Meta.list_serializer_class to TimedListSerializer
+    for lists to be counted too.
+    """
+
+    @property
+    def data(self):
+        with timing('serialize'):
+            return super().data
+
+
+def field_converter(field):
+    """
+    Returns the function turning a column value into what
+    field.to_representation() would return it as, or None when the value
+    is already its own representation.
+    """
+    if isinstance(field, (serializers.CharField, serializers.IntegerField)):
+        # str() and int() of the str and int the database hands back
+        return None
+    if isinstance(field, serializers.DateField) and getattr(field, 'format', api_settings.DATE_FORMAT) == ISO_8601:
+        return datetime.date.isoformat
+    if isinstance(field, serializers.TimeField) and getattr(field, 'format', api_settings.TIME_FORMAT) == ISO_8601:
+        return datetime.time.isoformat
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Represents rows read with values_list() the way serializer_class
+    represents model instances, without building the instances. The
+    converter of each readable field is worked out once, so a row costs a
+    tuple lookup and at most one call per field.
+
+    Fields are read from the column named by their source, or by lookups
+    when given. Fields whose value comes from another serializer, like a
+    SerializerMethodField, must be listed in nested as
+    field name: (ValuesSerializer subclass, lookup prefix). Columns must
+    hold values of their field's type, a CharField must be read from a
+    text column and an IntegerField from an integer one.
+
+    Read only, use serializer_class to validate and save.
+    """
+    serializer_class = None
+    lookups = {}
+    nested = {}
+
+    def __init__(self, prefix=''):
+        self.columns = []
+        # (field name, column index, converter), a nested field has no
+        # column index and its ValuesSerializer as converter
+        self.plan = []
+        for field in self.serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if field.field_name in self.nested:
+                values_class, lookup = self.nested[field.field_name]
+                nested = values_class(prefix + lookup)
+                self.plan.append((field.field_name, len(self.columns), nested))
+                self.columns.extend(nested.columns)
+                continue
+            if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise ImproperlyConfigured(
+                    '{} must say how to read {}.{} in nested'.format(
+                        type(self).__name__, self.serializer_class.__name__, field.field_name))
+            lookup = self.lookups.get(field.field_name, field.source.replace('.', '__'))
+            self.plan.append((field.field_name, len(self.columns), field_converter(field)))
+            self.columns.append(prefix + lookup)
+
+    def rows(self, queryset, extra=()):
+        """
+        Reads the columns of a queryset as named tuples. extra names more
+        columns to read, e.g. the ordering a paginator needs from a row.
+        :param queryset: QuerySet of serializer_class.Meta.model
+        :param extra: iterable of lookups
+        :return: QuerySet
+        """
+        return queryset.values_list(
+            *self.columns, *[lookup for lookup in extra if lookup not in self.columns], named=True)
+
+    def to_representation(self, row, offset=0):
+        ret = OrderedDict()
+        for name, index, convert in self.plan:
+            if isinstance(convert, ValuesSerializer):
+                ret[name] = convert.to_representation(row, offset + index)
+                continue
+            value = row[offset + index]
+            ret[name] = value if convert is None or value is None else convert(value)
+        return ret
+
+    def data(self, rows):
+        """
+        :param rows: iterable of rows read with rows()
+        :return: list
+        """
+        with timing('serialize'):
+            return [self.to_representation(row) for row in rows]
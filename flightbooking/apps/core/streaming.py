@@ -0,0 +1,68 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+STREAM_CHUNK_SIZE = 500
+
+
+def stream_json_list(key, rows, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the JSON of {key: [serialize(row), ...]} a chunk of rows at a
+    time, spaced like json.dumps. Pass rows from QuerySet.iterator() so
+    that memory stays flat however many rows there are.
+    :param key: str
+    :param rows: iterable
+    :param serialize: callable returning a JSON serializable object
+    :param chunk_size: int, rows per yielded piece
+    """
+    rows = iter(rows)
+    yield '{{{}: ['.format(json.dumps(key))
+    separator = ''
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        yield separator + ', '.join(json.dumps(serialize(row)) for row in chunk)
+        separator = ', '
+    yield ']}'
+
+
+def streaming_json_response(key, rows, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Returns a chunked response streaming stream_json_list(), it bypasses
+    the view's renderers.
+    :return: StreamingHttpResponse
+    """
+    return StreamingHttpResponse(
+        stream_json_list(key, rows, serialize, chunk_size), content_type='application/json')
+
+
+class Echo:
+    """
+    A file-like object whose write() returns what was written, for
+    streaming the lines of a csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """
+    Yields the lines of a CSV with a header line and a line per row.
+    :param header: list of column names
+    :param rows: iterable of lists
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(rows):
+    """
+    Yields a line of JSON per row.
+    :param rows: iterable of JSON serializable objects
+    """
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
@@ -0,0 +1,108 @@
+import multiprocessing
+import shutil
+import tempfile
+import threading
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.core.metrics import Counter, Histogram, collect, exposition
+
+JOBS = Counter('test_jobs_total', 'Jobs done.', ['queue'])
+JOB_DURATION = Histogram('test_job_duration_seconds', 'Time to do a job.', buckets=(.1, 1))
+
+
+def sample(name, text):
+    """
+    The value of a sample line of an exposition.
+    """
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split(' ')[-1])
+    return 0
+
+
+def do_jobs(jobs):
+    for _ in range(jobs):
+        JOBS.labels('fork').inc()
+
+
+class MetricsTestCase(SimpleTestCase):
+    """
+    Test counters and histograms add up and are exposed in the Prometheus format
+    """
+
+    def test_counter_exposition(self):
+        before = sample('test_jobs_total{queue="emails"}', exposition())
+        JOBS.labels('emails').inc()
+        JOBS.labels('emails').inc(2)
+        text = exposition()
+        self.assertIn('# HELP test_jobs_total Jobs done.\n# TYPE test_jobs_total counter\n', text)
+        self.assertEqual(sample('test_jobs_total{queue="emails"}', text), before + 3)
+
+    def test_histogram_buckets_accumulate(self):
+        before = exposition()
+        for duration in (.05, .5, .5, 5):
+            JOB_DURATION.observe(duration)
+        after = exposition()
+        for line, added in [('test_job_duration_seconds_bucket{le="0.1"}', 1),
+                            ('test_job_duration_seconds_bucket{le="1.0"}', 3),
+                            ('test_job_duration_seconds_bucket{le="+Inf"}', 4),
+                            ('test_job_duration_seconds_count', 4),
+                            ('test_job_duration_seconds_sum', 6.05)]:
+            self.assertAlmostEqual(sample(line, after) - sample(line, before), added)
+
+    def test_label_values_are_escaped(self):
+        JOBS.labels('a "quoted"\nqueue').inc()
+        self.assertIn(r'test_jobs_total{queue="a \"quoted\"\nqueue"}', exposition())
+
+    def test_workers_add_up_through_the_metrics_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory):
+            workers = [multiprocessing.Process(target=do_jobs, args=(jobs,)) for jobs in (3, 4, 5)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            # threads write to stores of their own too
+            thread = threading.Thread(target=do_jobs, args=(1,))
+            thread.start()
+            thread.join()
+            self.assertEqual(sample('test_jobs_total{queue="fork"}', exposition()), 13)
+
+    def test_stores_grow(self):
+        for index in range(2000):
+            JOBS.labels('queue {}'.format(index)).inc()
+        self.assertEqual(collect()['["test_jobs_total", "counter", "", [["queue", "queue 1999"]]]'], 1)
+
+
+class MetricsViewTestCase(TestCase):
+    """
+    Test requests are measured and exposed at /metrics
+    """
+
+    @override_settings(METRICS_TOKEN='scraper')
+    def test_requests_are_measured(self):
+        self.client.get(reverse('flights:flights-list'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertGreaterEqual(sample(
+            'http_request_duration_seconds_count{view="flights:flights-list",method="GET",status="2xx"}',
+            response.content.decode()), 1)
+
+    def test_auth_failures_are_counted_by_reason(self):
+        before = sample('auth_failures_total{reason="undecodable"}', exposition())
+        self.client.get(reverse('flights:flights-list'), HTTP_AUTHORIZATION='Token not.a.token')
+        self.assertEqual(sample('auth_failures_total{reason="undecodable"}', exposition()), before + 1)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_are_not_exposed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='scraper')
+    def test_metrics_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scraper')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,81 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import path
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.core.instrumentation import collect_metrics, timing
+from flightbooking.apps.core.middleware import QueryBudgetExceeded
+
+
+class CountUsersView(APIView):
+    permission_classes = (AllowAny,)
+    query_budget = {'get': 1}
+
+    def get(self, request):
+        User.objects.count()
+        User.objects.count()
+        return Response({'users': User.objects.count()})
+
+
+urlpatterns = [
+    path('users/count/', CountUsersView.as_view(), name='count-users'),
+]
+
+
+class PerformanceMiddlewareTestCase(TestCase):
+    """
+    Test requests are measured and held to their query budget
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(FLIGHT_CATALOGUE_CACHE_LOCAL=True)
+    def test_response_has_server_timing(self):
+        response = self.client.get(reverse('flights:flights-list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=')
+        self.assertIn('cache;desc="0 hits, 1 misses"', response['Server-Timing'])
+        response = self.client.get(reverse('flights:flights-list'))
+        self.assertIn('cache;desc="1 hits, 0 misses"', response['Server-Timing'])
+
+    def test_request_is_logged_as_json(self):
+        with self.assertLogs('flightbooking.apps.core.middleware', 'INFO') as logs:
+            self.client.get(reverse('flights:flights-list'))
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'FlightAPIView.list')
+        self.assertEqual(line['status'], 200)
+        self.assertGreater(line['queries'], 0)
+        self.assertGreaterEqual(line['total_ms'], line['db_ms'])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_query_budget_fails_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'CountUsersView.get ran 3 queries, its budget is 1'):
+            self.client.get('/users/count/')
+
+    @override_settings(ROOT_URLCONF=__name__, QUERY_BUDGET_STRICT=False)
+    def test_query_budget_warns_in_production(self):
+        with self.assertLogs('flightbooking.apps.core.middleware', 'WARNING') as logs:
+            response = self.client.get('/users/count/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('WARNING', logs.output[-1])
+
+
+class TimingTestCase(TestCase):
+
+    def test_nested_timings_count_once(self):
+        with collect_metrics() as metrics:
+            with timing('serialize'):
+                with timing('serialize'):
+                    time.sleep(0.01)
+        self.assertLess(metrics.durations['serialize'], 0.02)
+
+    def test_timing_outside_requests_does_nothing(self):
+        with timing('serialize'):
+            pass
@@ -0,0 +1,61 @@
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from flightbooking.apps.authentication.renderers import UserJSONRenderer
+from flightbooking.apps.core import renderers
+from flightbooking.apps.core.renderers import FastJSONRenderer
+from flightbooking.apps.profiles.renderers import ProfileJSONRenderer
+
+DATA = OrderedDict([
+    ('booking_id', 1),
+    ('flight_seat', "Premi\u00e8re classe \u2028"),
+    ('departure', datetime.datetime(2019, 12, 12, 9, 30, 0, 123456, tzinfo=datetime.timezone.utc)),
+    ('departure_date', datetime.date(2019, 12, 12)),
+    ('price', Decimal('10.50')),
+    ('traveller', OrderedDict([('username', "beverly"), ('image', None)])),
+])
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    """
+    Tests the fast renderers produce the same bytes as the ones they replace
+    """
+
+    def assert_renders_like_drf(self):
+        self.assertEqual(FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+        self.assertEqual(FastJSONRenderer().render([DATA, DATA]), JSONRenderer().render([DATA, DATA]))
+
+    def test_renders_like_drf(self):
+        self.assert_renders_like_drf()
+
+    def test_renders_like_drf_with_the_standard_library(self):
+        with mock.patch.multiple(
+                renderers, ORJSON_OPTIONS=None, spaced_encoder=json.JSONEncoder(default=renderers.encode_default)):
+            self.assert_renders_like_drf()
+
+    def test_user_responses_keep_their_envelope(self):
+        data = {'username': "beverly", 'token': "token"}
+        self.assertEqual(UserJSONRenderer().render(data), json.dumps({'user': data}).encode())
+
+    def test_error_responses_are_not_wrapped(self):
+        data = {'errors': "Invalid token"}
+        self.assertEqual(UserJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_profile_responses_are_spaced(self):
+        data = {'profiles': [{'username': "beverly", 'image': None}]}
+        self.assertEqual(ProfileJSONRenderer().render(data), json.dumps(data).encode())
+
+    def test_error_responses_keyed_by_index(self):
+        data = {'errors': {'booking_ids': {0: ["A valid integer is required."]}}}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_falls_back_to_the_standard_library(self):
+        orjson = mock.Mock(dumps=mock.Mock(side_effect=TypeError("Dict key must be str")))
+        with mock.patch.multiple(renderers, orjson=orjson, ORJSON_OPTIONS=0):
+            self.assert_renders_like_drf()
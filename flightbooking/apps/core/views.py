@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from flightbooking.apps.core.metrics import exposition
+
+
+def metrics(request):
+    """
+    Exposes the metrics of every worker in the Prometheus text format.
+    Scrapers must send METRICS_TOKEN as a bearer token, without it the
+    metrics are not exposed at all.
+    """
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer {}'.format(settings.METRICS_TOKEN)):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,86 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from flightbooking.apps.core.instrumentation import count
+
+VERSION_KEY = 'flights:catalogue-version'
+# caches held in the memory of each process
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def catalogue_cache_enabled():
+    """
+    Checks whether flight responses may be cached. The catalogue version
+    must be seen by every worker, so a process local cache is only used
+    when FLIGHT_CATALOGUE_CACHE_LOCAL allows it.
+    :return: bool
+    """
+    return settings.FLIGHT_CATALOGUE_CACHE_LOCAL or settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def catalogue_version():
+    """
+    Returns the current version of the flight catalogue. Every cached
+    flight response is keyed by it, so bumping it retires them all.
+    :return: int
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the clock so a version evicted from the cache is
+        # never handed out again
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """
+    Marks every cached flight response as stale. Call this whenever a
+    flight is created, updated or deleted.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        catalogue_version()
+
+
+def cached_response(request, name, build):
+    """
+    Serves a flight catalogue response from the cache, calling build() to
+    create it on a miss. Only successful responses are cached. Responses
+    carry an ETag, a request whose If-None-Match matches it gets an empty
+    304 without the response being looked up or built. Without a cache
+    every worker shares, responses are built every time and carry no ETag.
+    :param request: Request
+    :param name: str, identifies the response within a catalogue version
+    :param build: callable returning a Response
+    :return: Response
+    """
+    if not catalogue_cache_enabled():
+        return build()
+    version = catalogue_version()
+    etag = quote_etag(hashlib.md5('{}:{}'.format(version, name).encode()).hexdigest())
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        count('cache_hit')
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    key = 'flights:{}:{}'.format(version, name)
+    data = cache.get(key)
+    if data is None:
+        count('cache_miss')
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cache.set(key, response.data, settings.FLIGHT_CATALOGUE_CACHE_TIMEOUT)
+    else:
+        count('cache_hit')
+        response = Response(data)
+    response['ETag'] = etag
+    return response
@@ -1,31 +1,180 @@
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 import os
+import smtplib
 import datetime
-from flightbooking.apps.flights.models import Flight, Booking
+from itertools import groupby, islice
+from operator import itemgetter
+from flightbooking.apps.core.metrics import Counter
+from flightbooking.apps.flights.models import Flight, Booking, ReminderChunk
 
+REMINDER_SUBJECT = 'Flight Booking Reminder'
+REMINDER_MESSAGE = (
+    'Hello, this is just a polite reminder that you booked a flight with us for tomorrow. '
+    'Please arrive on time.')
+FLIGHT_REMINDER_MESSAGE = (
+    'Hello, this is just a polite reminder that your flight {name} to {destination} departs on '
+    '{departure_date:%d %B %Y} at {departure_time:%H:%M}. Please arrive on time.')
+
+REMINDER_EMAILS = Counter('reminder_emails_total', 'Reminder emails sent, by result.', ['result'])
 
-def send_reminder_email():
-    from_email = os.getenv("EMAIL_HOST_SENDER")
-    emails = get_people_with_bookings_tomorrow()
-    send_mail(
-        'Flight Booking Reminder',
-        'Hello, this is just a polite reminder that you booked a flight with us for tomorrow. Please arrive on time.',
-        from_email, emails,
-        fail_silently=False)
+
+def send_reminder_email(now=None):
+    """
+    Plans the reminders due now and sends them chunk by chunk.
+    :param now: datetime, the current time by default
+    :return: int, the number of recipients whose email failed
+    """
+    chunk_ids = plan_due_reminders(now) + stalled_reminder_chunks(now)
+    chunks = (claim_reminder_chunk(chunk_id) for chunk_id in chunk_ids)
+    return sum(send_reminder_chunk(chunk) for chunk in chunks if chunk is not None)
 
 
 def get_people_with_bookings_tomorrow():
     tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    return list(iter_reminder_recipients(Flight.objects.departing_on(tomorrow)))
+
+
+def iter_reminder_recipients(flights):
+    """
+    Streams the distinct emails of the travellers booked on flights
+    without loading their bookings.
+    :param flights: Flight queryset
+    :return: iterator
+    """
+    return Booking.objects.filter(
+        flight__in=flights
+    ).order_by('traveller__email').values_list('traveller__email', flat=True).distinct().iterator()
+
+
+def plan_due_reminders(now=None, chunk_size=None):
+    """
+    Splits the travellers of the flights whose reminder window has opened,
+    the flights departing within REMINDER_EMAIL_LEAD_HOURS, into chunks of
+    reminder emails. The flights are marked with reminder_sent_at in the
+    same transaction, so each flight is planned once however often and
+    however many workers run this. Flights locked by another run are
+    skipped, that run plans them. The chunks of a flight planned before it
+    was moved to another departure are replaced.
+    :param now: datetime, the current time by default
+    :param chunk_size: int
+    :return: list of chunk ids
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or settings.REMINDER_EMAIL_CHUNK_SIZE
+    lead = datetime.timedelta(hours=settings.REMINDER_EMAIL_LEAD_HOURS)
+    with transaction.atomic():
+        flights = dict(Flight.objects.reminders_due(now, lead).select_for_update(skip_locked=True).values_list(
+            'flight_id', 'departure_date'))
+        if not flights:
+            return []
+        recipients = Booking.objects.filter(flight_id__in=flights).order_by(
+            'flight_id', 'traveller__email').values_list('flight_id', 'traveller__email').distinct().iterator()
+        chunks = []
+        for flight_id, bookings in groupby(recipients, key=itemgetter(0)):
+            emails = (email for _, email in bookings)
+            for sequence, chunk in enumerate(iter(lambda: list(islice(emails, chunk_size)), [])):
+                chunks.append(ReminderChunk(
+                    flight_id=flight_id, departure_date=flights[flight_id], sequence=sequence,
+                    recipients='\n'.join(chunk)))
+        ReminderChunk.objects.filter(flight_id__in=flights).delete()
+        ReminderChunk.objects.bulk_create(chunks)
+        Flight.objects.filter(pk__in=flights).update(reminder_sent_at=now)
+    return [chunk.pk for chunk in chunks]
+
+
+def stalled_reminder_chunks(now=None):
+    """
+    Finds the chunks of flights yet to depart that are still pending,
+    failed or being sent REMINDER_EMAIL_REQUEUE_MINUTES after they were
+    planned or last attempted, because the task sending them was never
+    queued, was lost or died, or ran out of retries. Chunks attempted
+    REMINDER_EMAIL_MAX_ATTEMPTS times are not queued again.
+    :param now: datetime, the current time by default
+    :return: list of chunk ids
+    """
+    now = now or timezone.now()
+    stalled_since = now - datetime.timedelta(minutes=settings.REMINDER_EMAIL_REQUEUE_MINUTES)
+    return list(ReminderChunk.objects.filter(
+        status__in=[ReminderChunk.PENDING, ReminderChunk.SENDING, ReminderChunk.FAILED], flight__departs_at__gt=now,
+        updated_at__lt=stalled_since, attempts__lt=settings.REMINDER_EMAIL_MAX_ATTEMPTS,
+    ).values_list('pk', flat=True))
+
+
+def claim_reminder_chunk(chunk_id):
+    """
+    Marks a chunk as being sent with a single UPDATE, so that no other
+    worker sends it meanwhile without a lock being held for as long as
+    the SMTP server takes. Chunks sent, given up on, or being sent are not
+    claimed, unless their sender stalled REMINDER_EMAIL_REQUEUE_MINUTES ago.
+    :param chunk_id: int
+    :return: ReminderChunk, None when the chunk was not claimed
+    """
+    now = timezone.now()
+    stalled_since = now - datetime.timedelta(minutes=settings.REMINDER_EMAIL_REQUEUE_MINUTES)
+    claimed = ReminderChunk.objects.filter(
+        Q(status__in=[ReminderChunk.PENDING, ReminderChunk.FAILED])
+        | Q(status=ReminderChunk.SENDING, updated_at__lt=stalled_since),
+        pk=chunk_id, attempts__lt=settings.REMINDER_EMAIL_MAX_ATTEMPTS,
+    ).update(status=ReminderChunk.SENDING, updated_at=now)
+    if not claimed:
+        return None
+    return ReminderChunk.objects.select_related('flight').get(pk=chunk_id)
+
+
+def send_reminder_chunk(chunk):
+    """
+    Sends a chunk's pending reminders over a single SMTP connection, one
+    message per recipient so that no one sees another traveller's address
+    and one bad address does not fail the others. Failed recipients are
+    recorded on the chunk.
+    :param chunk: ReminderChunk
+    :return: int, the number of recipients whose email failed
+    """
+    from_email = os.getenv("EMAIL_HOST_SENDER")
+    # chunks planned by date before flights were reminded one by one have no flight
+    body = REMINDER_MESSAGE
+    if chunk.flight_id:
+        flight = chunk.flight
+        body = FLIGHT_REMINDER_MESSAGE.format(
+            name=flight.name, destination=flight.destination, departure_date=flight.departure_date,
+            departure_time=flight.departure_time)
+    recipients = chunk.pending_recipients()
+    failed = []
+    connection = get_connection()
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError):
+        # nothing was sent, every recipient is retried
+        failed = list(recipients)
+    else:
+        try:
+            for recipient in recipients:
+                message = EmailMessage(REMINDER_SUBJECT, body, from_email, [recipient])
+                try:
+                    connection.send_messages([message])
+                except (smtplib.SMTPException, OSError):
+                    failed.append(recipient)
+        finally:
+            try:
+                connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass
 
-    tomorrows_travellers_queryset = Booking.objects.filter(flight__departure_date=tomorrow)
-    print_queryset = Booking.objects.filter(flight__departure_date='2019-08-22').query
-    print(print_queryset)
-    tomorrows_travellers = [i.traveller.email for i in tomorrows_travellers_queryset]
-    return tomorrows_travellers
+    REMINDER_EMAILS.labels('sent').inc(len(recipients) - len(failed))
+    REMINDER_EMAILS.labels('failed').inc(len(failed))
+    chunk.failed_recipients = '\n'.join(failed)
+    chunk.status = ReminderChunk.FAILED if failed else ReminderChunk.SENT
+    chunk.attempts += 1
+    chunk.save(update_fields=['failed_recipients', 'status', 'attempts', 'updated_at'])
+    return len(failed)
 
 
 def get_people_with_bookings_for_flightid_one_and_given_date():
-    travellers = Booking.objects.filter(flight__flight_id='1', flight__departure_date='2019-08-21')
-    no_of_travellers = len(travellers)
-    print({"No of travellers for that flight and day is: {}".format(no_of_travellers)})
+    # read from the flight's counter instead of loading its bookings
+    no_of_travellers = Flight.objects.filter(flight_id=1, departure_date='2019-08-21').values_list(
+        'booked_seats', flat=True).first() or 0
     return no_of_travellers
@@ -0,0 +1,53 @@
+import django_filters
+from django.db.models import Q
+
+from flightbooking.apps.flights.models import DailyFlightStats, Flight
+
+
+class FlightSearchFilter(django_filters.FilterSet):
+    """
+    Filters for the flight search. Every filter can be answered from the
+    flight search indexes:
+    destination=Nairobi                                 exact destination
+    destination_prefix=Nai                              destination starting with, case sensitive
+    departure_date_after=2019-12-01&departure_date_before=2019-12-31
+    departs_after=2019-12-01 18:00&departs_before=2019-12-02 06:00
+    departure_time_after=22:00&departure_time_before=02:00
+    Ranges include their bounds, either bound may be left out. Dates and
+    datetimes are ranges of departs_at, dates from the start of the first
+    day to the end of the last. A time window whose start is after its
+    end wraps around midnight.
+    """
+    destination = django_filters.CharFilter(field_name='destination')
+    destination_prefix = django_filters.CharFilter(field_name='destination', lookup_expr='startswith')
+    departure_date = django_filters.DateFromToRangeFilter(field_name='departs_at')
+    departs = django_filters.DateTimeFromToRangeFilter(field_name='departs_at')
+    departure_time = django_filters.TimeRangeFilter(field_name='departure_time', method='filter_time_window')
+
+    class Meta:
+        model = Flight
+        fields = ['name']
+
+    def filter_time_window(self, queryset, name, value):
+        start, end = value.start, value.stop
+        if start is not None and end is not None and start > end:
+            return queryset.filter(Q(departure_time__gte=start) | Q(departure_time__lte=end))
+        if start is not None:
+            queryset = queryset.filter(departure_time__gte=start)
+        if end is not None:
+            queryset = queryset.filter(departure_time__lte=end)
+        return queryset
+
+
+class DailyFlightStatsFilter(django_filters.FilterSet):
+    """
+    Filters for the daily operations report:
+    destination=Nairobi
+    departure_date_after=2019-12-01&departure_date_before=2019-12-31
+    """
+    destination = django_filters.CharFilter(field_name='destination')
+    departure_date = django_filters.DateFromToRangeFilter(field_name='departure_date')
+
+    class Meta:
+        model = DailyFlightStats
+        fields = []
@@ -0,0 +1,140 @@
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from flightbooking.apps.flights.cache import bump_catalogue_version
+from flightbooking.apps.flights.models import Flight, Seat
+from flightbooking.apps.flights.seats import build_seats
+from flightbooking.apps.flights.serializers import FlightSerializer
+
+DUPLICATE_NAME = "Flight name already exists"
+INVALID_ROW = "Each flight must be an object"
+
+
+class FlightImport:
+    """
+    The outcome of a bulk flight import: how many flights were created,
+    the errors of the rows that were not, and how fast it went.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': self.rows_per_second,
+        }
+
+
+def import_flights(rows, batch_size=None, chunk_size=None):
+    """
+    Creates flights from an iterable of flight dicts, for instance a CSV or
+    JSONL file read lazily. Rows are validated a batch at a time with one
+    query for names that are already taken, then the valid flights and
+    their seats are written with bulk_create in chunks of chunk_size, in a
+    transaction per batch. An invalid row is reported by its 1-based
+    number and does not stop the rows after it.
+    :param rows: iterable of dicts
+    :param batch_size: int, rows validated and written together
+    :param chunk_size: int, rows per INSERT
+    :return: FlightImport
+    """
+    batch_size = batch_size or settings.FLIGHT_IMPORT_BATCH_SIZE
+    chunk_size = chunk_size or settings.FLIGHT_IMPORT_CHUNK_SIZE
+    report, names = FlightImport(), set()
+    numbered_rows = enumerate(rows, 1)
+    for batch in iter(lambda: list(islice(numbered_rows, batch_size)), []):
+        report.rows += len(batch)
+        flights = validate_batch(batch, names, report)
+        report.created += save_batch(flights, chunk_size, report)
+    if report.created:
+        bump_catalogue_version()
+    return report.finish()
+
+
+def validate_batch(batch, names, report):
+    """
+    Validates a batch of numbered rows, reporting the invalid ones.
+    :param batch: list of (row number, row)
+    :param names: set, the flight names seen earlier in the import
+    :param report: FlightImport
+    :return: list of (row number, unsaved Flight)
+    """
+    flights = []
+    for number, row in batch:
+        if not isinstance(row, dict):
+            report.add_error(number, {'error': [INVALID_ROW]})
+            continue
+        serializer = FlightSerializer(data=row)
+        if not serializer.is_valid():
+            report.add_error(number, serializer.errors)
+            continue
+        flight = Flight(**serializer.validated_data)
+        if flight.name in names:
+            report.add_error(number, {'name': [DUPLICATE_NAME]})
+            continue
+        names.add(flight.name)
+        flight.set_capacity()
+        flight.set_departs_at()
+        flights.append((number, flight))
+    return exclude_existing_names(flights, report)
+
+
+def exclude_existing_names(flights, report):
+    """
+    Reports the flights whose name is already taken, with a single query.
+    :param flights: list of (row number, unsaved Flight)
+    :param report: FlightImport
+    :return: list of (row number, unsaved Flight), those with a free name
+    """
+    taken = set(Flight.objects.filter(
+        name__in=[flight.name for _, flight in flights]).values_list('name', flat=True))
+    for number, flight in flights:
+        if flight.name in taken:
+            report.add_error(number, {'name': [DUPLICATE_NAME]})
+    return [(number, flight) for number, flight in flights if flight.name not in taken]
+
+
+def save_batch(flights, chunk_size, report):
+    """
+    Writes a batch of flights and their seat maps. When a concurrent
+    import takes one of the names first, the names are checked again and
+    the batch is retried once.
+    :return: int, the number of flights created
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                created = Flight.objects.bulk_create(
+                    [flight for _, flight in flights], batch_size=chunk_size)
+                Seat.objects.bulk_create(
+                    (seat for flight in created for seat in build_seats(flight)), batch_size=chunk_size)
+            return len(created)
+        except IntegrityError:
+            if attempt:
+                raise
+            for _, flight in flights:
+                flight.pk = None
+                flight._state.adding = True
+            flights = exclude_existing_names(flights, report)
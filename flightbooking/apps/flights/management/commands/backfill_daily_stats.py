@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from flightbooking.apps.flights.stats import backfill_daily_stats
+
+
+def date_argument(value):
+    date = parse_date(value)
+    if date is None:
+        raise ValueError(value)
+    return date
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily operations report from the bookings, a range of departure dates per process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=date_argument, help='The first departure date, YYYY-MM-DD.')
+        parser.add_argument('--to', dest='end', type=date_argument, help='The last departure date, YYYY-MM-DD.')
+        parser.add_argument('--days', type=int, default=30, help='Departure dates recomputed together.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes recomputing ranges at once.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['workers'] < 1:
+            raise CommandError('--days and --workers must be at least 1')
+
+        def log(result):
+            (start, end), days, bookings = result
+            self.stdout.write('{} to {}: {} bookings over {} days'.format(start, end, bookings, days))
+
+        start = time.perf_counter()
+        counted = backfill_daily_stats(
+            options['start'], options['end'], days=options['days'], workers=options['workers'], log=log)
+        self.stdout.write(self.style.SUCCESS('Counted {} bookings in {:.2f}s with {} workers'.format(
+            counted, time.perf_counter() - start, options['workers'])))
@@ -0,0 +1,33 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flightbooking.apps.flights.manifest import MANIFEST_FORMATS, flight_manifest, stream_manifest
+
+
+class Command(BaseCommand):
+    help = 'Writes the passenger manifest of a flight, or of every flight departing on a date, as CSV or JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flight', type=int, help='The id of the flight.')
+        parser.add_argument('--date', help='The departure date of the flights, YYYY-MM-DD.')
+        parser.add_argument('--format', choices=MANIFEST_FORMATS, default='csv')
+        parser.add_argument('--output', help='The file to write, standard output by default.')
+
+    def handle(self, *args, **options):
+        if options['flight'] is None and options['date'] is None:
+            raise CommandError('Pass --flight, --date or both')
+        departure_date = None
+        if options['date'] is not None:
+            try:
+                departure_date = datetime.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('The date must be YYYY-MM-DD')
+        lines = stream_manifest(
+            flight_manifest(flight_id=options['flight'], departure_date=departure_date), options['format'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
@@ -0,0 +1,68 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flightbooking.apps.flights.importer import import_flights
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(lines):
+    """
+    Yields a dict per CSV record, the first line names the flight fields.
+    Empty cells are left out so optional fields take their defaults.
+    """
+    for record in csv.DictReader(lines):
+        yield {field: value for field, value in record.items() if value not in ('', None)}
+
+
+def read_jsonl(lines):
+    """
+    Yields a flight per line. Lines that are not JSON are passed on as
+    they are, so they are reported as invalid rows.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
+
+
+class Command(BaseCommand):
+    help = 'Imports flights from a CSV or JSONL file, reporting the rows that could not be imported.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import, - reads from standard input.')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='The file format, taken from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, help='Rows validated and written together.')
+        parser.add_argument('--chunk-size', type=int, help='Rows written per INSERT statement.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rpartition('.')[2]
+        if file_format not in FORMATS:
+            raise CommandError('Pass --format, one of {}'.format(', '.join(FORMATS)))
+        reader = read_csv if file_format == 'csv' else read_jsonl
+
+        if path == '-':
+            report = self.import_lines(reader, sys.stdin, options)
+        else:
+            with open(path, newline='') as lines:
+                report = self.import_lines(reader, lines, options)
+
+        for error in report.errors:
+            self.stderr.write('Row {}: {}'.format(error['row'], json.dumps(error['errors'])))
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} of {} flights in {:.2f}s, {} rows per second, {} rows failed'.format(
+                report.created, report.rows, report.seconds, report.rows_per_second, len(report.errors))))
+
+    def import_lines(self, reader, lines, options):
+        return import_flights(
+            reader(lines),
+            batch_size=options['batch_size'], chunk_size=options['chunk_size'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from flightbooking.apps.flights.occupancy import reconcile_occupancy
+
+
+class Command(BaseCommand):
+    help = "Recounts the booked seats and capacity of the flights whose counters drifted from their bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Report the flights that drifted without repairing them.')
+
+    def handle(self, *args, **options):
+        repairs = reconcile_occupancy(dry_run=options['dry_run'])
+        for flight_id, before, after in repairs:
+            self.stdout.write('Flight {}: {} booked of {} seats, counted {} of {}'.format(
+                flight_id, before[0], before[1], after[0], after[1]))
+        self.stdout.write(self.style.SUCCESS('{} {} flights'.format(
+            'Found drift on' if options['dry_run'] else 'Repaired', len(repairs))))
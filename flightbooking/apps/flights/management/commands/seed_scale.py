@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from flightbooking.apps.flights.seeding import COPY_CHUNK_SIZE, PASSWORD, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds travellers, flights and bookings for load and scaling tests, '
+        'e.g. --users 1000000 --flights 70000 --bookings 10000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Travellers, with profiles.')
+        parser.add_argument('--flights', type=int, default=100, help='Flights, with seat maps.')
+        parser.add_argument(
+            '--bookings', type=int, default=10000,
+            help='Bookings, spread over the flights by load factor. Flights hold 144 seats on average.')
+        parser.add_argument('--days', type=int, default=180, help='Days from tomorrow the flights depart over.')
+        parser.add_argument('--staff', type=int, default=1, help='Travellers that are staff, the first ones.')
+        parser.add_argument('--password', default=PASSWORD, help='The password of every traveller.')
+        parser.add_argument('--seed', type=int, help='Seed the random choices to get the same dataset again.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=COPY_CHUNK_SIZE, help='Rows written per COPY statement.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_scale writes with COPY and needs PostgreSQL')
+        start = time.perf_counter()
+        try:
+            written = seed_dataset(
+                options['users'], options['flights'], options['bookings'],
+                password=options['password'], staff=options['staff'], days=options['days'],
+                seed=options['seed'], chunk_size=options['chunk_size'], log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(error)
+        seconds = time.perf_counter() - start
+        for table, rows in written.items():
+            self.stdout.write('{:<24} {:>12,} rows'.format(table, rows))
+        total = sum(written.values())
+        self.stdout.write(self.style.SUCCESS('Seeded {:,} rows in {:.1f}s, {:,.0f} rows per second'.format(
+            total, seconds, total / seconds)))
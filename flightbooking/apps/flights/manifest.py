@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from flightbooking.apps.core.streaming import stream_csv, stream_jsonl
+from flightbooking.apps.flights.models import Booking, Flight
+
+MANIFEST_FORMATS = ('csv', 'jsonl')
+
+# column name, booking lookup
+MANIFEST_COLUMNS = (
+    ('flight_id', 'flight_id'),
+    ('flight', 'flight__name'),
+    ('destination', 'flight__destination'),
+    ('departure_date', 'flight__departure_date'),
+    ('departure_time', 'flight__departure_time'),
+    ('booking_id', 'booking_id'),
+    ('seat', 'flight_seat'),
+    ('username', 'traveller__username'),
+    ('email', 'traveller__email'),
+    ('passport', 'passport'),
+)
+
+
+def manifest_rows(bookings):
+    """
+    Reads the manifest rows of some bookings as tuples through a server
+    side cursor, in a single query joining the flight, traveller and
+    profile.
+    :param bookings: QuerySet of Booking
+    :return: iterator of tuples, in MANIFEST_COLUMNS order
+    """
+    return bookings.annotate(
+        # the stored reference of the passport image, without building a
+        # cloudinary resource per row
+        passport=Cast('traveller__profile__passport', CharField()),
+    ).order_by('flight_id', 'booking_id').values_list(
+        *[lookup for _, lookup in MANIFEST_COLUMNS]
+    ).iterator(chunk_size=settings.MANIFEST_CHUNK_SIZE)
+
+
+def flight_manifest(flight_id=None, departure_date=None):
+    """
+    The bookings of a flight, or of every flight departing on a date.
+    :return: QuerySet of Booking
+    """
+    bookings = Booking.objects.all()
+    if flight_id is not None:
+        bookings = bookings.filter(flight_id=flight_id)
+    if departure_date is not None:
+        bookings = bookings.filter(flight__in=Flight.objects.departing_on(departure_date))
+    return bookings
+
+
+def stream_manifest(bookings, output='csv'):
+    """
+    Yields the manifest of some bookings as CSV or JSONL.
+    :param bookings: QuerySet of Booking
+    :param output: str, one of MANIFEST_FORMATS
+    """
+    columns = [column for column, _ in MANIFEST_COLUMNS]
+    rows = manifest_rows(bookings)
+    if output == 'jsonl':
+        return stream_jsonl(dict(zip(columns, row)) for row in rows)
+    return stream_csv(columns, rows)
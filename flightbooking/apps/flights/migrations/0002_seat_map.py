@@ -0,0 +1,80 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def rename_double_booked_seats(apps, schema_editor):
+    """
+    A seat is about to be booked at most once per flight. The first
+    booking of a double booked seat keeps it, later bookings keep the
+    seat suffixed with their id so that staff can find and move them.
+    """
+    Booking = apps.get_model('flights', 'Booking')
+    duplicates = Booking.objects.values('flight', 'flight_seat').annotate(
+        bookings=Count('booking_id')).filter(bookings__gt=1)
+    for flight_id, flight_seat in duplicates.values_list('flight', 'flight_seat'):
+        bookings = Booking.objects.filter(flight_id=flight_id, flight_seat=flight_seat).order_by('booking_id')
+        for booking in bookings[1:]:
+            booking.flight_seat = '{} ({})'.format(flight_seat[:240], booking.booking_id)
+            booking.save(update_fields=['flight_seat'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Seat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=8)),
+                ('position', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['flight_id', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='seat_columns',
+            field=models.CharField(default='ABCDEF', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='seat_rows',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(rename_double_booked_seats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('flight', 'flight_seat'), name='unique_flight_seat'),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='booking',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='seat', to='flights.Booking'),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='flight',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='flights.Flight'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(booking__isnull=True), fields=['flight', 'position'], name='free_seat_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='seat',
+            unique_together={('flight', 'label')},
+        ),
+    ]
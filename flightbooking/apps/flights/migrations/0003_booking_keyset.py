@@ -0,0 +1,21 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0002_seat_map'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='booking',
+            options={'ordering': ['flight_id', 'booking_id']},
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['flight', 'booking_id'], name='booking_flight_keyset_idx'),
+        ),
+    ]
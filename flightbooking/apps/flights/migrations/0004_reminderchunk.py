@@ -0,0 +1,31 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0003_booking_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('departure_date', models.DateField()),
+                ('sequence', models.PositiveIntegerField()),
+                ('recipients', models.TextField()),
+                ('failed_recipients', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['departure_date', 'sequence'],
+                'unique_together': {('departure_date', 'sequence')},
+            },
+        ),
+    ]
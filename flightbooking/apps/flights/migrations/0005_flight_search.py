@@ -0,0 +1,41 @@
+# Generated by Django 2.2.4 on 2026-10-18 16:50
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_flights(apps, schema_editor):
+    """
+    Flight names are about to become unique, flights renamed into an
+    existing name keep it suffixed with their id.
+    """
+    Flight = apps.get_model('flights', 'Flight')
+    duplicates = Flight.objects.values('name').annotate(flights=Count('flight_id')).filter(flights__gt=1)
+    for name in duplicates.values_list('name', flat=True):
+        for flight in Flight.objects.filter(name=name).order_by('flight_id')[1:]:
+            flight.name = '{} ({})'.format(name[:240], flight.flight_id)
+            flight.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0004_reminderchunk'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_flights, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='flight',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['destination', 'departure_date', 'departure_time'], name='flight_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['destination'], name='flight_destination_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
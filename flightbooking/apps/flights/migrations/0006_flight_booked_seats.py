@@ -0,0 +1,32 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:41
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_booked_seats(apps, schema_editor):
+    """
+    Sets the counter of every flight from its bookings in one UPDATE.
+    """
+    Flight = apps.get_model('flights', 'Flight')
+    Booking = apps.get_model('flights', 'Booking')
+    bookings = Booking.objects.filter(flight=OuterRef('pk')).order_by().values('flight').annotate(
+        bookings=Count('pk')).values('bookings')
+    Flight.objects.update(booked_seats=Coalesce(Subquery(bookings, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0005_flight_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='booked_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_booked_seats, migrations.RunPython.noop),
+    ]
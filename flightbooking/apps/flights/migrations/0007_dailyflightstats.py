@@ -0,0 +1,29 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0006_flight_booked_seats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFlightStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination', models.CharField(max_length=255)),
+                ('departure_date', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('cancellations', models.PositiveIntegerField(default=0)),
+                ('first_booked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_booked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['departure_date', 'destination'],
+                'unique_together': {('departure_date', 'destination')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+BATCH_SIZE = 10000
+
+
+def backfill_departs_at(apps, schema_editor):
+    """
+    Sets departs_at from the departure date and time, a range of ids per
+    statement so that each batch commits on its own and the table is not
+    locked while every flight is rewritten.
+    """
+    Flight = apps.get_model('flights', 'Flight')
+    last = Flight.objects.aggregate(last=Max('flight_id'))['last'] or 0
+    table = schema_editor.quote_name(Flight._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last + 1, BATCH_SIZE):
+            cursor.execute(
+                'UPDATE {} SET departs_at = (departure_date + departure_time) AT TIME ZONE %s '
+                'WHERE flight_id >= %s AND flight_id < %s AND departs_at IS NULL'.format(table),
+                [settings.TIME_ZONE, start, start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+    # the backfill commits batch by batch
+    atomic = False
+
+    dependencies = [
+        ('flights', '0007_dailyflightstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='departs_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_departs_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='flight',
+            name='departs_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='flight',
+            name='flight_search_idx',
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['destination', 'departs_at'], name='flight_destination_departs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departs_at'], name='flight_departs_at_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.4 on 2026-10-18 17:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def mark_reminded_flights(apps, schema_editor):
+    """
+    Marks the flights of the dates the daily reminder task already
+    planned, so that the scheduler does not remind their travellers again.
+    """
+    Flight = apps.get_model('flights', 'Flight')
+    ReminderChunk = apps.get_model('flights', 'ReminderChunk')
+    planned = ReminderChunk.objects.values_list('departure_date', flat=True).distinct()
+    Flight.objects.filter(departure_date__in=list(planned)).update(reminder_sent_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0008_flight_departs_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='reminderchunk',
+            options={'ordering': ['departure_date', 'flight', 'sequence']},
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminderchunk',
+            name='flight',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminder_chunks', to='flights.Flight'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reminderchunk',
+            unique_together={('flight', 'sequence')},
+        ),
+        migrations.RunPython(mark_reminded_flights, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['reminder_sent_at', 'departs_at'], name='flight_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.4 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0009_reminder_sent_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reminderchunk',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+    ]
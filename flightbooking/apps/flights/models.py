@@ -1,5 +1,6 @@
 from datetime import date
 import datetime
+from django.utils import timezone
 from django.utils.timezone import now
 
 from django.db import models
@@ -7,15 +8,133 @@ from flightbooking.apps.authentication.models import User
 from flightbooking.apps.core.models import TimestampsMixin
 
 
+class FlightQuerySet(models.QuerySet):
+
+    def departing_between(self, start, end):
+        """
+        The flights departing from start up to, but not including, end,
+        read with a range scan of the departs_at index.
+        """
+        return self.filter(departs_at__gte=start, departs_at__lt=end)
+
+    def departing_on(self, first_date, last_date=None):
+        """
+        The flights departing on a date, or from first_date to last_date
+        included, in the default time zone.
+        """
+        start = timezone.make_aware(datetime.datetime.combine(first_date, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(last_date or first_date, datetime.time.min))
+        return self.departing_between(start, end + datetime.timedelta(days=1))
+
+    def reminders_due(self, now, lead):
+        """
+        The flights not yet reminded about that depart within lead of now,
+        read with a range scan of the reminder index.
+        """
+        return self.filter(reminder_sent_at__isnull=True).departing_between(now, now + lead)
+
+
 class Flight(models.Model):
     flight_id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     destination = models.CharField(max_length=255)
     departure_date = models.DateField()
     departure_time = models.TimeField()
+    # the departure date and time as one instant in the default time zone,
+    # set by save() so that departure ranges are a single index scan
+    departs_at = models.DateTimeField()
+    # the seat map is seat_rows rows of seat_columns seats, a flight
+    # without rows has no seat map and takes free form seat names
+    seat_rows = models.PositiveSmallIntegerField(default=0)
+    seat_columns = models.CharField(max_length=10, default='ABCDEF')
+    capacity = models.PositiveIntegerField(default=0)
+    # the number of bookings, kept up to date with F() updates as seats
+    # are booked and cancelled, see occupancy.py
+    booked_seats = models.PositiveIntegerField(default=0)
+    # when the flight's reminder emails were planned, see emails.py
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = FlightQuerySet.as_manager()
 
     class Meta:
         ordering = ['flight_id']
+        indexes = [
+            # the flight search filters on destination, then a range of
+            # dates and times, and lists the results in departure order
+            models.Index(fields=['destination', 'departs_at'], name='flight_destination_departs_idx'),
+            models.Index(
+                fields=['destination'], name='flight_destination_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # reminders and searches without a destination read the flights
+            # departing within a window
+            models.Index(fields=['departs_at'], name='flight_departs_at_idx'),
+            # the reminder scheduler reads the flights without a reminder
+            # departing within a window
+            models.Index(fields=['reminder_sent_at', 'departs_at'], name='flight_reminder_due_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        flight = super().from_db(db, field_names, values)
+        # save() compares with the departure the flight was loaded with
+        flight._loaded_departs_at = flight.__dict__.get('departs_at')
+        return flight
+
+    def save(self, *args, **kwargs):
+        self.set_capacity()
+        self.set_departs_at()
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # booked_seats and reminder_sent_at are only ever changed in the
+            # database, saving a flight must not write back the values it
+            # was loaded with
+            excluded = ['booked_seats', 'reminder_sent_at']
+            if getattr(self, '_loaded_departs_at', self.departs_at) not in (None, self.departs_at):
+                # a flight moved to another departure is reminded about
+                # again before its new one
+                self.reminder_sent_at = None
+                excluded.remove('reminder_sent_at')
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in excluded
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_departs_at = self.departs_at
+
+    def set_capacity(self):
+        """
+        Sets the capacity from the seat map, flights written with
+        bulk_create skip save() and must call this themselves.
+        """
+        self.capacity = self.seat_rows * len(self.seat_columns)
+
+    def set_departs_at(self):
+        """
+        Sets departs_at from the departure date and time, flights written
+        with bulk_create skip save() and must call this themselves.
+        """
+        departure_date = self._meta.get_field('departure_date').to_python(self.departure_date)
+        departure_time = self._meta.get_field('departure_time').to_python(self.departure_time)
+        self.departs_at = timezone.make_aware(datetime.datetime.combine(departure_date, departure_time))
+
+    def seat_labels(self):
+        """
+        Returns the names of the flight's seats in seat map order, row
+        number followed by column letter.
+        :return: list
+        """
+        return [
+            '{}{}'.format(row, column)
+            for row in range(1, self.seat_rows + 1) for column in self.seat_columns
+        ]
+
+
+class BookingQuerySet(models.QuerySet):
+
+    def with_traveller_profiles(self):
+        """
+        Joins each booking's traveller and the traveller's profile so that
+        serializing a page of bookings does not query per row.
+        """
+        return self.select_related('traveller', 'traveller__profile')
 
 
 class Booking(TimestampsMixin):
@@ -28,8 +147,99 @@ class Booking(TimestampsMixin):
         related_name="flights",
         on_delete=models.CASCADE)
     flight_seat = models.CharField(max_length=255)
+
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['flight_id', 'booking_id']
+        indexes = [
+            models.Index(fields=['flight', 'booking_id'], name='booking_flight_keyset_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'flight_seat'], name='unique_flight_seat'),
+        ]
+
+
+class Seat(models.Model):
+    """
+    A seat on a flight's seat map. A seat is free while it has no booking.
+    """
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, related_name="seats"
+    )
+    label = models.CharField(max_length=8)
+    position = models.PositiveIntegerField()
+    booking = models.OneToOneField(
+        Booking, null=True, blank=True, on_delete=models.SET_NULL, related_name="seat"
+    )
+
+    class Meta:
+        ordering = ['flight_id', 'position']
+        unique_together = ['flight', 'label']
+        indexes = [
+            # lets the next free seat be found without reading taken seats
+            models.Index(
+                fields=['flight', 'position'], name='free_seat_idx',
+                condition=models.Q(booking__isnull=True)),
+        ]
     
 
+class DailyFlightStats(models.Model):
+    """
+    The bookings of the flights to a destination departing on a date,
+    added to as seats are booked and cancelled, see stats.py.
+    first_booked_at and last_booked_at span every booking made, cancelled
+    or not.
+    """
+    destination = models.CharField(max_length=255)
+    departure_date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    first_booked_at = models.DateTimeField(null=True, blank=True)
+    last_booked_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
-        ordering = ['flight_id']
-    
\ No newline at end of file
+        ordering = ['departure_date', 'destination']
+        # leads with the date so the unique index also serves date ranges
+        unique_together = ['departure_date', 'destination']
+
+
+class ReminderChunk(TimestampsMixin):
+    """
+    A batch of reminder emails for the travellers booked on a flight.
+    Recipients are stored one per line. Recipients whose email failed are
+    kept in failed_recipients so that a retry only resends to them.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, related_name="reminder_chunks", null=True
+    )
+    departure_date = models.DateField()
+    sequence = models.PositiveIntegerField()
+    recipients = models.TextField()
+    failed_recipients = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['departure_date', 'flight', 'sequence']
+        unique_together = ['flight', 'sequence']
+
+    def pending_recipients(self):
+        """
+        Returns the recipients still to be sent to, everyone before the
+        first attempt and only the failed recipients after it.
+        :return: list
+        """
+        recipients = self.failed_recipients if self.attempts else self.recipients
+        return [recipient for recipient in recipients.split('\n') if recipient]
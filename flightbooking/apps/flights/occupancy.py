@@ -0,0 +1,93 @@
+"""
+Flight occupancy, read from the booked_seats and capacity counters kept
+on each flight instead of counting bookings.
+"""
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, Coalesce, Greatest, Length
+
+from flightbooking.apps.flights.cache import bump_catalogue_version
+from flightbooking.apps.flights.models import Booking, Flight
+
+
+def count_booked_seats(flight_id, seats):
+    """
+    Adds seats to the flight's booked_seats, or takes them away when
+    negative, in a single UPDATE so that concurrent bookings add up. The
+    count never drops below zero, reconcile_occupancy() repairs drift.
+    :param flight_id: int
+    :param seats: int
+    """
+    if seats:
+        Flight.objects.filter(pk=flight_id).update(booked_seats=Greatest(F('booked_seats') + seats, 0))
+
+
+def load_factor():
+    """
+    The share of a flight's seats that are booked, annotate flights with
+    a seat map only.
+    """
+    return ExpressionWrapper(Cast('booked_seats', FloatField()) / F('capacity'), output_field=FloatField())
+
+
+def booking_count():
+    """
+    The number of bookings of the flight, as a subquery.
+    """
+    bookings = Booking.objects.filter(flight=OuterRef('pk')).order_by().values('flight').annotate(
+        bookings=Count('pk')).values('bookings')
+    return Coalesce(Subquery(bookings, output_field=IntegerField()), 0)
+
+
+def drifted_flights():
+    """
+    Returns the flights whose booked_seats or capacity does not match
+    their bookings or seat map.
+    """
+    return Flight.objects.annotate(
+        booking_count=booking_count(),
+        seat_count=ExpressionWrapper(F('seat_rows') * Length('seat_columns'), output_field=IntegerField()),
+    ).filter(~Q(booked_seats=F('booking_count')) | ~Q(capacity=F('seat_count')))
+
+
+def reconcile_flight(flight_id):
+    """
+    Recounts a flight's bookings and seats. The flight is locked first,
+    so bookings made meanwhile either are counted or add themselves to
+    the new count once the lock is released. Cached flight responses are
+    retired once a repaired capacity is committed.
+    :param flight_id: int
+    :return: ((booked_seats, capacity) before, (booked_seats, capacity) after),
+        or None when the flight is gone
+    """
+    with transaction.atomic():
+        flight = Flight.objects.select_for_update().filter(pk=flight_id).first()
+        if flight is None:
+            return None
+        before = (flight.booked_seats, flight.capacity)
+        flight.set_capacity()
+        after = (Booking.objects.filter(flight_id=flight_id).count(), flight.capacity)
+        if after != before:
+            Flight.objects.filter(pk=flight_id).update(booked_seats=after[0], capacity=after[1])
+    if after[1] != before[1]:
+        bump_catalogue_version()
+    return before, after
+
+
+def reconcile_occupancy(dry_run=False):
+    """
+    Repairs the counters of every flight that drifted from its bookings
+    or seat map.
+    :param dry_run: only report the flights that drifted
+    :return: list of (flight_id, before, after) of the flights repaired
+    """
+    repairs = []
+    for flight_id, booked_seats, capacity, bookings, seats in drifted_flights().values_list(
+            'flight_id', 'booked_seats', 'capacity', 'booking_count', 'seat_count'):
+        if dry_run:
+            repairs.append((flight_id, (booked_seats, capacity), (bookings, seats)))
+            continue
+        counts = reconcile_flight(flight_id)
+        if counts is not None and counts[0] != counts[1]:
+            repairs.append((flight_id,) + counts)
+    return repairs
@@ -1,19 +1,41 @@
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from flightbooking.apps.core.pagination import KeysetPagination
+
 
 class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Paginates by page number, or by cursor when the request asks for
+    ?pagination=cursor or carries a cursor. Cursor pages follow the view's
+    keyset_ordering and skip the total count unless ?count=true. Views
+    ordering by computed values set keyset_ordering to None and are only
+    paginated by page number.
+    """
     page_size = 12
 
     page_size_query_param = 'page_size'
 
     max_page_size = 12
 
+    mode_query_param = 'pagination'
+
+    keyset_pagination_class = KeysetPagination
+
     def paginate_queryset(self, queryset, request, view=None):
-        self.django_paginator_class._check_object_list_is_ordered = lambda s: None
+        self.keyset = None
+        if self.uses_cursor(request) and getattr(view, 'keyset_ordering', ()) is not None:
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view=view)
         return super().paginate_queryset(queryset, request, view=view)
 
+    def uses_cursor(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor' or
+                self.keyset_pagination_class.cursor_query_param in request.query_params)
+
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'links': {
                 'next': self.get_next_link(),
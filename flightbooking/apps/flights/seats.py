@@ -0,0 +1,225 @@
+from django.db import IntegrityError, transaction
+
+from flightbooking.apps.core.metrics import Counter
+from flightbooking.apps.flights.models import Booking, Seat
+from flightbooking.apps.flights.occupancy import count_booked_seats
+from flightbooking.apps.flights.stats import record_daily_bookings
+
+BOOKINGS_CREATED = Counter('bookings_created_total', 'Seats booked, one by one or in groups.')
+
+
+class SeatUnavailable(Exception):
+    """
+    Raised when a seat cannot be booked, the message says why.
+    """
+
+
+def build_seats(flight):
+    """
+    Returns the unsaved seats of a flight's seat map.
+    :param flight: Flight
+    :return: list
+    """
+    return [
+        Seat(flight=flight, label=label, position=position)
+        for position, label in enumerate(flight.seat_labels())
+    ]
+
+
+def create_seat_map(flight):
+    """
+    Replaces the seats of a flight with ones matching its seat map.
+    :param flight: Flight
+    """
+    Seat.objects.filter(flight=flight).delete()
+    Seat.objects.bulk_create(build_seats(flight))
+
+
+def lock_seat(flight, seat_label, booking=None):
+    """
+    Locks a seat of the flight's seat map until the transaction ends. The
+    seat must be free, or already held by booking.
+    :param flight: Flight
+    :param seat_label: str
+    :param booking: Booking
+    :return: Seat
+    """
+    seat = Seat.objects.select_for_update().filter(flight=flight, label=seat_label).first()
+    if seat is None:
+        raise SeatUnavailable('This seat does not exist on this flight')
+    if seat.booking_id is not None and (booking is None or seat.booking_id != booking.pk):
+        raise SeatUnavailable('This seat has already been booked')
+    return seat
+
+
+def lock_next_free_seat(flight):
+    """
+    Locks the first free seat of the flight's seat map until the
+    transaction ends. Seats locked by concurrent bookings are skipped
+    rather than waited for.
+    :param flight: Flight
+    :return: Seat
+    """
+    seat = Seat.objects.select_for_update(skip_locked=True).filter(
+        flight=flight, booking__isnull=True).order_by('position').first()
+    if seat is None:
+        raise SeatUnavailable('This flight is fully booked')
+    return seat
+
+
+def save_booking(booking, **kwargs):
+    """
+    Saves a booking, reporting a seat taken by a concurrent booking as
+    unavailable instead of failing the surrounding transaction.
+    """
+    try:
+        with transaction.atomic():
+            booking.save(**kwargs)
+    except IntegrityError:
+        raise SeatUnavailable('This seat has already been booked')
+
+
+@transaction.atomic
+def book_seat(flight, traveller, seat_label=None):
+    """
+    Books a seat on a flight for a traveller. When no seat is named the
+    next free seat of the flight's seat map is assigned. Flights without a
+    seat map accept any seat name that has not been booked yet.
+    :param flight: Flight
+    :param traveller: User
+    :param seat_label: str
+    :return: Booking
+    """
+    seat = None
+    if seat_label is None:
+        if not flight.capacity:
+            raise SeatUnavailable('This flight has no seat map to assign a seat from')
+        seat = lock_next_free_seat(flight)
+        seat_label = seat.label
+    elif flight.capacity:
+        seat = lock_seat(flight, seat_label)
+
+    booking = Booking(flight=flight, traveller=traveller, flight_seat=seat_label)
+    save_booking(booking)
+    if seat is not None:
+        seat.booking = booking
+        seat.save(update_fields=['booking'])
+    count_booked_seats(flight.pk, 1)
+    record_daily_bookings(flight.destination, flight.departure_date, 1, booked_at=booking.created_at)
+    BOOKINGS_CREATED.inc()
+    return booking
+
+
+@transaction.atomic
+def change_seat(booking, seat_label):
+    """
+    Moves a booking to another seat on its flight, saving any other
+    changes made to the booking.
+    :param booking: Booking
+    :param seat_label: str
+    :return: Booking
+    """
+    flight = booking.flight
+    held_seats = Seat.objects.filter(booking=booking)
+    if flight.capacity:
+        seat = lock_seat(flight, seat_label, booking)
+        held_seats.exclude(pk=seat.pk).update(booking=None)
+        seat.booking = booking
+        seat.save(update_fields=['booking'])
+    else:
+        held_seats.update(booking=None)
+    booking.flight_seat = seat_label
+    save_booking(booking)
+    return booking
+
+
+@transaction.atomic
+def book_seats(flight, requests):
+    """
+    Books several seats on a flight at once, either all of them or none.
+    Named seats are locked together, the seats to assign are the next free
+    ones after them, and the bookings are written with one INSERT and the
+    seats with one UPDATE whatever the number of seats.
+    :param flight: Flight
+    :param requests: list of (traveller, seat label or None to assign one)
+    :return: list of Booking, in the order of requests
+    """
+    labels = [label for _, label in requests if label is not None]
+    if len(set(labels)) != len(labels):
+        raise SeatUnavailable('The same seat cannot be booked twice')
+    assign = len(requests) - len(labels)
+    if assign and not flight.capacity:
+        raise SeatUnavailable('This flight has no seat map to assign a seat from')
+
+    seats = {}
+    if flight.capacity:
+        seats = {
+            seat.label: seat
+            for seat in Seat.objects.select_for_update().filter(flight=flight, label__in=labels)
+        }
+        for label in labels:
+            if label not in seats:
+                raise SeatUnavailable('Seat {} does not exist on this flight'.format(label))
+            if seats[label].booking_id is not None:
+                raise SeatUnavailable('Seat {} has already been booked'.format(label))
+    free_seats = []
+    if assign:
+        free_seats = list(Seat.objects.select_for_update(skip_locked=True).filter(
+            flight=flight, booking__isnull=True).exclude(label__in=labels).order_by('position')[:assign])
+        if len(free_seats) < assign:
+            raise SeatUnavailable('This flight does not have {} free seats'.format(len(requests)))
+
+    free_seats = iter(free_seats)
+    bookings, seat_bookings = [], []
+    for traveller, label in requests:
+        seat = next(free_seats) if label is None else seats.get(label)
+        booking = Booking(flight=flight, traveller=traveller, flight_seat=seat.label if seat else label)
+        bookings.append(booking)
+        if seat is not None:
+            seat_bookings.append((seat, booking))
+    try:
+        with transaction.atomic():
+            Booking.objects.bulk_create(bookings)
+    except IntegrityError:
+        raise SeatUnavailable('One of these seats has already been booked')
+    # the bookings only have ids once inserted
+    for seat, booking in seat_bookings:
+        seat.booking = booking
+    Seat.objects.bulk_update([seat for seat, _ in seat_bookings], ['booking'])
+    count_booked_seats(flight.pk, len(bookings))
+    record_daily_bookings(flight.destination, flight.departure_date, len(bookings), booked_at=bookings[0].created_at)
+    BOOKINGS_CREATED.inc(len(bookings))
+    return bookings
+
+
+def cancel_bookings(flight, booking_ids, traveller=None):
+    """
+    Cancels the bookings of a flight with the given ids, freeing their
+    seats. Only the bookings of traveller are cancelled when one is given.
+    :param flight: Flight
+    :param booking_ids: list of int
+    :param traveller: User
+    :return: int, the number of bookings cancelled
+    """
+    bookings = Booking.objects.filter(flight=flight, pk__in=booking_ids)
+    if traveller is not None:
+        bookings = bookings.filter(traveller=traveller)
+    with transaction.atomic():
+        # the delete frees the seats of all the bookings with one UPDATE
+        # before removing the bookings with one DELETE
+        cancelled, _ = bookings.delete()
+        count_booked_seats(flight.pk, -cancelled)
+        if cancelled:
+            record_daily_bookings(flight.destination, flight.departure_date, -cancelled, cancelled)
+    return cancelled
+
+
+@transaction.atomic
+def cancel_booking(booking):
+    """
+    Cancels a booking, freeing its seat.
+    :param booking: Booking
+    """
+    booking.delete()
+    count_booked_seats(booking.flight_id, -1)
+    record_daily_bookings(booking.flight.destination, booking.flight.departure_date, -1, 1)
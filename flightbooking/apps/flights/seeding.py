@@ -0,0 +1,212 @@
+"""
+Generates large datasets of travellers, flights and bookings for load
+and scaling tests, see the seed_scale command.
+"""
+import csv
+import datetime
+import io
+import random
+import time
+from collections import OrderedDict
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.models import Booking, Flight, Seat
+from flightbooking.apps.profiles.models import Profile
+
+PASSWORD = 'password1U@#}'
+USERNAME_PREFIX = 'traveller'
+COPY_CHUNK_SIZE = 100000
+
+# destinations in order of popularity, the nth is booked about 1/n as often
+# as the first
+DESTINATIONS = (
+    'London', 'Dubai', 'Johannesburg', 'New York', 'Paris', 'Mombasa', 'Amsterdam', 'Kigali', 'Lagos',
+    'Cairo', 'Addis Ababa', 'Dar es Salaam', 'Entebbe', 'Mumbai', 'Doha', 'Istanbul', 'Frankfurt',
+    'Cape Town', 'Accra', 'Zanzibar', 'Bangkok', 'Guangzhou', 'Kinshasa', 'Lusaka', 'Harare', 'Mauritius',
+    'Seychelles', 'Kilimanjaro', 'Juba', 'Mogadishu',
+)
+# departures cluster in the morning and evening peaks
+HOUR_WEIGHTS = (1, 1, 1, 1, 2, 4, 8, 9, 8, 6, 5, 5, 5, 5, 5, 6, 7, 9, 9, 8, 6, 4, 2, 1)
+# more flights leave on Fridays and Sundays
+WEEKDAY_WEIGHTS = (10, 9, 9, 10, 13, 11, 13)
+# seat rows by aircraft, and how common the aircraft is
+SEAT_ROWS = ((20, 2), (30, 5), (40, 3))
+SEAT_COLUMNS = 'ABCDEF'
+# flights are booked to a load factor drawn from Beta(8, 2), 80% on average
+LOAD_FACTOR = (8, 2)
+
+
+class CopyWriter:
+    """
+    Buffers the rows of a table as CSV and writes them with a Postgres
+    COPY every chunk_size rows.
+    """
+
+    def __init__(self, cursor, table, columns, chunk_size=COPY_CHUNK_SIZE, not_null=()):
+        self.cursor, self.chunk_size = cursor, chunk_size
+        self.sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv{})'.format(
+            table, ', '.join(columns), ', FORCE_NOT_NULL ({})'.format(', '.join(not_null)) if not_null else '')
+        self.rows = 0
+        self.pending = 0
+        self.start_buffer()
+
+    def start_buffer(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.buffer.seek(0)
+            self.cursor.copy_expert(self.sql, self.buffer)
+            self.rows += self.pending
+            self.pending = 0
+            self.start_buffer()
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max(model._meta.pk.attname))['last'] or 0) + 1
+
+
+def weighted(rng, values, weights):
+    """
+    Returns a function picking one of values in proportion to weights.
+    """
+    cumulative = list(accumulate(weights))
+    return lambda: rng.choices(values, cum_weights=cumulative)[0]
+
+
+def plan_occupancy(rng, capacities, bookings):
+    """
+    Books every flight to a load factor drawn from LOAD_FACTOR, scaled so
+    that the flights hold bookings seats in all.
+    :return: list of the number of seats booked on each flight
+    """
+    wanted = [int(capacity * rng.betavariate(*LOAD_FACTOR)) for capacity in capacities]
+    total = sum(wanted)
+    if total < bookings:
+        raise ValueError('{} flights only have room for about {} bookings, seed more flights'.format(
+            len(capacities), total))
+    booked = [count * bookings // total for count in wanted]
+    # hand the seats lost to rounding to the flights with room left
+    for index in rng.sample(range(len(capacities)), len(capacities)):
+        if sum(booked) == bookings:
+            break
+        if booked[index] < capacities[index]:
+            booked[index] += 1
+    return booked
+
+
+def seed_dataset(users, flights, bookings, password=PASSWORD, staff=1, days=180, seed=None,
+                 chunk_size=COPY_CHUNK_SIZE, log=None):
+    """
+    Writes users with profiles, flights with seat maps and bookings with
+    Postgres COPY, in a single transaction. Every user shares one password
+    hash, the first staff users are staff. Users are named
+    traveller<id> with the email traveller<id>@gmail.com. Ids are set
+    here so seats can point at their bookings, the sequences are moved
+    past them at the end.
+    :param log: callable receiving a line of progress
+    :return: OrderedDict of table -> rows written
+    """
+    rng = random.Random(seed)
+    log = log or (lambda line: None)
+    now = timezone.now().isoformat()
+    first_date = datetime.date.today() + datetime.timedelta(days=1)
+    written = OrderedDict()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        start = time.perf_counter()
+        first_user = next_id(User)
+        user_ids = range(first_user, first_user + users)
+        password_hash = make_password(password)
+        user_writer = CopyWriter(cursor, User._meta.db_table, [
+            'id', 'password', 'is_superuser', 'username', 'email', 'is_staff', 'is_active'], chunk_size)
+        profile_writer = CopyWriter(
+            cursor, Profile._meta.db_table, ['user_id', 'image', 'passport'], chunk_size,
+            not_null=['image', 'passport'])
+        for user_id in user_ids:
+            username = '{}{}'.format(USERNAME_PREFIX, user_id)
+            user_writer.write([
+                user_id, password_hash, 'f', username, '{}@gmail.com'.format(username),
+                't' if user_id - first_user < staff else 'f', 't'])
+            profile_writer.write([user_id, '', ''])
+        user_writer.flush()
+        profile_writer.flush()
+        written[User._meta.db_table] = user_writer.rows
+        written[Profile._meta.db_table] = profile_writer.rows
+        log('{} users in {:.1f}s'.format(users, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        destination = weighted(rng, DESTINATIONS, [1 / rank for rank in range(1, len(DESTINATIONS) + 1)])
+        dates = [first_date + datetime.timedelta(days=day) for day in range(days)]
+        departure_date = weighted(rng, dates, [WEEKDAY_WEIGHTS[date.weekday()] for date in dates])
+        hour = weighted(rng, range(24), HOUR_WEIGHTS)
+        seat_rows = weighted(rng, [rows for rows, _ in SEAT_ROWS], [weight for _, weight in SEAT_ROWS])
+
+        first_flight = next_id(Flight)
+        flight_rows = [seat_rows() for _ in range(flights)]
+        capacities = [rows * len(SEAT_COLUMNS) for rows in flight_rows]
+        occupancy = plan_occupancy(rng, capacities, bookings)
+        flight_writer = CopyWriter(cursor, Flight._meta.db_table, [
+            'flight_id', 'name', 'destination', 'departure_date', 'departure_time',
+            'departs_at', 'seat_rows', 'seat_columns', 'capacity', 'booked_seats'], chunk_size)
+        for offset, (rows, booked) in enumerate(zip(flight_rows, occupancy)):
+            flight_id = first_flight + offset
+            departs_at = timezone.make_aware(datetime.datetime.combine(
+                departure_date(), datetime.time(hour(), rng.randrange(0, 60, 5))))
+            flight_writer.write([
+                flight_id, 'Flight {}'.format(flight_id), destination(), departs_at.date().isoformat(),
+                departs_at.time().isoformat(), departs_at.isoformat(), rows, SEAT_COLUMNS,
+                capacities[offset], booked])
+        flight_writer.flush()
+        written[Flight._meta.db_table] = flight_writer.rows
+        log('{} flights in {:.1f}s'.format(flights, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        booking_id = next_id(Booking)
+        booking_writer = CopyWriter(cursor, Booking._meta.db_table, [
+            'booking_id', 'flight_id', 'traveller_id', 'flight_seat', 'created_at', 'updated_at'], chunk_size)
+        seat_writer = CopyWriter(cursor, Seat._meta.db_table, ['flight_id', 'label', 'position', 'booking_id'], chunk_size)
+        labels = {
+            rows: ['{}{}'.format(row, column) for row in range(1, rows + 1) for column in SEAT_COLUMNS]
+            for rows, _ in SEAT_ROWS
+        }
+        for offset, (rows, booked) in enumerate(zip(flight_rows, occupancy)):
+            flight_id = first_flight + offset
+            taken = set(rng.sample(range(len(labels[rows])), booked))
+            for position, label in enumerate(labels[rows]):
+                if position in taken:
+                    booking_writer.write([
+                        booking_id, flight_id, rng.choice(user_ids), label, now, now])
+                    seat_writer.write([flight_id, label, position, booking_id])
+                    booking_id += 1
+                else:
+                    seat_writer.write([flight_id, label, position, None])
+        # foreign keys are checked at commit, so the seats may be written
+        # before the bookings they point at
+        booking_writer.flush()
+        seat_writer.flush()
+        written[Booking._meta.db_table] = booking_writer.rows
+        written[Seat._meta.db_table] = seat_writer.rows
+        log('{} bookings and {} seats in {:.1f}s'.format(
+            booking_writer.rows, seat_writer.rows, time.perf_counter() - start))
+
+        for sql in connection.ops.sequence_reset_sql(no_style(), [User, Profile, Flight, Booking, Seat]):
+            cursor.execute(sql)
+    with connection.cursor() as cursor:
+        for table in written:
+            cursor.execute('ANALYZE {}'.format(table))
+    return written
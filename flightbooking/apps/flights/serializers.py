@@ -1,11 +1,19 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
 from rest_framework import serializers
 
-from flightbooking.apps.flights.models import Flight, Booking
+from flightbooking.apps.core.serializers import TimedListSerializer, TimedSerializerMixin, ValuesSerializer
+from flightbooking.apps.flights.cache import bump_catalogue_version
+from flightbooking.apps.flights.models import Flight, Booking, DailyFlightStats
+from flightbooking.apps.flights.occupancy import count_booked_seats
+from flightbooking.apps.flights.seats import change_seat, create_seat_map
+from flightbooking.apps.flights.stats import record_daily_bookings
 from flightbooking.apps.profiles.serializers import ProfileSerializer
-from flightbooking.apps.profiles.models import Profile
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class FlightSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     flight_id = serializers.IntegerField(required=False)
     name = serializers.CharField(
         max_length=255,
@@ -37,49 +45,228 @@ class FlightSerializer(serializers.ModelSerializer):
             'blank': 'The flight must have a departure time',
             'required': "The flight must have a departure_time",
         })
+    seat_rows = serializers.IntegerField(
+        required=False,
+        min_value=0,
+        max_value=500,
+        error_messages={
+            'max_value': "The flight cannot have more than 500 rows of seats",
+        })
+    seat_columns = serializers.RegexField(
+        r'^[A-Z]{1,10}$',
+        required=False,
+        error_messages={
+            'invalid': "Seat columns must be between 1 and 10 capital letters",
+        })
+    capacity = serializers.IntegerField(read_only=True)
+    departs_at = serializers.DateTimeField(read_only=True)
 
     class Meta:
         model = Flight
-        fields = ['flight_id', 'name', 'destination', 'departure_date', 'departure_time']
+        fields = [
+            'flight_id', 'name', 'destination', 'departure_date', 'departure_time', 'departs_at',
+            'seat_rows', 'seat_columns', 'capacity'
+        ]
+        list_serializer_class = TimedListSerializer
 
-    
+    @transaction.atomic
     def create(self, validated_data):
         flight = Flight.objects.create(**validated_data)
+        create_seat_map(flight)
+        bump_catalogue_version()
         return flight
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        seat_map = (instance.seat_rows, instance.seat_columns)
+        day = (instance.destination, instance.departure_date)
         for (key, value) in validated_data.items():
             setattr(instance, key, value)
+        seat_map_changed = seat_map != (instance.seat_rows, instance.seat_columns)
+        if seat_map_changed and instance.bookings.exists():
+            raise serializers.ValidationError(
+                {'errors': "The seat map cannot change once the flight has bookings"})
         instance.save()
+        if seat_map_changed:
+            create_seat_map(instance)
+        if day != (instance.destination, instance.departure_date):
+            # the flight's bookings move to the stats of its new day
+            moved = instance.bookings.aggregate(
+                bookings=Count('pk'), first_booked_at=Min('created_at'), last_booked_at=Max('created_at'))
+            if moved['bookings']:
+                record_daily_bookings(*day, bookings=-moved['bookings'])
+                record_daily_bookings(
+                    instance.destination, instance.departure_date, moved['bookings'],
+                    booked_at=moved['first_booked_at'], last_booked_at=moved['last_booked_at'])
+        bump_catalogue_version()
         return instance
 
+    def validate_seat_columns(self, data):
+        if len(set(data)) != len(data):
+            raise serializers.ValidationError("Seat columns must not repeat")
+        return data
+
     def validate_flightname(self, data):
-        if Flight.objects.filter(name=data):
+        flights = Flight.objects.filter(name=data)
+        if self.instance is not None:
+            flights = flights.exclude(pk=self.instance.pk)
+        if flights.exists():
             raise serializers.ValidationError(
                 {'errors': "Flight name already exists"})
         return data
 
-    
 
+class FlightValuesSerializer(ValuesSerializer):
+    """
+    Lists flights as FlightSerializer does, from values_list() rows.
+    """
+    serializer_class = FlightSerializer
+
+
+class LoadFactorSerializer(serializers.ModelSerializer):
+    """
+    A flight's occupancy, read from flights annotated with their load_factor.
+    """
+    load_factor = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Flight
+        fields = [
+            'flight_id', 'name', 'destination', 'departure_date', 'departure_time',
+            'capacity', 'booked_seats', 'load_factor'
+        ]
+        read_only_fields = fields
+
+
+class LoadFactorValuesSerializer(ValuesSerializer):
+    """
+    Lists flights as LoadFactorSerializer does, from values_list() rows.
+    """
+    serializer_class = LoadFactorSerializer
+
+
+class DailyFlightStatsSerializer(serializers.ModelSerializer):
+    """
+    A day of the operations report. The lead times are the days from the
+    first and the last booking to the departure date.
+    """
+    first_booking_lead_days = serializers.SerializerMethodField()
+    last_booking_lead_days = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DailyFlightStats
+        fields = [
+            'destination', 'departure_date', 'bookings', 'cancellations', 'first_booked_at', 'last_booked_at',
+            'first_booking_lead_days', 'last_booking_lead_days'
+        ]
+        read_only_fields = fields
+
+    def lead_days(self, obj, booked_at):
+        if booked_at is None:
+            return None
+        return (obj.departure_date - timezone.localtime(booked_at).date()).days
+
+    def get_first_booking_lead_days(self, obj):
+        return self.lead_days(obj, obj.first_booked_at)
+
+    def get_last_booking_lead_days(self, obj):
+        return self.lead_days(obj, obj.last_booked_at)
 
-class BookingSerializer(serializers.ModelSerializer):
+
+class BookingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     booking_id = serializers.IntegerField(required=False)
     traveller = serializers.SerializerMethodField(read_only=True)
     flight_seat = serializers.CharField(
-        required=True,
+        required=False,
+        max_length=255,
         error_messages={
             'blank': 'The booking must have a flight seat',
             'required': "The booking must have a flight seat",
         })
+    # books the next free seat of the flight's seat map instead
+    auto_assign = serializers.BooleanField(write_only=True, required=False, default=False)
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
 
     class Meta:
         model = Booking
-        fields = ['booking_id', 'traveller', 'flight_seat', 'created_at', 'updated_at']
+        fields = ['booking_id', 'traveller', 'flight_seat', 'auto_assign', 'created_at', 'updated_at']
+        list_serializer_class = TimedListSerializer
+
+    def validate(self, data):
+        if not self.partial and not data.get('auto_assign') and 'flight_seat' not in data:
+            raise serializers.ValidationError(
+                {'flight_seat': ["The booking must have a flight seat"]})
+        return data
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        validated_data.pop('auto_assign', None)
+        seat_label = validated_data.pop('flight_seat', instance.flight_seat)
+        flight = instance.flight
+        for (key, value) in validated_data.items():
+            setattr(instance, key, value)
+        booking = change_seat(instance, seat_label)
+        if booking.flight_id != flight.pk:
+            count_booked_seats(flight.pk, -1)
+            count_booked_seats(booking.flight_id, 1)
+            record_daily_bookings(flight.destination, flight.departure_date, -1)
+            record_daily_bookings(
+                booking.flight.destination, booking.flight.departure_date, 1, booked_at=booking.created_at)
+        return booking
 
     def get_traveller(self, obj):
-        serializer = ProfileSerializer(
-            instance=Profile.objects.get(user=obj.traveller)
-        )
-        return serializer.data
\ No newline at end of file
+        # relies on the traveller and profile being joined by
+        # Booking.objects.with_traveller_profiles() for list views
+        serializer = ProfileSerializer(instance=obj.traveller.profile)
+        return serializer.data
+
+
+class TravellerValuesSerializer(ValuesSerializer):
+    """
+    Represents a traveller's profile as ProfileSerializer does, reading it
+    through the traveller.
+    """
+    serializer_class = ProfileSerializer
+    lookups = {'username': 'username', 'image': 'profile__image', 'passport': 'profile__passport'}
+
+
+class BookingValuesSerializer(ValuesSerializer):
+    """
+    Lists bookings as BookingSerializer does, from values_list() rows.
+    """
+    serializer_class = BookingSerializer
+    nested = {'traveller': (TravellerValuesSerializer, 'traveller__')}
+
+
+class GroupBookingSerializer(BookingSerializer):
+    """
+    A booking within a group booking, it is for the traveller making the
+    group booking unless it names another registered traveller.
+    """
+    traveller_email = serializers.EmailField(write_only=True, required=False)
+
+    class Meta(BookingSerializer.Meta):
+        fields = BookingSerializer.Meta.fields + ['traveller_email']
+
+
+class GroupBookingsSerializer(serializers.Serializer):
+    bookings = GroupBookingSerializer(many=True)
+
+    def validate_bookings(self, data):
+        if not data:
+            raise serializers.ValidationError("The group booking must have at least one booking")
+        if len(data) > settings.GROUP_BOOKING_MAX_SEATS:
+            raise serializers.ValidationError(
+                "A group booking cannot have more than {} bookings".format(settings.GROUP_BOOKING_MAX_SEATS))
+        return data
+
+
+class CancelBookingsSerializer(serializers.Serializer):
+    booking_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        error_messages={
+            'required': "Provide the ids of the bookings to cancel",
+            'empty': "Provide the ids of the bookings to cancel",
+        })
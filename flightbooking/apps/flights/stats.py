@@ -0,0 +1,183 @@
+"""
+The daily operations report: bookings, cancellations and booking lead
+times per destination and departure date, kept in DailyFlightStats.
+
+Bookings add themselves to their day's stats as they are made and
+cancelled, so reading the report never scans the bookings. The stats of
+bookings made before the report existed, or written outside the API, are
+recomputed with backfill_daily_stats(), which splits the departure dates
+into ranges and computes them in a pool of processes.
+"""
+import datetime
+import multiprocessing
+
+import numpy as np
+from django.db import connection, connections, transaction
+from django.db.models import FloatField, Func, Max, Min
+from django.utils import timezone
+
+from flightbooking.apps.flights.models import Booking, DailyFlightStats, Flight
+
+TABLE = DailyFlightStats._meta.db_table
+
+# adds to the stats of a day, creating them on its first booking
+ADD_SQL = """
+    INSERT INTO {table} AS stats
+        (destination, departure_date, bookings, cancellations, first_booked_at, last_booked_at)
+    VALUES (%(destination)s, %(departure_date)s, GREATEST(%(bookings)s, 0), %(cancellations)s,
+            %(booked_at)s, %(last_booked_at)s)
+    ON CONFLICT (departure_date, destination) DO UPDATE SET
+        bookings = GREATEST(stats.bookings + %(bookings)s, 0),
+        cancellations = stats.cancellations + %(cancellations)s,
+        first_booked_at = LEAST(stats.first_booked_at, EXCLUDED.first_booked_at),
+        last_booked_at = GREATEST(stats.last_booked_at, EXCLUDED.last_booked_at)
+""".format(table=TABLE)
+
+# replaces the bookings of a day with recomputed ones, cancellations are
+# not recorded anywhere else and are kept
+REPLACE_SQL = """
+    INSERT INTO {table} AS stats (destination, departure_date, bookings, cancellations, first_booked_at, last_booked_at)
+    VALUES (%s, %s, %s, 0, %s, %s)
+    ON CONFLICT (departure_date, destination) DO UPDATE SET
+        bookings = EXCLUDED.bookings,
+        first_booked_at = EXCLUDED.first_booked_at,
+        last_booked_at = EXCLUDED.last_booked_at
+""".format(table=TABLE)
+
+
+class Epoch(Func):
+    """
+    The seconds since the epoch of a datetime column.
+    """
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def record_daily_bookings(destination, departure_date, bookings=0, cancellations=0, booked_at=None,
+                          last_booked_at=None):
+    """
+    Adds bookings, or takes them away when negative, and cancellations to
+    the stats of a destination and departure date in a single statement.
+    :param booked_at: datetime of the bookings added, the first of them
+        when last_booked_at is given, None when none were
+    :param last_booked_at: datetime of the last of the bookings added
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(ADD_SQL, {
+            'destination': destination, 'departure_date': departure_date, 'bookings': bookings,
+            'cancellations': cancellations, 'booked_at': booked_at, 'last_booked_at': last_booked_at or booked_at,
+        })
+
+
+def date_ranges(start, end, days):
+    """
+    Splits the dates from start to end, both included, into ranges of
+    days dates.
+    :return: list of (first date, last date)
+    """
+    ranges = []
+    while start <= end:
+        last = min(start + datetime.timedelta(days=days - 1), end)
+        ranges.append((start, last))
+        start = last + datetime.timedelta(days=1)
+    return ranges
+
+
+def compute_daily_stats(start, end):
+    """
+    Computes the bookings, first and last booking time of the days from
+    start to end. The bookings are read with the day of their flight in
+    one statement, so flights moved while they are read cannot mix up
+    days, and grouped by day with NumPy.
+    :return: list of (destination, departure date, bookings, first booked
+        at, last booked at)
+    """
+    rows = Booking.objects.filter(flight__in=Flight.objects.departing_on(start, end)).order_by().values_list(
+        'flight_id', 'flight__departure_date', 'flight__destination', Epoch('created_at'))
+    rows = list(rows)
+    if not rows:
+        return []
+    # the day of each booking is looked up once per flight
+    flight_ids, first_rows, booked_flights = np.unique(
+        np.array([row[0] for row in rows], dtype=np.int64), return_index=True, return_inverse=True)
+    flight_days = [rows[index][1:3] for index in first_rows]
+    days = sorted(set(flight_days))
+    day_index = {day: index for index, day in enumerate(days)}
+    booked_days = np.array([day_index[day] for day in flight_days])[booked_flights]
+    booked_at = np.array([row[3] for row in rows], dtype=np.float64)
+
+    # sorting by day, then time, puts each day's first and last booking at
+    # the edges of its run
+    order = np.lexsort((booked_at, booked_days))
+    booked_days, booked_at = booked_days[order], booked_at[order]
+    starts = np.flatnonzero(np.r_[True, booked_days[1:] != booked_days[:-1]])
+    ends = np.r_[starts[1:], len(booked_days)]
+
+    def to_datetime(seconds):
+        return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+
+    stats = []
+    for first, last in zip(starts, ends):
+        departure_date, destination = days[booked_days[first]]
+        stats.append((
+            destination, departure_date, int(last - first),
+            to_datetime(booked_at[first]), to_datetime(booked_at[last - 1])))
+    return stats
+
+
+def backfill_range(date_range):
+    """
+    Recomputes the stats of a range of departure dates in a transaction.
+    Days left without bookings or cancellations are removed.
+    :param date_range: (first date, last date)
+    :return: (date_range, days written, bookings counted)
+    """
+    start, end = date_range
+    days = compute_daily_stats(start, end)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {} SET bookings = 0, first_booked_at = NULL, last_booked_at = NULL '
+            'WHERE departure_date BETWEEN %s AND %s'.format(TABLE), [start, end])
+        cursor.executemany(REPLACE_SQL, days)
+        DailyFlightStats.objects.filter(
+            departure_date__range=(start, end), bookings=0, cancellations=0).delete()
+    return date_range, len(days), sum(day[2] for day in days)
+
+
+def backfill_daily_stats(start=None, end=None, days=30, workers=1, log=None):
+    """
+    Recomputes the stats of the departure dates from start to end, every
+    flight's by default, days dates at a time. With more than one worker
+    the ranges are computed in a pool of processes, each with a database
+    connection of its own, so call it outside of a transaction. Bookings
+    made while their range is recomputed may be missed, run it when
+    bookings are quiet or again afterwards.
+    :param log: callable receiving each (date_range, days written, bookings counted)
+    :return: int, the number of bookings counted
+    """
+    if start is None or end is None:
+        # the first and last departures are read from the ends of the departs_at index
+        bounds = Flight.objects.aggregate(first=Min('departs_at'), last=Max('departs_at'))
+        if bounds['first'] is None:
+            return 0
+        start = start or timezone.localtime(bounds['first']).date()
+        end = end or timezone.localtime(bounds['last']).date()
+    ranges = date_ranges(start, end, days)
+    log = log or (lambda result: None)
+    counted = 0
+    if workers == 1:
+        results = map(backfill_range, ranges)
+    else:
+        # the workers are forked, they must not share the parent's connections
+        connections.close_all()
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(backfill_range, ranges)
+    try:
+        for result in results:
+            counted += result[2]
+            log(result)
+    finally:
+        if workers != 1:
+            pool.close()
+            pool.join()
+    return counted
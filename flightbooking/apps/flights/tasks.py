@@ -1,17 +1,43 @@
-from celery.task.schedules import crontab
+import datetime
+
+from celery import group, shared_task
 from celery.decorators import periodic_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 
-from flightbooking.apps.flights.emails import send_reminder_email
+from flightbooking.apps.flights.emails import (
+    claim_reminder_chunk, plan_due_reminders, send_reminder_chunk, stalled_reminder_chunks
+)
 
 logger = get_task_logger(__name__)
 
 
 @periodic_task(
-    run_every=(crontab(hour='*/24')),
+    run_every=datetime.timedelta(minutes=settings.REMINDER_EMAIL_INTERVAL_MINUTES),
     name="send_reminder_email_task",
     ignore_result=True)
 def task_send_reminder_email():
-    """sends an email when user books a flight"""
-    send_reminder_email()
-    logger.info("Sent reminder email")
\ No newline at end of file
+    """queues the reminder emails of the flights whose reminder window opened and of stalled chunks, a chunk per subtask"""
+    chunk_ids = plan_due_reminders()
+    stalled_ids = stalled_reminder_chunks()
+    group(task_send_reminder_chunk.s(chunk_id) for chunk_id in chunk_ids + stalled_ids).apply_async()
+    logger.info("Queued {} reminder email chunks, {} of them again".format(
+        len(chunk_ids) + len(stalled_ids), len(stalled_ids)))
+
+
+@shared_task(
+    bind=True,
+    name="send_reminder_chunk_task",
+    max_retries=3,
+    default_retry_delay=5 * 60,
+    ignore_result=True)
+def task_send_reminder_chunk(self, chunk_id):
+    """sends the pending reminder emails of a chunk, retrying the ones that failed"""
+    # a chunk queued again may be sent by another worker, skip it while it is
+    chunk = claim_reminder_chunk(chunk_id)
+    if chunk is None:
+        return
+    failed = send_reminder_chunk(chunk)
+    logger.info("Sent reminder email chunk {}, {} failed".format(chunk_id, failed))
+    if failed:
+        raise self.retry()
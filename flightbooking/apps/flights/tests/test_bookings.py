@@ -2,9 +2,14 @@ import json
 import random
 import string
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.reverse import reverse
+from flightbooking.apps.authentication.models import User
 from flightbooking.apps.authentication.tests.test_auth import AuthenticatedTestCase
+from flightbooking.apps.flights.models import Booking
+from flightbooking.apps.profiles.models import Profile
 from flightbooking.apps.flights.tests.test_flights import BaseFlightsTestCase
 
 
@@ -104,6 +109,48 @@ class GetBookingsTestCase(BaseBookingsTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class BookingQueryCountTestCase(BaseBookingsTestCase):
+    """
+    The bookings list must not run a query per booking
+    """
+
+    def create_travellers_bookings(self, flight_id, count):
+        for index in range(count):
+            traveller = User.objects.create_user(
+                username="traveller{}".format(index),
+                email="traveller{}@gmail.com".format(index))
+            Profile.objects.create(user=traveller)
+            Booking.objects.create(
+                flight_id=flight_id, traveller=traveller,
+                flight_seat="Seat {}".format(index))
+
+    def count_list_queries(self, flight_id, page_size):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                self.url_list(flight_id) + '?page_size={}'.format(page_size), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        flight_id = self.create_flight()['flight_id']
+        self.create_travellers_bookings(flight_id, 12)
+
+        self.assertEqual(
+            self.count_list_queries(flight_id, 2),
+            self.count_list_queries(flight_id, 12))
+
+    def test_bookings_cursor_pages(self):
+        flight_id = self.create_flight()['flight_id']
+        self.create_travellers_bookings(flight_id, 5)
+        seats, url = [], self.url_list(flight_id) + '?pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url, format="json")
+            seats += [booking['flight_seat'] for booking in response.data['results']]
+            url = response.data['links']['next']
+        self.assertEqual(seats, ["Seat {}".format(index) for index in range(5)])
+
+
 class UpdatebookingTestCase(BaseBookingsTestCase):
 
     def update_booking(self, booking, flight_id, booking_id):
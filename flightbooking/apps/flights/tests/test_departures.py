@@ -0,0 +1,75 @@
+import datetime
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.flights.importer import import_flights
+from flightbooking.apps.flights.models import Flight
+from flightbooking.apps.flights.tests.test_flights import BaseFlightsTestCase
+from flightbooking.apps.flights.tests.test_import import make_flight
+
+
+def at(value):
+    return timezone.make_aware(datetime.datetime.strptime(value, '%Y-%m-%d %H:%M'))
+
+
+class DepartsAtTestCase(BaseFlightsTestCase):
+    """
+    Test the departure datetime kept with every flight
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url_search = reverse("flights:flights-search")
+        flights = [
+            ("Boeing 1", "2019-12-01", "17:30"),
+            ("Boeing 2", "2019-12-01", "23:45"),
+            ("Boeing 3", "2019-12-02", "00:15"),
+            ("Boeing 4", "2019-12-02", "06:00"),
+        ]
+        for name, departure_date, departure_time in flights:
+            self.create_flight({"flight": {
+                "name": name, "destination": "Nairobi",
+                "departure_date": departure_date, "departure_time": departure_time}})
+
+    def search(self, query):
+        res = self.client.get(self.url_search + query, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [flight['name'] for flight in res.data['results']]
+
+    def test_departs_at_follows_the_departure_date_and_time(self):
+        flight = Flight.objects.get(name="Boeing 2")
+        self.assertEqual(flight.departs_at, at("2019-12-01 23:45"))
+
+        self.client.put(self.url_retrieve(flight.flight_id), data={"flight": {
+            "departure_date": "2019-12-03", "departure_time": "08:00"}}, format="json")
+        flight.refresh_from_db()
+        self.assertEqual(flight.departs_at, at("2019-12-03 08:00"))
+
+    def test_imported_flights_have_departs_at(self):
+        import_flights([make_flight(index, departure_time="10:15") for index in range(5, 8)])
+        self.assertEqual(
+            set(Flight.objects.filter(name__in=["Boeing 5", "Boeing 6", "Boeing 7"]).values_list(
+                'departs_at', flat=True)),
+            {at("2019-12-12 10:15")})
+
+    def test_search_by_departure_window_across_midnight(self):
+        self.assertEqual(
+            self.search('?departs_after=2019-12-01 18:00&departs_before=2019-12-02 06:00'),
+            ["Boeing 2", "Boeing 3", "Boeing 4"])
+
+    def test_search_with_invalid_departure_window(self):
+        res = self.client.get(self.url_search + '?departs_after=evening', format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_departing_between_excludes_the_end(self):
+        flights = Flight.objects.departing_between(at("2019-12-01 23:45"), at("2019-12-02 06:00"))
+        self.assertEqual(sorted(flights.values_list('name', flat=True)), ["Boeing 2", "Boeing 3"])
+
+    def test_departing_on_dates(self):
+        self.assertEqual(
+            sorted(Flight.objects.departing_on(datetime.date(2019, 12, 2)).values_list('name', flat=True)),
+            ["Boeing 3", "Boeing 4"])
+        self.assertEqual(
+            Flight.objects.departing_on(datetime.date(2019, 12, 1), datetime.date(2019, 12, 2)).count(), 4)
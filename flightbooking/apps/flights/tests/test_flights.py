@@ -1,17 +1,24 @@
+import base64
 import json
 import random
 import string
+from unittest import mock
 
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.reverse import reverse
 
 from flightbooking.apps.authentication.tests.test_auth import AuthenticatedTestCase
+from flightbooking.apps.flights.models import Flight
 
 
 class BaseFlightsTestCase(AuthenticatedTestCase):
 
     def setUp(self):
         super().setUp()
+        cache.clear()
         self.flight = {
                 "flight": {
                     "name": "Boeing 12ABC",
@@ -123,6 +130,155 @@ class GetFlightsTestCase(BaseFlightsTestCase):
         self.assertIsNone(res.data['links']['next'])
 
 
+@override_settings(TOKEN_REVOCATION_FILTER_REFRESH=60 * 60, FLIGHT_CATALOGUE_CACHE_LOCAL=True)
+class FlightCatalogueCacheTestCase(BaseFlightsTestCase):
+    """
+    Test that flight reads are served from the catalogue cache
+    """
+
+    def test_repeated_list_is_served_from_cache(self):
+        self.create_flight()
+        first = self.client.get(self.url_list, format="json")
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url_list, format="json")
+        self.assertEqual(first.content, second.content)
+
+    def test_matching_etag_gets_not_modified(self):
+        flight_id = self.create_flight()['flight_id']
+        response = self.client.get(self.url_retrieve(flight_id), format="json")
+        response = self.client.get(
+            self.url_retrieve(flight_id), format="json", HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_update_retires_cached_flights(self):
+        flight_id = self.create_flight()['flight_id']
+        etag = self.client.get(self.url_retrieve(flight_id), format="json")['ETag']
+        self.flight['flight']['destination'] = "Kansas City"
+        self.client.put(self.url_retrieve(flight_id), data=self.flight, format="json")
+        response = self.client.get(self.url_retrieve(flight_id), format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Kansas City', response.content)
+
+
+@override_settings(FLIGHT_CATALOGUE_CACHE_LOCAL=False)
+class LocalCatalogueCacheTestCase(BaseFlightsTestCase):
+    """
+    Test that flights are not cached in a cache other workers do not see
+    """
+
+    def test_flight_added_by_another_worker_is_listed(self):
+        self.create_flight()
+        self.assertEqual(len(self.client.get(self.url_list, format="json").data['results']), 1)
+        # another worker bumps the catalogue version in its own memory
+        with mock.patch('flightbooking.apps.flights.cache.cache', LocMemCache('another-worker', {})):
+            self.flight['flight']['name'] = "Boeing 34DEF"
+            self.create_flight()
+        response = self.client.get(self.url_list, format="json")
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotIn('ETag', response)
+
+
+class CursorPaginationTestCase(BaseFlightsTestCase):
+    """
+    Test paging through flights by cursor
+    """
+
+    def create_flights(self, count):
+        for index in range(count):
+            self.flight['flight']['name'] = "Boeing {}".format(index)
+            self.create_flight()
+
+    def test_cursor_pages_cover_every_flight_once(self):
+        self.create_flights(5)
+        names, url = [], self.url_list + '?pagination=cursor&page_size=2'
+        while url:
+            res = self.client.get(url, format="json")
+            self.assertNotIn('count', res.data)
+            names += [flight['name'] for flight in res.data['results']]
+            url = res.data['links']['next']
+        self.assertEqual(names, ["Boeing {}".format(index) for index in range(5)])
+
+    def test_previous_cursor_returns_the_previous_page(self):
+        self.create_flights(3)
+        first = self.client.get(self.url_list + '?pagination=cursor&page_size=2&count=true', format="json")
+        self.assertEqual(first.data['count'], 3)
+        self.assertIsNone(first.data['links']['previous'])
+        second = self.client.get(first.data['links']['next'], format="json")
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['links']['next'])
+        previous = self.client.get(second.data['links']['previous'], format="json")
+        self.assertEqual(previous.data['results'], first.data['results'])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(self.url_list + '?cursor=invalid', format="json")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_values_of_the_wrong_type(self):
+        for position in (["abc"], [[1]], [{"flight_id": 1}]):
+            cursor = base64.urlsafe_b64encode(json.dumps({"p": position, "r": 0}).encode()).decode()
+            res = self.client.get(self.url_list + '?pagination=cursor&cursor=' + cursor, format="json")
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FlightSearchTestCase(BaseFlightsTestCase):
+    """
+    Test searching flights by destination, date and time
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url_search = reverse("flights:flights-search")
+        flights = [
+            ("Boeing 1", "Nairobi", "2019-12-12", "23:30"),
+            ("Boeing 2", "Nairobi", "2019-12-10", "09:30"),
+            ("Boeing 3", "Naivasha", "2019-12-11", "01:15"),
+            ("Boeing 4", "Mombasa", "2019-12-11", "12:00"),
+        ]
+        for name, destination, departure_date, departure_time in flights:
+            self.create_flight({"flight": {
+                "name": name, "destination": destination,
+                "departure_date": departure_date, "departure_time": departure_time}})
+
+    def search(self, query):
+        res = self.client.get(self.url_search + query, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [flight['name'] for flight in res.data['results']]
+
+    def test_search_by_destination_in_departure_order(self):
+        self.assertEqual(self.search('?destination=Nairobi'), ["Boeing 2", "Boeing 1"])
+
+    def test_search_by_destination_prefix(self):
+        self.assertEqual(self.search('?destination_prefix=Nai'), ["Boeing 2", "Boeing 3", "Boeing 1"])
+
+    def test_search_by_date_range(self):
+        self.assertEqual(
+            self.search('?departure_date_after=2019-12-11&departure_date_before=2019-12-11'),
+            ["Boeing 3", "Boeing 4"])
+
+    def test_search_by_time_window_across_midnight(self):
+        self.assertEqual(
+            self.search('?departure_time_after=22:00&departure_time_before=02:00'), ["Boeing 3", "Boeing 1"])
+
+    def test_search_pages_by_cursor(self):
+        names, url = [], self.url_search + '?destination_prefix=Nai&pagination=cursor&page_size=2'
+        while url:
+            res = self.client.get(url, format="json")
+            names += [flight['name'] for flight in res.data['results']]
+            url = res.data['links']['next']
+        self.assertEqual(names, ["Boeing 2", "Boeing 3", "Boeing 1"])
+
+    def test_search_with_invalid_date(self):
+        res = self.client.get(self.url_search + '?departure_date_after=tomorrow', format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cannot_rename_flight_to_an_existing_name(self):
+        flight_id = Flight.objects.get(name="Boeing 4").flight_id
+        res = self.client.put(self.url_retrieve(flight_id), data={"flight": {"name": "Boeing 1"}}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(b'Flight name already exists', res.content)
+
+
 class UpdateFlightTestCase(BaseFlightsTestCase):
 
     def update_flight(self, flight, flight_id):
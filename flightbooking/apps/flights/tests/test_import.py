@@ -0,0 +1,105 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.flights.importer import import_flights
+from flightbooking.apps.flights.models import Flight, Seat
+from flightbooking.apps.flights.tests.test_flights import BaseFlightsTestCase
+
+
+def make_flight(index, **fields):
+    flight = {
+        "name": "Boeing {}".format(index),
+        "destination": "South Africa",
+        "departure_date": "2019-12-12",
+        "departure_time": "09:30"
+    }
+    flight.update(fields)
+    return flight
+
+
+class BulkFlightImportTestCase(BaseFlightsTestCase):
+    """
+    Test importing many flights at once
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url_bulk = reverse("flights:flights-bulk")
+
+    def test_staff_can_import_flights(self):
+        flights = [make_flight(index) for index in range(5)]
+        response = self.client.post(self.url_bulk, data={"flights": flights}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(Flight.objects.count(), 5)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        self.create_flight(self.flight)
+        flights = [
+            make_flight(0),
+            make_flight(1, departure_date="someday"),
+            make_flight(0),
+            "Boeing 2",
+            make_flight(3, name=self.flight['flight']['name']),
+            make_flight(4),
+        ]
+        report = import_flights(flights, batch_size=2)
+        self.assertEqual(report.created, 2)
+        self.assertEqual([error['row'] for error in report.errors], [2, 3, 4, 5])
+        self.assertIn('departure_date', report.errors[0]['errors'])
+        self.assertEqual(report.errors[1]['errors'], {'name': ["Flight name already exists"]})
+
+    def test_duplicate_names_are_checked_once_per_batch(self):
+        flights = [make_flight(index) for index in range(10)]
+        # per batch: the duplicate query, the flight insert and its savepoint
+        with self.assertNumQueries(2 * 4):
+            import_flights(flights, batch_size=5)
+
+    def test_imported_flights_get_their_seat_map(self):
+        import_flights([make_flight(0, seat_rows=2, seat_columns="AB")])
+        flight = Flight.objects.get()
+        self.assertEqual(flight.capacity, 4)
+        self.assertEqual(Seat.objects.filter(flight=flight).count(), 4)
+
+    def test_non_staff_cannot_import_flights(self):
+        user = self.get_current_user()
+        user.is_staff = False
+        user.save()
+        self.login()
+        response = self.client.post(self.url_bulk, data={"flights": [make_flight(0)]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ImportFlightsCommandTestCase(BaseFlightsTestCase):
+    """
+    Test the import_flights management command
+    """
+
+    def import_file(self, suffix, content):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_flights', file.name, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv(self):
+        stdout, stderr = self.import_file('.csv', (
+            "name,destination,departure_date,departure_time,seat_rows\n"
+            "Boeing 1,Nairobi,2019-12-12,09:30,2\n"
+            "Boeing 2,Nairobi,2019-12-13,10:30,\n"))
+        self.assertIn('Imported 2 of 2 flights', stdout)
+        self.assertEqual(Flight.objects.get(name="Boeing 2").seat_rows, 0)
+
+    def test_import_jsonl_reports_bad_lines(self):
+        stdout, stderr = self.import_file('.jsonl', (
+            '{"name": "Boeing 1", "destination": "Nairobi", "departure_date": "2019-12-12", '
+            '"departure_time": "09:30"}\n'
+            'not json\n'))
+        self.assertIn('Imported 1 of 2 flights', stdout)
+        self.assertIn('Row 2:', stderr)
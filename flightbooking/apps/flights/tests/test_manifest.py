@@ -0,0 +1,58 @@
+import csv
+import datetime
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.models import Booking, Flight
+from flightbooking.apps.flights.tests.test_bookings import BaseBookingsTestCase
+from flightbooking.apps.profiles.models import Profile
+
+
+class ManifestTestCase(BaseBookingsTestCase):
+    """
+    Test exporting the passenger manifest of flights
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flight_id = self.create_flight()['flight_id']
+        self.url_manifest = reverse("flights:bookings-manifest", kwargs={"flight_id": self.flight_id})
+        flight = Flight.objects.get(flight_id=self.flight_id)
+        for index in range(3):
+            traveller = User.objects.create_user(
+                username="traveller{}".format(index), email="traveller{}@gmail.com".format(index))
+            Profile.objects.create(user=traveller)
+            Booking.objects.create(flight=flight, traveller=traveller, flight_seat="Seat {}".format(index))
+
+    def test_manifest_streams_csv(self):
+        res = self.client.get(self.url_manifest)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(res.streaming_content).decode().splitlines()))
+        self.assertEqual([row['email'] for row in rows], ["traveller{}@gmail.com".format(index) for index in range(3)])
+        self.assertEqual(rows[0]['seat'], "Seat 0")
+
+    def test_manifest_streams_jsonl_in_one_query(self):
+        res = self.client.get(self.url_manifest + '?output=jsonl')
+        with self.assertNumQueries(1):
+            rows = [json.loads(line) for line in b''.join(res.streaming_content).decode().splitlines()]
+        self.assertEqual([row['username'] for row in rows], ["traveller{}".format(index) for index in range(3)])
+        self.assertEqual(rows[0]['departure_date'], "2019-12-12")
+
+    def test_only_staff_can_view_the_manifest(self):
+        User.objects.filter(email=self.user['user']['email']).update(is_staff=False)
+        self.login()
+        self.assertEqual(self.client.get(self.url_manifest).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_manifest_command_for_a_date(self):
+        stdout = StringIO()
+        call_command('export_manifest', '--date', '2019-12-12', '--format', 'jsonl', stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+        stdout = StringIO()
+        call_command('export_manifest', '--date', str(datetime.date(2019, 12, 13)), stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 1)
@@ -0,0 +1,125 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.cache import catalogue_version
+from flightbooking.apps.flights.emails import get_people_with_bookings_for_flightid_one_and_given_date
+from flightbooking.apps.flights.models import Booking, Flight
+from flightbooking.apps.flights.occupancy import reconcile_occupancy
+from flightbooking.apps.flights.tests.test_bookings import BaseBookingsTestCase
+
+
+class OccupancyTestCase(BaseBookingsTestCase):
+    """
+    Test flights count their booked seats as they are booked and cancelled
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flight['flight']['seat_rows'] = 2
+        self.flight['flight']['seat_columns'] = "AB"
+        self.flight_id = self.create_flight()['flight_id']
+        self.url_bulk = reverse("flights:bookings-bulk", kwargs={"flight_id": self.flight_id})
+
+    def booked_seats(self, flight_id=None):
+        return Flight.objects.get(flight_id=flight_id or self.flight_id).booked_seats
+
+    def test_bookings_and_cancellations_are_counted(self):
+        booking_id = self.create_booking(self.flight_id, {"booking": {"auto_assign": True}}).data['booking_id']
+        booking_ids = [booking['booking_id'] for booking in self.client.post(
+            self.url_bulk, data={"bookings": [{"auto_assign": True}] * 2}, format="json").data]
+        self.assertEqual(self.booked_seats(), 3)
+
+        self.client.delete(self.url_bulk, data={"booking_ids": booking_ids}, format="json")
+        self.assertEqual(self.booked_seats(), 1)
+        self.client.delete(self.url_retrieve(self.flight_id, booking_id))
+        self.assertEqual(self.booked_seats(), 0)
+
+    def test_failed_bookings_are_not_counted(self):
+        self.create_booking(self.flight_id, {"booking": {"flight_seat": "1A"}})
+        self.create_booking(self.flight_id, {"booking": {"flight_seat": "1A"}})
+        self.assertEqual(self.booked_seats(), 1)
+
+    def test_saving_a_flight_keeps_its_count(self):
+        flight = Flight.objects.get(flight_id=self.flight_id)
+        self.create_booking(self.flight_id, {"booking": {"auto_assign": True}})
+        flight.destination = "Kenya"
+        flight.save()
+        self.assertEqual(self.booked_seats(), 1)
+
+    def test_reconcile_repairs_drift(self):
+        self.create_booking(self.flight_id, {"booking": {"auto_assign": True}})
+        Flight.objects.filter(flight_id=self.flight_id).update(booked_seats=7, capacity=1)
+        out = StringIO()
+        call_command('reconcile_booked_seats', '--dry-run', stdout=out)
+        self.assertIn('Flight {}: 7 booked of 1 seats, counted 1 of 4'.format(self.flight_id), out.getvalue())
+        self.assertEqual(self.booked_seats(), 7)
+
+        call_command('reconcile_booked_seats', stdout=StringIO())
+        flight = Flight.objects.get(flight_id=self.flight_id)
+        self.assertEqual((flight.booked_seats, flight.capacity), (1, 4))
+        self.assertEqual(reconcile_occupancy(), [])
+
+    def test_reconciling_capacity_retires_cached_flights(self):
+        version = catalogue_version()
+        Flight.objects.filter(flight_id=self.flight_id).update(booked_seats=3)
+        reconcile_occupancy()
+        self.assertEqual(catalogue_version(), version)
+
+        Flight.objects.filter(flight_id=self.flight_id).update(capacity=1)
+        reconcile_occupancy()
+        self.assertNotEqual(catalogue_version(), version)
+
+    def test_bookings_of_a_date_are_read_from_the_counter(self):
+        flight = Flight.objects.create(
+            flight_id=1, name="Boeing 1", destination="Kenya", departure_date=datetime.date(2019, 8, 21),
+            departure_time=datetime.time(9, 30), booked_seats=3)
+        Booking.objects.create(flight=flight, traveller=User.objects.first(), flight_seat="1A")
+        self.assertEqual(get_people_with_bookings_for_flightid_one_and_given_date(), 3)
+
+
+class LoadFactorTestCase(BaseBookingsTestCase):
+    """
+    Test listing flights by load factor
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url_load_factor = reverse("flights:flights-load-factor")
+        for index, (seat_rows, booked_seats) in enumerate([(2, 1), (1, 2), (2, 0), (0, 0)]):
+            Flight.objects.create(
+                name="Boeing {}".format(index), destination="Kenya", departure_date=datetime.date(2019, 12, 12),
+                departure_time=datetime.time(9, 30), seat_rows=seat_rows, seat_columns="AB",
+                booked_seats=booked_seats)
+
+    def test_flights_are_listed_fullest_first(self):
+        response = self.client.get(self.url_load_factor)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([flight['name'] for flight in results], ["Boeing 1", "Boeing 0", "Boeing 2"])
+        self.assertEqual(results[1]['booked_seats'], 1)
+        self.assertEqual(results[1]['capacity'], 4)
+        self.assertEqual(results[1]['load_factor'], 0.25)
+
+    def test_flights_are_listed_emptiest_first(self):
+        response = self.client.get(self.url_load_factor, {"order": "asc", "pagination": "cursor"})
+        self.assertEqual([flight['name'] for flight in response.data['results']], ["Boeing 2", "Boeing 0", "Boeing 1"])
+        self.assertEqual(response.data['count'], 3)
+
+    def test_load_factor_takes_the_search_filters(self):
+        response = self.client.get(self.url_load_factor, {"destination": "Uganda"})
+        self.assertEqual(response.data['results'], [])
+
+    def test_unknown_order_is_rejected(self):
+        response = self.client.get(self.url_load_factor, {"order": "random"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_staff_see_the_load_factor(self):
+        User.objects.update(is_staff=False)
+        self.login()
+        response = self.client.get(self.url_load_factor)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,233 @@
+import asyncore
+import datetime
+import smtpd
+import smtplib
+import socket
+import threading
+from collections import Counter
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.emails import (
+    claim_reminder_chunk, plan_due_reminders, send_reminder_chunk, send_reminder_email, stalled_reminder_chunks
+)
+from flightbooking.apps.flights.models import Booking, Flight, ReminderChunk
+from flightbooking.apps.flights.tasks import task_send_reminder_chunk
+
+UNDELIVERABLE = 'traveller1@gmail.com'
+
+
+def create_departing_flight(name, departs_at):
+    departs_at = timezone.localtime(departs_at)
+    return Flight.objects.create(
+        name=name, destination="South Africa", departure_date=departs_at.date(), departure_time=departs_at.time())
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    Refuses to deliver to UNDELIVERABLE the first time it is asked to
+    """
+    refused = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if UNDELIVERABLE in message.to and UNDELIVERABLE not in self.refused:
+                self.refused.append(UNDELIVERABLE)
+                raise smtplib.SMTPRecipientsRefused({UNDELIVERABLE: (550, b'Mailbox unavailable')})
+        return super().send_messages(messages)
+
+
+@override_settings(REMINDER_EMAIL_CHUNK_SIZE=2, REMINDER_EMAIL_LEAD_HOURS=24)
+class ReminderEmailsTestCase(TestCase):
+    """
+    Test the reminder emails sent to travellers a day before they depart
+    """
+
+    def setUp(self):
+        self.now = timezone.now().replace(second=0, microsecond=0)
+        self.flight = create_departing_flight("Boeing 12ABC", self.now + datetime.timedelta(hours=3))
+        later_flight = create_departing_flight("Boeing 34DEF", self.now + datetime.timedelta(hours=30))
+        for index in range(5):
+            traveller = User.objects.create_user(
+                username="traveller{}".format(index), email="traveller{}@gmail.com".format(index))
+            Booking.objects.create(flight=self.flight, traveller=traveller, flight_seat="Seat {}".format(index))
+            Booking.objects.create(flight=later_flight, traveller=traveller, flight_seat="Seat {}".format(index))
+        FailingEmailBackend.refused = []
+
+    def test_reminders_are_sent_in_chunks_one_message_per_traveller(self):
+        failed = send_reminder_email(self.now)
+        self.assertEqual(failed, 0)
+        self.assertEqual(ReminderChunk.objects.filter(flight=self.flight).count(), 3)
+        self.assertEqual(ReminderChunk.objects.count(), 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["traveller{}@gmail.com".format(index) for index in range(5)])
+        self.assertTrue(all(len(message.to) == 1 for message in mail.outbox))
+        self.assertIn("Boeing 12ABC to South Africa", mail.outbox[0].body)
+
+    def test_planning_twice_reminds_nobody_twice(self):
+        self.assertEqual(len(plan_due_reminders(self.now)), 3)
+        self.assertEqual(plan_due_reminders(self.now), [])
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.reminder_sent_at, self.now)
+        send_reminder_email(self.now)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_saving_a_flight_keeps_its_reminder_marker(self):
+        flight = Flight.objects.get(pk=self.flight.pk)
+        plan_due_reminders(self.now)
+        flight.destination = "Kenya"
+        flight.save()
+        flight.refresh_from_db()
+        self.assertEqual(flight.reminder_sent_at, self.now)
+
+    def test_moving_a_flight_reminds_its_travellers_again(self):
+        send_reminder_email(self.now)
+        flight = Flight.objects.get(pk=self.flight.pk)
+        departs_at = timezone.localtime(self.now + datetime.timedelta(hours=6))
+        flight.departure_date, flight.departure_time = departs_at.date(), departs_at.time()
+        flight.save()
+        flight.refresh_from_db()
+        self.assertIsNone(flight.reminder_sent_at)
+
+        send_reminder_email(self.now)
+        self.assertEqual(ReminderChunk.objects.filter(flight=flight).count(), 3)
+        self.assertEqual(len(mail.outbox), 10)
+
+    @override_settings(REMINDER_EMAIL_REQUEUE_MINUTES=30)
+    def test_stalled_chunks_are_queued_again_until_departure(self):
+        chunk_ids = plan_due_reminders(self.now)
+        self.assertEqual(stalled_reminder_chunks(timezone.now()), [])
+        ReminderChunk.objects.filter(pk=chunk_ids[0]).update(status=ReminderChunk.SENT)
+        self.assertEqual(
+            sorted(stalled_reminder_chunks(timezone.now() + datetime.timedelta(minutes=31))), sorted(chunk_ids[1:]))
+        self.assertEqual(stalled_reminder_chunks(self.now + datetime.timedelta(hours=3)), [])
+
+    @override_settings(REMINDER_EMAIL_REQUEUE_MINUTES=30, REMINDER_EMAIL_MAX_ATTEMPTS=3)
+    def test_chunks_failing_every_attempt_are_given_up_on(self):
+        chunk_ids = plan_due_reminders(self.now)
+        ReminderChunk.objects.filter(pk=chunk_ids[0]).update(status=ReminderChunk.FAILED, attempts=3)
+        ReminderChunk.objects.filter(pk__in=chunk_ids[1:]).update(status=ReminderChunk.FAILED, attempts=2)
+        self.assertEqual(
+            sorted(stalled_reminder_chunks(timezone.now() + datetime.timedelta(minutes=31))), sorted(chunk_ids[1:]))
+
+    def test_chunk_queued_twice_is_sent_once(self):
+        chunk_id = plan_due_reminders(self.now)[0]
+        task_send_reminder_chunk(chunk_id)
+        task_send_reminder_chunk(chunk_id)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(ReminderChunk.objects.get(pk=chunk_id).status, ReminderChunk.SENT)
+
+    @override_settings(REMINDER_EMAIL_REQUEUE_MINUTES=30)
+    def test_chunk_being_sent_is_sent_again_once_its_sender_stalls(self):
+        chunk_id = plan_due_reminders(self.now)[0]
+        self.assertIsNotNone(claim_reminder_chunk(chunk_id))
+        task_send_reminder_chunk(chunk_id)
+        self.assertEqual(len(mail.outbox), 0)
+
+        ReminderChunk.objects.filter(pk=chunk_id).update(updated_at=timezone.now() - datetime.timedelta(minutes=31))
+        self.assertEqual(stalled_reminder_chunks(), [chunk_id])
+        task_send_reminder_chunk(chunk_id)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(ReminderChunk.objects.get(pk=chunk_id).status, ReminderChunk.SENT)
+
+    @override_settings(EMAIL_BACKEND='flightbooking.apps.flights.tests.test_reminders.FailingEmailBackend')
+    def test_retrying_a_chunk_only_resends_to_failed_recipients(self):
+        send_reminder_email(self.now)
+        chunk = ReminderChunk.objects.get(status=ReminderChunk.FAILED)
+        self.assertEqual(chunk.pending_recipients(), [UNDELIVERABLE])
+        self.assertEqual(len(mail.outbox), 4)
+
+        self.assertEqual(send_reminder_chunk(chunk), 0)
+        chunk.refresh_from_db()
+        self.assertEqual(chunk.status, ReminderChunk.SENT)
+        self.assertEqual(chunk.attempts, 2)
+        self.assertEqual([message.to for message in mail.outbox[4:]], [[UNDELIVERABLE]])
+
+    def test_unreachable_smtp_server_fails_every_recipient(self):
+        # a port nothing listens on
+        with socket.socket() as closed:
+            closed.bind(('127.0.0.1', 0))
+            port = closed.getsockname()[1]
+        with self.settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+                           EMAIL_PORT=port, EMAIL_USE_TLS=False):
+            self.assertEqual(send_reminder_email(self.now), 5)
+        chunks = ReminderChunk.objects.all()
+        self.assertTrue(all(chunk.status == ReminderChunk.FAILED and chunk.attempts == 1 for chunk in chunks))
+        self.assertEqual(
+            sorted(recipient for chunk in chunks for recipient in chunk.pending_recipients()),
+            ["traveller{}@gmail.com".format(index) for index in range(5)])
+
+
+class RecordingSMTPServer(smtpd.SMTPServer):
+    """
+    A local SMTP server recording the recipients of every message it
+    receives along with the simulated time it was received at
+    """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), None, decode_data=True)
+        self.port = self.socket.getsockname()[1]
+        self.clock = None
+        self.received = []
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        self.received.append((self.clock, rcpttos))
+
+
+@override_settings(REMINDER_EMAIL_CHUNK_SIZE=2, REMINDER_EMAIL_LEAD_HOURS=24, REMINDER_EMAIL_INTERVAL_MINUTES=5)
+class ReminderSchedulerTestCase(TestCase):
+    """
+    Test a day of the reminder scheduler against a local SMTP server
+    """
+    interval = datetime.timedelta(minutes=5)
+    lead = datetime.timedelta(hours=24)
+
+    def setUp(self):
+        self.server = RecordingSMTPServer()
+        thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.05})
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.close)
+        email_settings = self.settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.port, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', EMAIL_USE_TLS=False)
+        email_settings.enable()
+        self.addCleanup(email_settings.disable)
+
+        # a flight every 20 minutes through the second day, two travellers each
+        self.start = timezone.make_aware(datetime.datetime(2019, 12, 1))
+        self.departures = {}
+        for index in range(72):
+            departs_at = self.start + self.lead + index * datetime.timedelta(minutes=20)
+            flight = create_departing_flight("Boeing {}".format(index), departs_at)
+            for seat in ("1A", "1B"):
+                email = "traveller{}{}@gmail.com".format(index, seat)
+                traveller = User.objects.create_user(username=email, email=email)
+                Booking.objects.create(flight=flight, traveller=traveller, flight_seat=seat)
+                self.departures[email] = departs_at
+
+    def run_day(self):
+        now = self.start
+        while now <= self.start + self.lead:
+            self.server.clock = now
+            self.assertEqual(send_reminder_email(now), 0)
+            now += self.interval
+
+    def test_reminders_are_sent_once_as_their_window_opens(self):
+        self.run_day()
+        received = [(clock, recipient) for clock, recipients in self.server.received for recipient in recipients]
+        self.assertEqual(sorted(recipient for _, recipient in received), sorted(self.departures))
+        for clock, recipient in received:
+            window_opened = self.departures[recipient] - self.lead
+            self.assertTrue(datetime.timedelta(0) < clock - window_opened <= self.interval)
+
+        # the emails are spread over the day, one flight per run at most
+        self.assertEqual(max(Counter(clock for clock, _ in received).values()), 2)
+
+        self.run_day()
+        self.assertEqual(len(self.server.received), len(self.departures))
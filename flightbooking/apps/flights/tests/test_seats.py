@@ -0,0 +1,200 @@
+import datetime
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.authentication.test_helper import make_user
+from flightbooking.apps.flights.models import Booking, Flight, Seat
+from flightbooking.apps.flights.seats import SeatUnavailable, book_seat, create_seat_map
+from flightbooking.apps.flights.tests.test_bookings import BaseBookingsTestCase
+from flightbooking.apps.profiles.models import Profile
+
+
+class SeatMapBookingsTestCase(BaseBookingsTestCase):
+    """
+    Test bookings on flights with a seat map
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flight['flight']['seat_rows'] = 2
+        self.flight['flight']['seat_columns'] = "AB"
+
+    def test_flight_gets_seat_map(self):
+        flight = self.create_flight()
+        self.assertEqual(flight['capacity'], 4)
+        self.assertEqual(
+            list(Seat.objects.filter(flight_id=flight['flight_id']).values_list('label', flat=True)),
+            ["1A", "1B", "2A", "2B"])
+
+    def test_auto_assign_books_next_free_seat(self):
+        flight_id = self.create_flight()['flight_id']
+        self.create_booking(flight_id, {"booking": {"flight_seat": "1A"}})
+        response = self.create_booking(flight_id, {"booking": {"auto_assign": True}})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['flight_seat'], "1B")
+
+    def test_cannot_book_a_taken_seat(self):
+        flight_id = self.create_flight()['flight_id']
+        self.create_booking(flight_id, {"booking": {"flight_seat": "1A"}})
+        response = self.create_booking(flight_id, {"booking": {"flight_seat": "1A"}})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn(b'This seat has already been booked', response.content)
+
+    def test_cannot_book_a_seat_missing_from_the_seat_map(self):
+        flight_id = self.create_flight()['flight_id']
+        response = self.create_booking(flight_id, {"booking": {"flight_seat": "9Z"}})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_cannot_book_a_full_flight(self):
+        flight_id = self.create_flight()['flight_id']
+        for _ in range(4):
+            self.create_booking(flight_id, {"booking": {"auto_assign": True}})
+        response = self.create_booking(flight_id, {"booking": {"auto_assign": True}})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn(b'This flight is fully booked', response.content)
+
+    def test_changing_seat_frees_the_old_seat(self):
+        flight_id = self.create_flight()['flight_id']
+        booking = self.create_booking(flight_id, {"booking": {"flight_seat": "1A"}})
+        booking_id = json.loads(booking.content)['booking_id']
+        self.client.put(
+            self.url_retrieve(flight_id, booking_id), data={"booking": {"flight_seat": "2B"}}, format="json")
+        self.assertEqual(
+            list(Seat.objects.filter(flight_id=flight_id, booking__isnull=False).values_list('label', flat=True)),
+            ["2B"])
+
+
+class GroupBookingsTestCase(BaseBookingsTestCase):
+    """
+    Test booking and cancelling several seats at once
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flight['flight']['seat_rows'] = 2
+        self.flight['flight']['seat_columns'] = "AB"
+        self.flight_id = self.create_flight()['flight_id']
+        self.url_bulk = reverse("flights:bookings-bulk", kwargs={"flight_id": self.flight_id})
+
+    def book_group(self, bookings):
+        return self.client.post(self.url_bulk, data={"bookings": bookings}, format="json")
+
+    def test_group_booking_books_named_and_assigned_seats(self):
+        response = self.book_group([{"flight_seat": "1B"}, {"auto_assign": True}, {"auto_assign": True}])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([booking['flight_seat'] for booking in response.data], ["1B", "1A", "2A"])
+        self.assertEqual(
+            Seat.objects.filter(flight_id=self.flight_id, booking__isnull=False).count(), 3)
+
+    def test_group_booking_is_all_or_nothing(self):
+        self.create_booking(self.flight_id, {"booking": {"flight_seat": "2B"}})
+        response = self.book_group([{"flight_seat": "1A"}, {"flight_seat": "2B"}])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Booking.objects.filter(flight_id=self.flight_id).count(), 1)
+
+    def test_group_booking_for_other_travellers(self):
+        other = User.objects.create_user(username="colleague", email="colleague@gmail.com")
+        Profile.objects.create(user=other)
+        response = self.book_group([{"auto_assign": True}, {"auto_assign": True, "traveller_email": other.email}])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[1]['traveller']['username'], "colleague")
+
+    def test_group_booking_for_unregistered_traveller(self):
+        response = self.book_group([{"auto_assign": True, "traveller_email": "nobody@gmail.com"}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_group_booking_queries_do_not_grow_with_the_group(self):
+        def count_queries(bookings):
+            Booking.objects.all().delete()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.book_group(bookings)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(
+            count_queries([{"flight_seat": "1A"}, {"auto_assign": True}]),
+            count_queries([{"flight_seat": "1A"}, {"flight_seat": "1B"}, {"auto_assign": True}, {"auto_assign": True}]))
+
+    def test_cancel_group_booking(self):
+        booking_ids = [booking['booking_id'] for booking in self.book_group([{"auto_assign": True}] * 3).data]
+        response = self.client.delete(self.url_bulk, data={"booking_ids": booking_ids[:2]}, format="json")
+        self.assertEqual(response.data['cancelled'], 2)
+        self.assertEqual(list(Booking.objects.values_list('booking_id', flat=True)), booking_ids[2:])
+        self.assertEqual(Seat.objects.filter(flight_id=self.flight_id, booking__isnull=False).count(), 1)
+
+    def test_travellers_only_cancel_their_own_bookings(self):
+        booking_ids = [booking['booking_id'] for booking in self.book_group([{"auto_assign": True}]).data]
+        traveller = {"user": make_user()}
+        self.register_and_login(traveller)
+        User.objects.filter(email=traveller['user']['email']).update(is_staff=False)
+        self.login(traveller)
+        response = self.client.delete(self.url_bulk, data={"booking_ids": booking_ids}, format="json")
+        self.assertEqual(response.data['cancelled'], 0)
+
+
+class ConcurrentBookingsTestCase(TransactionTestCase):
+    """
+    Books seats from many threads at once, no seat may be booked twice
+    """
+
+    attempts = 300
+    threads = 20
+
+    def setUp(self):
+        self.travellers = [
+            User.objects.create_user(username="traveller{}".format(index), email="traveller{}@gmail.com".format(index))
+            for index in range(self.threads)
+        ]
+
+    def create_flight(self, seat_rows):
+        flight = Flight.objects.create(
+            name="Boeing 12ABC", destination="South Africa", departure_date=datetime.date(2019, 12, 12),
+            departure_time=datetime.time(9, 30), seat_rows=seat_rows, seat_columns="ABCDEF")
+        create_seat_map(flight)
+        return flight
+
+    def book_concurrently(self, flight, seat_labels):
+        def book(attempt):
+            try:
+                book_seat(flight, self.travellers[attempt % self.threads], seat_labels[attempt])
+                return True
+            except SeatUnavailable:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            return sum(executor.map(book, range(self.attempts)))
+
+    def assert_no_double_bookings(self, flight, booked):
+        bookings = Booking.objects.filter(flight=flight)
+        self.assertEqual(bookings.count(), booked)
+        self.assertEqual(len(set(bookings.values_list('flight_seat', flat=True))), booked)
+        self.assertEqual(Seat.objects.filter(flight=flight, booking__isnull=False).count(), flight.capacity and booked)
+        flight.refresh_from_db()
+        self.assertEqual(flight.booked_seats, booked)
+
+    def test_concurrent_bookings_never_share_a_seat(self):
+        flight = self.create_flight(seat_rows=10)
+        labels = flight.seat_labels()
+        # half the attempts ask for the next free seat, half for a given one
+        seat_labels = [None if attempt % 2 else random.choice(labels) for attempt in range(self.attempts)]
+
+        booked = self.book_concurrently(flight, seat_labels)
+        self.assertEqual(booked, flight.capacity)
+        self.assert_no_double_bookings(flight, booked)
+
+    def test_concurrent_bookings_of_one_free_form_seat(self):
+        flight = self.create_flight(seat_rows=0)
+
+        booked = self.book_concurrently(flight, ["First Class"] * self.attempts)
+        self.assertEqual(booked, 1)
+        self.assert_no_double_bookings(flight, booked)
@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.models import Booking, Flight, Seat
+from flightbooking.apps.flights.seeding import PASSWORD, seed_dataset
+from flightbooking.apps.profiles.models import Profile
+
+
+class SeedScaleTestCase(TestCase):
+    """
+    Test seeding datasets for load tests
+    """
+
+    def test_seed_scale_writes_every_table(self):
+        out = StringIO()
+        call_command('seed_scale', users=30, flights=5, bookings=200, seed=1, chunk_size=64, stdout=out)
+        self.assertIn('Seeded', out.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Booking.objects.count(), 200)
+        self.assertEqual(User.objects.filter(is_staff=True).count(), 1)
+        self.assertEqual(len(set(User.objects.values_list('password', flat=True))), 1)
+        self.assertTrue(User.objects.get(username='traveller1').check_password(PASSWORD))
+
+        self.assertEqual(sum(Flight.objects.values_list('booked_seats', flat=True)), 200)
+        capacity = sum(Flight.objects.values_list('capacity', flat=True))
+        self.assertEqual(Seat.objects.count(), capacity)
+        self.assertEqual(Seat.objects.filter(booking__isnull=False).count(), 200)
+        seat = Seat.objects.filter(booking__isnull=False).select_related('booking').first()
+        self.assertEqual((seat.booking.flight_id, seat.booking.flight_seat), (seat.flight_id, seat.label))
+
+    def test_seeding_again_adds_to_the_dataset(self):
+        seed_dataset(5, 2, 10, seed=1)
+        seed_dataset(5, 2, 10, seed=1)
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Booking.objects.count(), 20)
+        # the sequences continue after the seeded ids
+        self.assertEqual(User.objects.create_user('newcomer', 'newcomer@gmail.com').pk, User.objects.count())
+
+    def test_bookings_must_fit_the_flights(self):
+        with self.assertRaisesMessage(CommandError, 'seed more flights'):
+            call_command('seed_scale', users=5, flights=1, bookings=500, stdout=StringIO())
@@ -0,0 +1,134 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework.reverse import reverse
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.flights.models import Booking, DailyFlightStats, Flight
+from flightbooking.apps.flights.stats import backfill_daily_stats, compute_daily_stats, date_ranges
+from flightbooking.apps.flights.tests.test_bookings import BaseBookingsTestCase
+
+
+def make_flights(*days):
+    return [
+        Flight.objects.create(
+            name="Boeing {}".format(index), destination=destination, departure_date=departure_date,
+            departure_time=datetime.time(9, 30))
+        for index, (destination, departure_date) in enumerate(days)
+    ]
+
+
+def make_bookings(flight, traveller, *booked_at):
+    for index, created_at in enumerate(booked_at):
+        booking = Booking.objects.create(flight=flight, traveller=traveller, flight_seat="Seat {}".format(index))
+        Booking.objects.filter(pk=booking.pk).update(created_at=created_at)
+
+
+class DailyFlightStatsTestCase(BaseBookingsTestCase):
+    """
+    Test the daily operations report is added to as seats are booked and cancelled
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.flight['flight']['seat_rows'] = 2
+        self.flight['flight']['seat_columns'] = "AB"
+        self.flight_id = self.create_flight()['flight_id']
+        self.url_bulk = reverse("flights:bookings-bulk", kwargs={"flight_id": self.flight_id})
+
+    def stats(self, destination="South Africa"):
+        return DailyFlightStats.objects.get(destination=destination, departure_date=datetime.date(2019, 12, 12))
+
+    def test_bookings_and_cancellations_are_recorded(self):
+        before = timezone.now()
+        booking_id = self.create_booking(self.flight_id, {"booking": {"auto_assign": True}}).data['booking_id']
+        booking_ids = [booking['booking_id'] for booking in self.client.post(
+            self.url_bulk, data={"bookings": [{"auto_assign": True}] * 2}, format="json").data]
+        stats = self.stats()
+        self.assertEqual((stats.bookings, stats.cancellations), (3, 0))
+        self.assertLessEqual(before, stats.first_booked_at)
+        self.assertLessEqual(stats.first_booked_at, stats.last_booked_at)
+
+        self.client.delete(self.url_bulk, data={"booking_ids": booking_ids}, format="json")
+        self.client.delete(self.url_retrieve(self.flight_id, booking_id))
+        stats = self.stats()
+        self.assertEqual((stats.bookings, stats.cancellations), (0, 3))
+
+    def test_bookings_follow_their_flight_to_another_day(self):
+        self.create_booking(self.flight_id, {"booking": {"auto_assign": True}})
+        self.client.put(
+            reverse("flights:flights-detail", kwargs={"flight_id": self.flight_id}),
+            data={"flight": {"destination": "Kenya"}}, format="json")
+        self.assertEqual(self.stats().bookings, 0)
+        moved = self.stats("Kenya")
+        self.assertEqual(moved.bookings, 1)
+        booked_at = Booking.objects.get(flight_id=self.flight_id).created_at
+        self.assertEqual((moved.first_booked_at, moved.last_booked_at), (booked_at, booked_at))
+
+    def test_deleted_flight_leaves_the_report(self):
+        self.create_booking(self.flight_id, {"booking": {"auto_assign": True}})
+        self.create_booking(self.flight_id, {"booking": {"auto_assign": True}})
+        response = self.client.delete(reverse("flights:flights-detail", kwargs={"flight_id": self.flight_id}))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("flights:flights-daily-stats"), {"destination": "South Africa"})
+        day = response.data['results'][0]
+        self.assertEqual((day['bookings'], day['cancellations']), (0, 2))
+
+    def test_report_lists_lead_times(self):
+        flight = Flight.objects.get(flight_id=self.flight_id)
+        make_bookings(flight, User.objects.first(), datetime.datetime(2019, 12, 1, 12, tzinfo=datetime.timezone.utc),
+                      datetime.datetime(2019, 12, 10, 12, tzinfo=datetime.timezone.utc))
+        backfill_daily_stats()
+        response = self.client.get(reverse("flights:flights-daily-stats"), {"departure_date_after": "2019-12-12"})
+        day = response.data['results'][0]
+        self.assertEqual((day['destination'], day['bookings']), ("South Africa", 2))
+        self.assertEqual((day['first_booking_lead_days'], day['last_booking_lead_days']), (11, 2))
+
+
+class BackfillDailyStatsTestCase(TransactionTestCase):
+    """
+    Test recomputing the daily operations report from the bookings
+    """
+
+    def setUp(self):
+        self.traveller = User.objects.create_user(username="traveller", email="traveller@gmail.com")
+        self.flights = make_flights(
+            ("Kenya", datetime.date(2019, 12, 1)), ("Kenya", datetime.date(2019, 12, 1)),
+            ("Uganda", datetime.date(2019, 12, 1)), ("Kenya", datetime.date(2019, 12, 20)),
+            ("Kenya", datetime.date(2019, 12, 31)))
+        self.times = [datetime.datetime(2019, 11, day, tzinfo=datetime.timezone.utc) for day in range(1, 6)]
+        make_bookings(self.flights[0], self.traveller, self.times[2], self.times[0])
+        make_bookings(self.flights[1], self.traveller, self.times[4])
+        make_bookings(self.flights[2], self.traveller, self.times[1])
+        make_bookings(self.flights[3], self.traveller, self.times[3], self.times[3])
+
+    def test_days_are_grouped(self):
+        self.assertEqual(compute_daily_stats(datetime.date(2019, 12, 1), datetime.date(2019, 12, 31)), [
+            ("Kenya", datetime.date(2019, 12, 1), 3, self.times[0], self.times[4]),
+            ("Uganda", datetime.date(2019, 12, 1), 1, self.times[1], self.times[1]),
+            ("Kenya", datetime.date(2019, 12, 20), 2, self.times[3], self.times[3]),
+        ])
+
+    def test_date_ranges(self):
+        self.assertEqual(date_ranges(datetime.date(2019, 12, 1), datetime.date(2019, 12, 5), 2), [
+            (datetime.date(2019, 12, 1), datetime.date(2019, 12, 2)),
+            (datetime.date(2019, 12, 3), datetime.date(2019, 12, 4)),
+            (datetime.date(2019, 12, 5), datetime.date(2019, 12, 5)),
+        ])
+
+    def test_backfill_in_worker_processes(self):
+        DailyFlightStats.objects.create(
+            destination="Kenya", departure_date=datetime.date(2019, 12, 1), bookings=40, cancellations=2)
+        DailyFlightStats.objects.create(destination="Kenya", departure_date=datetime.date(2019, 12, 31), bookings=4)
+        out = StringIO()
+        call_command('backfill_daily_stats', days=7, workers=2, stdout=out)
+        self.assertIn('Counted 6 bookings', out.getvalue())
+        self.assertEqual(
+            list(DailyFlightStats.objects.values_list('destination', 'departure_date', 'bookings', 'cancellations')), [
+                ("Kenya", datetime.date(2019, 12, 1), 3, 2),
+                ("Uganda", datetime.date(2019, 12, 1), 1, 0),
+                ("Kenya", datetime.date(2019, 12, 20), 2, 0),
+            ])
@@ -0,0 +1,70 @@
+import datetime
+from unittest import mock
+
+import cloudinary
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+
+from flightbooking.apps.authentication.models import User
+from flightbooking.apps.core.renderers import FastJSONRenderer
+from flightbooking.apps.core.serializers import ValuesSerializer
+from flightbooking.apps.flights.models import Booking, Flight
+from flightbooking.apps.flights.serializers import (
+    BookingSerializer, BookingValuesSerializer, FlightSerializer, FlightValuesSerializer,
+)
+from flightbooking.apps.profiles.models import Profile
+
+
+class ValuesSerializerTestCase(TestCase):
+    """
+    Test the values serializers render lists exactly like the model serializers
+    """
+
+    def setUp(self):
+        # passports are represented by their cloudinary url
+        patcher = mock.patch.object(cloudinary.config(), 'cloud_name', 'flightbooking', create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.flights = [
+            Flight.objects.create(
+                name="Boeing {}".format(index), destination="South Africa",
+                departure_date=datetime.date(2019, 12, 12 + index), departure_time=datetime.time(9, 30, index),
+                seat_rows=index)
+            for index in range(3)
+        ]
+        for index in range(3):
+            traveller = User.objects.create_user(
+                username="traveller{}".format(index), email="traveller{}@gmail.com".format(index))
+            passport = 'image/upload/v1/passport{}.jpg'.format(index) if index else None
+            Profile.objects.create(user=traveller, passport=passport)
+            Booking.objects.create(flight=self.flights[0], traveller=traveller, flight_seat="{}A".format(index))
+
+    def assert_renders_alike(self, values_serializer, queryset, serializer):
+        render = FastJSONRenderer().render
+        self.assertEqual(
+            render(values_serializer.data(values_serializer.rows(queryset))),
+            render(serializer(queryset, many=True).data))
+
+    def test_flights_render_like_flight_serializer(self):
+        self.assert_renders_alike(FlightValuesSerializer(), Flight.objects.all(), FlightSerializer)
+
+    def test_bookings_render_like_booking_serializer(self):
+        self.assert_renders_alike(
+            BookingValuesSerializer(), Booking.objects.with_traveller_profiles(), BookingSerializer)
+
+    def test_bookings_are_read_in_one_query_without_instances(self):
+        values_serializer = BookingValuesSerializer()
+        with self.assertNumQueries(1):
+            rows = list(values_serializer.rows(Booking.objects.all(), extra=['flight_id']))
+        self.assertIsInstance(rows[0], tuple)
+        self.assertEqual(rows[0].flight_id, self.flights[0].flight_id)
+
+    def test_fields_from_other_serializers_must_be_nested(self):
+        class UnreadableSerializer(ValuesSerializer):
+            serializer_class = BookingSerializer
+
+        with self.assertRaises(ImproperlyConfigured):
+            UnreadableSerializer()
+
+    def test_write_only_fields_are_left_out(self):
+        self.assertNotIn('auto_assign', [name for name, _, _ in BookingValuesSerializer().plan])
@@ -1,7 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from flightbooking.apps.flights.views import FlightAPIView, BookingAPIView, BookingUpdateDestroy
+from flightbooking.apps.flights.views import (
+    FlightAPIView, BookingAPIView, BookingUpdateDestroy, GroupBookingAPIView, ManifestAPIView,
+)
 
 app_name = "flights"
 router = DefaultRouter()
@@ -10,5 +12,7 @@ router.register('flights', FlightAPIView, base_name="flights")
 urlpatterns = [
     path('', include(router.urls)),
     path('flights/<flight_id>/bookings/', BookingAPIView.as_view(), name='bookings'),
+    path('flights/<flight_id>/bookings/bulk/', GroupBookingAPIView.as_view(), name='bookings-bulk'),
+    path('flights/<flight_id>/bookings/manifest/', ManifestAPIView.as_view(), name='bookings-manifest'),
     path('flights/<flight_id>/bookings/<pk>', BookingUpdateDestroy.as_view(), name='booking'),
 ]
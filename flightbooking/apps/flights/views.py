@@ -1,19 +1,36 @@
-from rest_framework.renderers import JSONRenderer
+from django.utils.http import urlencode
 from rest_framework import status, viewsets, generics
 from rest_framework import mixins
-from django.db import models
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework.generics import (
     RetrieveUpdateDestroyAPIView, CreateAPIView, ListAPIView, ListCreateAPIView, UpdateAPIView,
 )
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
-from flightbooking.apps.flights.models import Flight, Booking
-from flightbooking.apps.flights.serializers import FlightSerializer, BookingSerializer
+from flightbooking.apps.flights.models import Flight, Booking, DailyFlightStats
+from flightbooking.apps.flights.serializers import (
+    FlightSerializer, BookingSerializer, GroupBookingsSerializer, CancelBookingsSerializer,
+    FlightValuesSerializer, BookingValuesSerializer, LoadFactorValuesSerializer, DailyFlightStatsSerializer,
+)
 from flightbooking.apps.authentication.models import User
 from flightbooking.apps.authentication.serializers import UserSerializer
 from flightbooking.apps.profiles.models import Profile
 from flightbooking.apps.profiles.serializers import ProfileSerializer
+from flightbooking.apps.core.renderers import FastJSONRenderer
 from flightbooking.apps.flights.pagination import StandardResultsSetPagination
+from flightbooking.apps.flights.filters import DailyFlightStatsFilter, FlightSearchFilter
+from flightbooking.apps.flights.importer import import_flights
+from flightbooking.apps.flights.manifest import MANIFEST_FORMATS, flight_manifest, stream_manifest
+from flightbooking.apps.flights.cache import bump_catalogue_version, cached_response
+from flightbooking.apps.flights.occupancy import load_factor
+from flightbooking.apps.flights.stats import record_daily_bookings
+from flightbooking.apps.flights.seats import (
+    SeatUnavailable, book_seat, book_seats, cancel_booking, cancel_bookings,
+)
 
 
 class FlightAPIView(mixins.CreateModelMixin, mixins.UpdateModelMixin,
@@ -21,16 +38,28 @@ class FlightAPIView(mixins.CreateModelMixin, mixins.UpdateModelMixin,
                     mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     lookup_field = 'flight_id'
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    renderer_classes = (JSONRenderer,)
+    renderer_classes = (FastJSONRenderer,)
     queryset = Flight.objects.all()
     renderer_names = ('flight', 'flights')
     serializer_class = FlightSerializer
+    # lists are read without building Flight instances
+    values_serializer = FlightValuesSerializer()
+    load_factor_serializer = LoadFactorValuesSerializer()
     pagination_class = StandardResultsSetPagination
+    keyset_ordering = ('flight_id',)
+    # a page and its count, plus the occasional refresh of the revoked
+    # token filter for authenticated requests
+    query_budget = {'list': 4, 'search': 4, 'retrieve': 3, 'load_factor': 4, 'daily_stats': 4}
+    search_ordering = ('departs_at', 'flight_id')
+    load_factor_orderings = {
+        'desc': (F('load_factor').desc(), 'flight_id'),
+        'asc': ('load_factor', 'flight_id'),
+    }
 
     def create(self, request, *args, **kwargs):
         flight = request.data.get('flight', {})
         serializer = self.serializer_class(data=flight, partial=True)
-        serializer.validate_flightname(flight['name'])
+        serializer.validate_flightname(flight.get('name'))
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
@@ -48,8 +77,10 @@ class FlightAPIView(mixins.CreateModelMixin, mixins.UpdateModelMixin,
             return Response({
                 'errors': 'You are not allowed to modify these details'
             })
-        serializer = self.serializer_class(
-            flight, data=request.data.get('flight', {}), partial=True)
+        data = request.data.get('flight', {})
+        serializer = self.serializer_class(flight, data=data, partial=True)
+        if 'name' in data:
+            serializer.validate_flightname(data['name'])
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
@@ -57,45 +88,148 @@ class FlightAPIView(mixins.CreateModelMixin, mixins.UpdateModelMixin,
     def retrieve(self, request, *args, **kwargs):
         flight_id = kwargs['flight_id']
 
-        flight = Flight.objects.filter(flight_id=flight_id).first()
-        if flight is None:
-            return Response({
-                'errors': 'Flight does not exist'
-            }, status.HTTP_404_NOT_FOUND)
-        serializer = self.serializer_class(
-            flight, context={'request': request}
-        )
-        return Response(serializer.data)
+        def build():
+            flight = Flight.objects.filter(flight_id=flight_id).first()
+            if flight is None:
+                return Response({
+                    'errors': 'Flight does not exist'
+                }, status.HTTP_404_NOT_FOUND)
+            serializer = self.serializer_class(
+                flight, context={'request': request}
+            )
+            return Response(serializer.data)
+
+        return cached_response(request, 'flight:{}'.format(flight_id), build)
 
     def list(self, request, *args, **kwargs):
-        flights = Flight.objects.all()
+        def build():
+            flights = self.values_serializer.rows(Flight.objects.all())
+
+            page = self.paginate_queryset(flights)
+            return self.get_paginated_response(self.values_serializer.data(page))
+
+        return cached_response(request, self.cache_name(request, 'list'), build)
+
+    @action(detail=False)
+    def search(self, request, *args, **kwargs):
+        """
+        Lists the flights matching the FlightSearchFilter filters in
+        departure order.
+        """
+        def build():
+            filterset = FlightSearchFilter(request.query_params, queryset=Flight.objects.all())
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            self.keyset_ordering = self.search_ordering
+            flights = self.values_serializer.rows(filterset.qs.order_by(*self.search_ordering))
+
+            page = self.paginate_queryset(flights)
+            return self.get_paginated_response(self.values_serializer.data(page))
+
+        return cached_response(request, self.cache_name(request, 'search'), build)
+
+    @action(detail=False, url_path='load-factor')
+    def load_factor(self, request, *args, **kwargs):
+        """
+        Lists the flights with a seat map to staff by load factor, the
+        share of their seats booked, fullest first or emptiest first with
+        ?order=asc. Takes the FlightSearchFilter filters. The occupancy is
+        read from the flights' counters, no bookings are counted.
+        """
+        if not request.user.is_staff:
+            return Response({
+                'errors': 'You are not allowed to view the load factor of flights'
+            }, status.HTTP_403_FORBIDDEN)
+        ordering = self.load_factor_orderings.get(request.query_params.get('order', 'desc'))
+        if ordering is None:
+            return Response({
+                'errors': 'The order must be one of {}'.format(', '.join(self.load_factor_orderings))
+            }, status.HTTP_400_BAD_REQUEST)
+        filterset = FlightSearchFilter(request.query_params, queryset=Flight.objects.filter(capacity__gt=0))
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        # the load factor is computed, pages are numbered
+        self.keyset_ordering = None
+        flights = self.load_factor_serializer.rows(
+            filterset.qs.annotate(load_factor=load_factor()).order_by(*ordering))
 
         page = self.paginate_queryset(flights)
-        serializer = self.serializer_class(
-            page,
-            context={
-                'request': request
-            },
-            many=True
-        )
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(self.load_factor_serializer.data(page))
+
+    @action(detail=False, url_path='daily-stats')
+    def daily_stats(self, request, *args, **kwargs):
+        """
+        Lists the daily operations report to staff, the bookings,
+        cancellations and booking lead times per departure date and
+        destination. Takes the DailyFlightStatsFilter filters.
+        """
+        if not request.user.is_staff:
+            return Response({
+                'errors': 'You are not allowed to view the operations report'
+            }, status.HTTP_403_FORBIDDEN)
+        filterset = DailyFlightStatsFilter(request.query_params, queryset=DailyFlightStats.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        self.keyset_ordering = ('departure_date', 'destination')
+
+        page = self.paginate_queryset(filterset.qs)
+        return self.get_paginated_response(DailyFlightStatsSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Imports a list of flights, reporting the rows that could not be
+        imported instead of failing the whole list.
+        """
+        if not request.user.is_staff:
+            return Response({
+                'errors': 'You are not allowed to import flights'
+            }, status.HTTP_403_FORBIDDEN)
+        flights = request.data.get('flights')
+        if not isinstance(flights, list):
+            return Response({
+                'errors': 'Send the flights to import as a list'
+            }, status.HTTP_400_BAD_REQUEST)
+        report = import_flights(flights)
+        return Response(
+            report.as_dict(), status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST)
+
+    def cache_name(self, request, name):
+        # the paginated response links back to this host
+        return '{}:{}://{}?{}'.format(
+            name, request.scheme, request.get_host(), urlencode(sorted(request.query_params.items())))
 
     def destroy(self, request, *args, **kwargs):
-        super().destroy(self, request, *args, **kwargs)
+        flight_id = self.get_object().pk
+        with transaction.atomic():
+            # the flight's bookings are deleted with it, taken off its day's
+            # stats as cancellations while the flight is locked against new ones
+            flight = Flight.objects.select_for_update().get(pk=flight_id)
+            bookings = flight.bookings.count()
+            if bookings:
+                record_daily_bookings(flight.destination, flight.departure_date, -bookings, bookings)
+            self.perform_destroy(flight)
+        bump_catalogue_version()
 
         return Response({'message': 'The flight has successfully been deleted.'})
 
 
     
 class BookingAPIView(CreateAPIView, RetrieveUpdateDestroyAPIView):
-    queryset = Booking.objects.all()
+    queryset = Booking.objects.with_traveller_profiles()
     serializer_class = BookingSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    renderer_classes = (JSONRenderer,)
+    renderer_classes = (FastJSONRenderer,)
     renderer_names = ('booking', 'bookings')
+    # lists are read without building Booking instances
+    values_serializer = BookingValuesSerializer()
     lookup_url_kwarg = 'flight_id'
     lookup_field = 'flight__flight_id'
     pagination_class = StandardResultsSetPagination
+    keyset_ordering = ('flight_id', 'booking_id')
+    # the flight, a page of bookings and its count, plus the occasional
+    # refresh of the revoked token filter
+    query_budget = {'get': 5}
 
     def create(self, request, *args, **kwargs):
         flight_id = self.kwargs['flight_id']
@@ -107,7 +241,14 @@ class BookingAPIView(CreateAPIView, RetrieveUpdateDestroyAPIView):
         serializer = self.serializer_class(
             data=request.data.get('booking', {}))
         serializer.is_valid(raise_exception= True)
-        serializer.save(flight=flight, traveller=request.user)
+        seat_label = None
+        if not serializer.validated_data['auto_assign']:
+            seat_label = serializer.validated_data['flight_seat']
+        try:
+            booking = book_seat(flight, request.user, seat_label)
+        except SeatUnavailable as e:
+            return Response({"errors": str(e)}, status=status.HTTP_409_CONFLICT)
+        serializer = self.serializer_class(booking)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -118,23 +259,16 @@ class BookingAPIView(CreateAPIView, RetrieveUpdateDestroyAPIView):
         except Flight.DoesNotExist:
             data = {"errors": "This flight does not exist!"}
             return Response(data, status=status.HTTP_404_NOT_FOUND)
-        bookings = Booking.objects.filter(flight__flight_id=flight_id)
+        bookings = self.values_serializer.rows(Booking.objects.filter(flight=flight), self.keyset_ordering)
         page = self.paginate_queryset(bookings)
-        serializer = self.serializer_class(
-            page,
-            context={
-                'request': request
-            },
-            many=True
-        )
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(self.values_serializer.data(page))
 
 
 class BookingUpdateDestroy(RetrieveUpdateDestroyAPIView):
-    queryset =Booking.objects.all()
+    queryset = Booking.objects.with_traveller_profiles()
     serializer_class = BookingSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    renderer_classes = (JSONRenderer,)
+    renderer_classes = (FastJSONRenderer,)
     renderer_names = ('booking', 'bookings')
     lookup_url_kwarg = 'pk'
 
@@ -157,7 +291,10 @@ class BookingUpdateDestroy(RetrieveUpdateDestroyAPIView):
         serializer = self.serializer_class(
             booking, data=request.data.get('booking', {}), partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save(flight=flight, traveller=request.user)
+        try:
+            serializer.save(flight=flight, traveller=request.user)
+        except SeatUnavailable as e:
+            return Response({"errors": str(e)}, status=status.HTTP_409_CONFLICT)
         return Response(serializer.data)
 
     def destroy(self, request, *args, **kwargs):
@@ -174,6 +311,94 @@ class BookingUpdateDestroy(RetrieveUpdateDestroyAPIView):
         except Booking.DoesNotExist:
             message = {"error": "Booking with this ID does not exist"}
             return Response(message, status.HTTP_404_NOT_FOUND)
-        booking = Booking.objects.filter(pk=pk).first()
-        booking.delete()
-        return Response({'message': 'The booking has been deleted'})
\ No newline at end of file
+        booking = Booking.objects.select_related('flight').filter(pk=pk).first()
+        cancel_booking(booking)
+        return Response({'message': 'The booking has been deleted'})
+
+
+class GroupBookingAPIView(generics.GenericAPIView):
+    """
+    Books or cancels several seats on a flight at once. All the seats are
+    booked or none are, and the number of queries does not grow with the
+    number of seats.
+    """
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (FastJSONRenderer,)
+    serializer_class = GroupBookingsSerializer
+
+    def get_flight(self):
+        return Flight.objects.filter(flight_id=self.kwargs['flight_id']).first()
+
+    def post(self, request, *args, **kwargs):
+        flight = self.get_flight()
+        if flight is None:
+            data = {"errors": "This flight does not exist!"}
+            return Response(data, status=status.HTTP_404_NOT_FOUND)
+        serializer = self.serializer_class(data={'bookings': request.data.get('bookings')})
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.validated_data['bookings']
+
+        emails = {booking['traveller_email'] for booking in bookings if 'traveller_email' in booking}
+        # the travellers are loaded with their profiles for the response
+        travellers = User.objects.select_related('profile').filter(Q(email__in=emails) | Q(pk=request.user.pk))
+        by_email = {traveller.email: traveller for traveller in travellers}
+        missing = emails.difference(by_email)
+        if missing:
+            data = {"errors": "No traveller is registered with the email {}".format(sorted(missing)[0])}
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        by_email[None] = next(traveller for traveller in travellers if traveller.pk == request.user.pk)
+
+        try:
+            booked = book_seats(flight, [
+                (by_email[booking.get('traveller_email')],
+                 None if booking['auto_assign'] else booking['flight_seat'])
+                for booking in bookings
+            ])
+        except SeatUnavailable as e:
+            return Response({"errors": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(BookingSerializer(booked, many=True).data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, *args, **kwargs):
+        flight = self.get_flight()
+        if flight is None:
+            data = {"errors": "This flight does not exist!"}
+            return Response(data, status=status.HTTP_404_NOT_FOUND)
+        serializer = CancelBookingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # staff may cancel any booking, travellers only their own
+        traveller = None if request.user.is_staff else request.user
+        cancelled = cancel_bookings(flight, serializer.validated_data['booking_ids'], traveller)
+        return Response({
+            'message': '{} bookings have been cancelled'.format(cancelled),
+            'cancelled': cancelled,
+        })
+
+
+class ManifestAPIView(generics.GenericAPIView):
+    """
+    Streams the passenger manifest of a flight to staff, as CSV or with
+    ?output=jsonl as a line of JSON per passenger.
+    """
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (FastJSONRenderer,)
+    content_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_staff:
+            return Response({
+                'errors': 'You are not allowed to view passenger manifests'
+            }, status.HTTP_403_FORBIDDEN)
+        output = request.query_params.get('output', 'csv')
+        if output not in MANIFEST_FORMATS:
+            return Response({
+                'errors': 'The output must be one of {}'.format(', '.join(MANIFEST_FORMATS))
+            }, status.HTTP_400_BAD_REQUEST)
+        flight_id = kwargs['flight_id']
+        if not Flight.objects.filter(flight_id=flight_id).exists():
+            data = {"errors": "This flight does not exist!"}
+            return Response(data, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(
+            stream_manifest(flight_manifest(flight_id=flight_id), output), content_type=self.content_types[output])
+        response['Content-Disposition'] = 'attachment; filename="manifest-{}.{}"'.format(flight_id, output)
+        return response
@@ -0,0 +1,16 @@
+from flightbooking.apps.core.pagination import KeysetPagination
+
+
+class ProfilePagination(KeysetPagination):
+    """
+    Pages through profiles by cursor, keeping the profiles under the
+    'profiles' key of the response.
+    """
+    page_size = 50
+    max_page_size = 100
+    ordering = ('id',)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['profiles'] = response.data.pop('results')
+        return response
@@ -1,8 +1,10 @@
 from rest_framework import serializers
+
+from flightbooking.apps.core.serializers import TimedListSerializer, TimedSerializerMixin
 from .models import Profile
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializes and deserializes Profile instances.
     """
@@ -13,3 +15,4 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ['username', 'image', 'passport']
+        list_serializer_class = TimedListSerializer
@@ -1,7 +1,13 @@
+import json
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework.reverse import reverse
 from flightbooking.apps.authentication.models import User
+from flightbooking.apps.authentication.tests.test_auth import AuthenticatedTestCase
 from flightbooking.apps.profiles.models import Profile
 
 
@@ -103,3 +109,44 @@ class TestProfile(APITestCase):
         res = self.client.put(self.get_profiles_url, data={'bio': 'This is some bio'})
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+
+
+class ProfileListTestCase(AuthenticatedTestCase):
+    """
+    Tests paging and streaming through all profiles
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.url_profiles = reverse('profiles:get-profiles')
+        for index in range(5):
+            user = User.objects.create_user(
+                username="traveller{}".format(index), email="traveller{}@gmail.com".format(index))
+            Profile.objects.create(user=user)
+        self.usernames = ["traveller{}".format(index) for index in range(5)]
+
+    def test_profiles_are_paged_by_cursor(self):
+        usernames, url = [], self.url_profiles + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            usernames += [profile['username'] for profile in res.data['profiles']]
+            url = res.data['links']['next']
+        self.assertEqual(usernames, self.usernames)
+
+    def test_profile_page_queries_do_not_grow_with_the_page(self):
+        def count_queries(page_size):
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(self.url_profiles + '?page_size={}'.format(page_size))
+            self.assertEqual(len(res.data['profiles']), page_size)
+            return len(queries)
+
+        # the first request also loads the token revocation filter
+        with override_settings(TOKEN_REVOCATION_FILTER_REFRESH=3600):
+            count_queries(1)
+            self.assertEqual(count_queries(1), count_queries(5))
+
+    def test_profiles_can_be_streamed(self):
+        res = self.client.get(self.url_profiles + '?stream=true')
+        self.assertTrue(res.streaming)
+        profiles = json.loads(b''.join(res.streaming_content))['profiles']
+        self.assertEqual([profile['username'] for profile in profiles], self.usernames)
@@ -7,23 +7,43 @@ from rest_framework.permissions import IsAuthenticated
 from django.http import Http404
 
 from flightbooking.apps.authentication.models import User
+from flightbooking.apps.core.streaming import streaming_json_response
 from .models import Profile
+from .pagination import ProfilePagination
 from .serializers import ProfileSerializer
 from .renderers import ProfileJSONRenderer
 
 
+def stream_profiles(queryset):
+    """
+    Streams every profile of a queryset as {"profiles": [...]}, reading
+    them from a database cursor so memory stays flat.
+    :param queryset: QuerySet of Profile
+    :return: StreamingHttpResponse
+    """
+    return streaming_json_response(
+        'profiles', queryset.select_related('user').order_by('id').iterator(),
+        ProfileSerializer().to_representation)
+
+
 class ProfileListView(ListAPIView):
+    """
+    Lists the other users' profiles a page at a time, or all of them in
+    one streamed response with ?stream=true.
+    """
     permission_classes = (IsAuthenticated,)
     serializer_classes = ProfileSerializer
     renderer_classes = (ProfileJSONRenderer,)
+    pagination_class = ProfilePagination
+    keyset_ordering = ('id',)
 
     def get(self, request, *args, **kwargs):
-        try:
-            queryset = Profile.objects.all().exclude(user=request.user)
-        except Profile.DoesNotExist:
-            raise Http404
-        serializer = self.serializer_classes(queryset, many=True)
-        return Response({'profiles': serializer.data}, status=status.HTTP_200_OK)
+        queryset = Profile.objects.select_related('user').exclude(user=request.user)
+        if request.query_params.get('stream') == 'true':
+            return stream_profiles(queryset)
+        page = self.paginate_queryset(queryset)
+        serializer = self.serializer_classes(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class ProfileGetView(APIView):
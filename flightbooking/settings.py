@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'flightbooking.apps.core.middleware.PerformanceMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -58,6 +59,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Views may declare a query_budget, requests running more queries log a
+# warning, or fail when QUERY_BUDGET_STRICT is on. The test runner turns
+# it on for the test suite.
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT') == 'True'
+TEST_RUNNER = 'flightbooking.apps.core.runner.StrictQueryBudgetRunner'
+
+# Metrics are recorded to files in METRICS_DIR so that /metrics covers
+# every worker, empty it before starting them. Without it each process
+# only exposes its own metrics. Scrapers send METRICS_TOKEN as a bearer
+# token, /metrics refuses every request while it is not set.
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 ROOT_URLCONF = 'flightbooking.urls'
 
 TEMPLATES = [
@@ -79,9 +93,20 @@ TEMPLATES = [
 WSGI_APPLICATION = 'flightbooking.wsgi.application'
 
 AUTHENTICATION_BACKENDS = (
-    ('django.contrib.auth.backends.ModelBackend'),
+    ('flightbooking.apps.authentication.backends.EmailProfileBackend'),
 )
 
+# The work factor of password hashing, a login with a password hashed
+# with a different number of iterations rehashes it.
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 150000))
+
+PASSWORD_HASHERS = [
+    'flightbooking.apps.authentication.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 AUTH_USER_MODEL = 'authentication.User'
 
 
@@ -106,6 +131,59 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_HOST_SENDER = os.getenv("EMAIL_HOST_SENDER")
 EMAIL_USE_TLS = True
+# reminder emails are sent in chunks, each over its own SMTP connection
+REMINDER_EMAIL_CHUNK_SIZE = int(os.getenv('REMINDER_EMAIL_CHUNK_SIZE', 100))
+# travellers are reminded REMINDER_EMAIL_LEAD_HOURS before their flight
+# departs, by a task checking for flights every REMINDER_EMAIL_INTERVAL_MINUTES
+REMINDER_EMAIL_LEAD_HOURS = int(os.getenv('REMINDER_EMAIL_LEAD_HOURS', 24))
+REMINDER_EMAIL_INTERVAL_MINUTES = int(os.getenv('REMINDER_EMAIL_INTERVAL_MINUTES', 5))
+# chunks still unsent this long after they were planned or last attempted
+# are queued again, for when their task was lost
+REMINDER_EMAIL_REQUEUE_MINUTES = int(os.getenv('REMINDER_EMAIL_REQUEUE_MINUTES', 30))
+# chunks that failed REMINDER_EMAIL_MAX_ATTEMPTS sends are given up on
+REMINDER_EMAIL_MAX_ATTEMPTS = int(os.getenv('REMINDER_EMAIL_MAX_ATTEMPTS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Point REDIS_CACHE_URL at a shared Redis so that every worker sees the
+# same cache.
+
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Flight pages are only cached in a cache every worker shares, a catalogue
+# version bumped in one worker's local memory is never seen by the others.
+# Set FLIGHT_CATALOGUE_CACHE_LOCAL to cache them in LocMemCache anyway, only
+# when a single process serves and changes flights.
+FLIGHT_CATALOGUE_CACHE_LOCAL = os.getenv('FLIGHT_CATALOGUE_CACHE_LOCAL', 'False') == 'True'
+
+# How long serialized flight pages stay cached. Changes to flights retire
+# cached pages straight away, this only bounds how long unused pages linger.
+FLIGHT_CATALOGUE_CACHE_TIMEOUT = int(os.getenv('FLIGHT_CATALOGUE_CACHE_TIMEOUT', 60 * 60))
+
+# Bulk flight imports validate FLIGHT_IMPORT_BATCH_SIZE rows at a time and
+# insert them FLIGHT_IMPORT_CHUNK_SIZE rows per statement.
+FLIGHT_IMPORT_BATCH_SIZE = int(os.getenv('FLIGHT_IMPORT_BATCH_SIZE', 1000))
+FLIGHT_IMPORT_CHUNK_SIZE = int(os.getenv('FLIGHT_IMPORT_CHUNK_SIZE', 500))
+
+# Passenger manifests are read from a server side cursor this many rows
+# at a time.
+MANIFEST_CHUNK_SIZE = int(os.getenv('MANIFEST_CHUNK_SIZE', 2000))
+
+# The most seats a single group booking can book.
+GROUP_BOOKING_MAX_SEATS = int(os.getenv('GROUP_BOOKING_MAX_SEATS', 100))
 
 
 # Password validation
@@ -126,6 +204,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Authenticate requests from the signed JWT claims instead of loading the
+# user from the database on every request. The tokens of users who are
+# deleted or whose email, username or staff status change are revoked.
+JWT_STATELESS_AUTHENTICATION = os.getenv('JWT_STATELESS_AUTHENTICATION', 'True') == 'True'
+
+# Revoked tokens are checked against a bloom filter before the database.
+# 'memory' keeps one per process and picks up tokens revoked by other
+# processes every TOKEN_REVOCATION_FILTER_REFRESH seconds, 'redis' shares
+# one through TOKEN_REVOCATION_REDIS_URL. Leave empty to always query.
+TOKEN_REVOCATION_FILTER = os.getenv('TOKEN_REVOCATION_FILTER', 'memory')
+TOKEN_REVOCATION_REDIS_URL = os.getenv('TOKEN_REVOCATION_REDIS_URL', 'redis://localhost:6379')
+TOKEN_REVOCATION_FILTER_CAPACITY = int(os.getenv('TOKEN_REVOCATION_FILTER_CAPACITY', 100000))
+TOKEN_REVOCATION_FILTER_ERROR_RATE = 0.01
+TOKEN_REVOCATION_FILTER_REFRESH = 5
+TOKEN_REVOCATION_FILTER_REBUILD = 60 * 60
+
+# Access tokens last TIME_DELTA minutes, the refresh tokens handed out with
+# them can be exchanged for new ones for REFRESH_TOKEN_LIFETIME_DAYS days.
+REFRESH_TOKEN_LIFETIME_DAYS = int(os.getenv('REFRESH_TOKEN_LIFETIME_DAYS', 30))
+
 REST_FRAMEWORK = {
     'NON_FIELD_ERRORS_KEY': 'error',
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -175,4 +273,5 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
-CELERY_TIMEZONE = 'Africa/Nairobi'
\ No newline at end of file
+# schedules run in the same time zone as the dates they read
+CELERY_TIMEZONE = TIME_ZONE
\ No newline at end of file
@@ -18,6 +18,8 @@ from django.urls import path
 from django.conf.urls import include
 from rest_framework_swagger.views import get_swagger_view
 
+from flightbooking.apps.core.views import metrics
+
 schema_view = get_swagger_view(title="Flight-Bookings")
 
 urlpatterns = [
@@ -25,5 +27,6 @@ urlpatterns = [
     path('api/', include('flightbooking.apps.authentication.urls', namespace='authentication')),
     path('api/profiles/', include('flightbooking.apps.profiles.urls', namespace='profiles')),
     path('api/', include('flightbooking.apps.flights.urls', namespace="flights")),
+    path('metrics', metrics, name='metrics'),
     path('', schema_view)
 ]
\ No newline at end of file
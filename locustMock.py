@@ -3,9 +3,9 @@ def headers(token):
 
 user_data = {
 	"user": {
-                "username": "beverly1",
+                "username": "traveller1",
                 "password": "password1U@#}",
-                "email": "beverly1@gmail.com"
+                "email": "traveller1@gmail.com"
             }
 }
 
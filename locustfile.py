@@ -1,44 +1,66 @@
-from locust import HttpLocust, TaskSet, task
+"""
+Loads a running server with travellers browsing flights, bookings and
+profiles and booking seats. Seed the server's database first with
+`python manage.py seed_scale`, each simulated traveller logs
+in once as one of the seeded travellers and keeps their token.
+
+    locust --host http://localhost:8000
+"""
+import itertools
 import json
-from locustMock import user_data, headers, flight_data
+import random
+
+from locust import HttpLocust, TaskSet, task
+
+from locustMock import headers, user_data
+
+# the travellers seeded into an empty database, traveller1 is staff
+travellers = itertools.count(2)
+
 
 class UserBehavior(TaskSet):
 
     def on_start(self):
         """ on_start is called when a Locust start before any task is scheduled """
-        self.login()
-
-    def createUser(self):
-        user = self.client.post('api/users/', data=json.dumps(user_data),\
-            headers={'content-type': 'application/json'})
-        return user.json
-
-    def login(self):
-        user = self.client.post('api/users/login/', data=json.dumps(user_data),\
-            headers={'content-type': 'application/json'})
-        return user.json()
+        index = next(travellers)
+        self.username = 'traveller{}'.format(index)
+        self.token = self.login('traveller{}@gmail.com'.format(index))['user']['token']
+        flights = self.client.get('api/flights/', headers=headers(self.token)).json()['results']
+        self.flight_ids = [flight['flight_id'] for flight in flights]
 
+    def login(self, email):
+        credentials = {'user': dict(user_data['user'], email=email)}
+        response = self.client.post(
+            'api/users/login/', data=json.dumps(credentials), headers={'content-type': 'application/json'})
+        return response.json()
 
     @task(1)
     def updateUserProfile(self):
-        user = self.login()
-        user_data['user']['passport'] = "https://res.cloudinary.com/dutpgpo9o/image/upload/v1566388286/mczuzw475cbbcnfcp5j0.jpg"
-        username = user_data['user']['username']
-        self.client.put(f'api/profiles/{username}/', data=json.dumps(user_data),\
-            headers=headers(user['user']['token']))
-    
+        self.client.put('api/profiles/{}/'.format(self.username), data=json.dumps({}),
+                        headers=headers(self.token), name='api/profiles/[username]/')
+
     @task(2)
     def getFlights(self):
-        user = self.login()
-        self.client.get(f'api/flights/', headers=headers(user['user']["token"]))
+        self.client.get('api/flights/', headers=headers(self.token))
 
+    @task(2)
+    def searchFlights(self):
+        self.client.get('api/flights/search/?destination=City {}'.format(random.randrange(20)),
+                        headers=headers(self.token), name='api/flights/search/')
 
     @task(3)
     def getBookings(self):
-        user = self.login()
-        self.client.get(f'api/flights/1/bookings/', headers=headers(user['user']["token"]))
-      
+        self.client.get('api/flights/{}/bookings/'.format(random.choice(self.flight_ids)),
+                        headers=headers(self.token), name='api/flights/[id]/bookings/')
+
+    @task(1)
+    def bookSeat(self):
+        self.client.post('api/flights/{}/bookings/'.format(random.choice(self.flight_ids)),
+                         data=json.dumps({'booking': {'auto_assign': True}}),
+                         headers=headers(self.token), name='api/flights/[id]/bookings/ (book)')
+
+
 class WebsiteUser(HttpLocust):
     task_set = UserBehavior
     min_wait = 5000
-    max_wait = 9000
\ No newline at end of file
+    max_wait = 9000